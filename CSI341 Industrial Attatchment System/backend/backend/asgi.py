@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# The dashboards' event stream (api/events/) stays open only when served
+# through this entry point, e.g. `uvicorn backend.asgi:application`; under
+# WSGI each stream ends after users.events.WSGI_STREAM_SECONDS and the
+# browser reconnects.
+#
+# An ASGI server runs sync code, and so every query, in threads that do not
+# outlive the request, and each stream holds its thread for as long as it is
+# open; connections kept for reuse would pile up unused. Unless
+# DB_CONN_MAX_AGE says otherwise, they are closed at the end of each request.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
 application = get_asgi_application()
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,13 +22,23 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
+def _env_list(name):
+    return [item.strip() for item in os.environ.get(name, '').split(',') if item.strip()]
+
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-^n@em@s$b$2x7d)a@avg7vhn%0wy3mg*l4yh)#p57nr3opk$m%'
+# It signs the access tokens (users.authentication), so whoever knows it can
+# sign in as anyone; it comes from the environment and is never committed.
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Set the DJANGO_SECRET_KEY environment variable.')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = []
+# Comma-separated; with DEBUG on, Django also accepts localhost.
+ALLOWED_HOSTS = _env_list('DJANGO_ALLOWED_HOSTS')
 
 
 # Application definition
@@ -44,6 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'users.middleware.QueryMetricsMiddleware',
+    'users.middleware.CompressionMiddleware',
+    'users.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,7 +71,8 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True  # Allow all frontend requests (for development)
 CORS_ALLOW_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-CORS_ALLOW_HEADERS = ["*"]
+# "*" does not cover Authorization, which carries the access token.
+CORS_ALLOW_HEADERS = ["*", "authorization"]
 
 CORS_ALLOWED_ORIGIN = [
     "http://localhost:3000",
@@ -65,6 +81,93 @@ CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
 ]
 
+# Per-endpoint budgets checked by users.middleware.QueryMetricsMiddleware,
+# keyed by URL name ('*' applies to every other endpoint). Endpoints whose
+# methods do different work split their budget by method; methods left out
+# get the '*' budget. Over-budget requests are logged; with
+# ENDPOINT_BUDGETS_STRICT they raise, which makes the test client fail the
+# test.
+ENDPOINT_BUDGETS = {
+    '*': {'queries': 50, 'latency_ms': 2000},
+    'list_all_students': {'queries': 5},
+    'list_all_organisations': {'queries': 10},
+    'student_preference_list': {'queries': 10},
+    # A submission also updates the counters, the search index and the
+    # event log: about 25 statements, 35 when it is the first for its student
+    # and organisation, whatever the length of the entry.
+    'logbook': {'GET': {'queries': 5}, 'POST': {'queries': 40}},
+    'org_logbooks': {'queries': 5},
+    'async_student_preference_list': {'queries': 10},
+    'async_org_logbooks': {'queries': 5},
+}
+ENDPOINT_BUDGETS_STRICT = False
+# Send each request's query count and timings back as X-Query-Count and
+# Server-Timing headers. They tell anyone how much work a request costs,
+# so they are only on in development.
+QUERY_METRICS_HEADERS = DEBUG
+
+# Seconds browsers may reuse the industries/skills lists before
+# revalidating them with If-None-Match.
+CATALOGUE_MAX_AGE = 300
+
+# Login returns a signed access token (users.authentication) that the
+# frontend sends as "Authorization: Bearer <token>"; it expires after
+# ACCESS_TOKEN_MAX_AGE seconds and the user logs in again.
+ACCESS_TOKEN_MAX_AGE = 8 * 60 * 60
+
+# The caches hold state every worker process has to share: the version
+# tokens and payloads of the catalogue and profile caches (users.catalogue,
+# users.object_cache), the read-your-writes pins of
+# users.middleware.ReplicaRoutingMiddleware and the throttle buckets. Set
+# CACHE_REDIS_URL (redis://host:port/db) whenever more than one process
+# serves requests. Without it each process has its own in-memory caches,
+# which is only correct for a single process such as runserver;
+# `manage.py check --deploy` warns about that.
+#
+# Token buckets limiting password checks (users.throttling), kept in the
+# THROTTLE_CACHE alias: each client IP and each account may make
+# ``capacity`` attempts in a burst, refilled at ``per_minute``.
+_redis_url = os.environ.get('CACHE_REDIS_URL')
+if _redis_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _redis_url,
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _redis_url,
+            'KEY_PREFIX': 'throttle',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'throttle',
+        },
+    }
+THROTTLE_CACHE = 'throttle'
+CREDENTIAL_THROTTLE_RATES = {
+    'ip': {'capacity': 30, 'per_minute': 10},
+    'account': {'capacity': 5, 'per_minute': 1},
+}
+
+# Responses are encoded by users.renderers.FastJSONRenderer (orjson when
+# installed) and compressed by users.middleware.CompressionMiddleware.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.SignedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'users.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -89,16 +192,59 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# The primary comes from the DB_* environment variables and defaults to the
+# local MySQL server. Read replicas are listed in DB_REPLICA_HOSTS as
+# "host[:port],..." and become the aliases replica1, replica2, ..., which
+# users.routers.PrimaryReplicaRouter sends the reads of read-only requests
+# to. With DB_ENGINE=sqlite the primary is the file DB_NAME and
+# DB_REPLICA_NAMES lists files opened read-only as replicas; giving the
+# primary's own file tries the routing locally, and a write that reaches a
+# replica fails.
+#
+# Connections stay open for DB_CONN_MAX_AGE seconds and are reused by the
+# requests a worker thread serves, after a liveness check when a request
+# starts (CONN_HEALTH_CHECKS). That suits WSGI workers; backend/asgi.py
+# defaults DB_CONN_MAX_AGE to 0, closing connections after each request, as
+# an ASGI server's threads and open event streams would otherwise each hold
+# one.
+
+_connection = {'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)), 'CONN_HEALTH_CHECKS': True}
+
+if os.environ.get('DB_ENGINE', 'mysql') == 'sqlite':
+    _primary = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+        # A file rather than the default in-memory database, so that the
+        # tests' threads (IdAllocationConcurrencyTests) can each connect.
+        'TEST': {'NAME': str(BASE_DIR / 'test_db.sqlite3')},
+        **_connection,
+    }
+    _replicas = [dict(_primary, NAME=f'file:{name}?mode=ro') for name in _env_list('DB_REPLICA_NAMES')]
+else:
+    _primary = {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME':'testdb',
-        'USER':'root',
-        'PASSWORD':'Colours2000',
-        'HOST':'127.0.0.1',
-        'PORT':'3306',
+        'NAME': os.environ.get('DB_NAME', 'testdb'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Colours2000'),
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        **_connection,
     }
-}
+    _replicas = []
+    for _host in _env_list('DB_REPLICA_HOSTS'):
+        _name, _, _port = _host.partition(':')
+        _replicas.append(dict(_primary, HOST=_name, PORT=_port or _primary['PORT']))
+
+DATABASES = {'default': _primary}
+for _number, _replica in enumerate(_replicas, 1):
+    # Tests read the test copy of the primary through the replica aliases.
+    DATABASES[f'replica{_number}'] = dict(_replica, TEST={'MIRROR': 'default'})
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['users.routers.PrimaryReplicaRouter']
+# Seconds a client that wrote keeps reading from the primary; longer than
+# the replicas usually lag behind.
+DATABASE_REPLICA_PIN_SECONDS = 10
 
 
 # Password validation
@@ -0,0 +1,141 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from . import catalogue, object_cache
+from .authentication import owns, token_user
+from .models import Logbook
+from .pagination import FilterError, fields_param, paginated_response
+from .renderers import dumps
+from .rows import LogbookRows, StudentPreferenceRows
+from .serializers import OrganisationSerializer, StudentSerializer
+from .views import organisation_preference_entries, preference_queryset
+
+# Async versions of the read endpoints the dashboards load most, routed
+# under async/ and returning the same JSON as their twins in views.py.
+# Served through backend/asgi.py they run on the event loop: routing,
+# token checks, middleware and serialization take no worker thread, and a
+# query occupies a thread of asgiref's executor only while it runs (the
+# async ORM hands each query to a thread). So slow queries queue behind
+# each other less than on a fixed pool of WSGI workers; see
+# `manage.py benchmark --concurrency`. Each view awaits the ORM as few
+# times as it can, since every await is a hop to that thread and back.
+#
+# DRF has no async views, so tokens are checked here with the same
+# token_user() and ownership rules as SignedTokenAuthentication/IsOwner.
+
+
+def _json(data, status=200):
+    # Encoded like the DRF responses of the twins.
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def _unauthorized(detail):
+    response = _json({"detail": detail}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def token_view(permission=None):
+    """
+    Make an async view GET-only and token-authenticated; ``permission(user,
+    url_kwargs)``, if given, must also pass.
+    """
+    def decorator(view):
+        @require_GET
+        @functools.wraps(view)
+        async def wrapper(request, **kwargs):
+            keyword, _, token = request.headers.get('Authorization', '').partition(' ')
+            if keyword.lower() != 'bearer' or not token:
+                return _unauthorized("Authentication credentials were not provided.")
+            try:
+                request.user = token_user(token)
+            except AuthenticationFailed as e:
+                return _unauthorized(str(e.detail))
+            if permission is not None and not permission(request.user, kwargs):
+                return _json({"detail": "You do not have permission to perform this action."}, status=403)
+            return await view(request, **kwargs)
+        return wrapper
+    return decorator
+
+
+@token_view()
+async def preference_list(request):
+    try:
+        prefs = preference_queryset(request)
+    except FilterError as e:
+        return _json({"error": str(e)}, status=400)
+    # DRF's cursor paginator is synchronous; the page and its prefetches
+    # are read in one hop.
+    response = await sync_to_async(paginated_response)(
+        Request(request), prefs, StudentPreferenceRows, 'student_pref_id',
+    )
+    if response.status_code != 200:
+        return _json(response.data, status=response.status_code)
+    return _json(response.data)
+
+
+@token_view(owns)
+async def list_organisation_preferences(request, org_id):
+    # The id query and the cache lookups in one hop.
+    entries = await sync_to_async(organisation_preference_entries)(org_id)
+    return object_cache.respond_many(request, entries)
+
+
+@token_view(owns)
+async def org_logbooks(request, org_id):
+    try:
+        fields = fields_param(request, LogbookRows)
+    except FilterError as e:
+        return _json({"error": str(e)}, status=400)
+    logbooks = LogbookRows.project(Logbook.objects.filter(org_id=org_id).order_by('-submitted_at'), fields)
+    return _json(LogbookRows([row async for row in logbooks], many=True, fields=fields).data)
+
+
+async def _cached_object(request, kind, pk, serializer_class, not_found):
+    # views.cached_object_response() for async views.
+    try:
+        fields = fields_param(request, serializer_class)
+    except FilterError as e:
+        return _json({"error": str(e)}, status=400)
+    entry = await sync_to_async(object_cache.get)(kind, pk)
+    if entry is None:
+        return _json({'error': not_found}, status=404)
+    return object_cache.respond(request, *entry.select(fields), last_modified=entry.modified)
+
+
+@token_view(owns)
+async def student_profile(request, student_id):
+    return await _cached_object(request, 'student', student_id, StudentSerializer, 'Student not found')
+
+
+@token_view(owns)
+async def organisation_profile(request, org_id):
+    return await _cached_object(request, 'organisation', org_id, OrganisationSerializer, 'Organisation not found')
+
+
+async def _catalogue_response(request, name):
+    # The cache backend may be a network service, so this runs in a thread.
+    entry = await sync_to_async(catalogue.get)(name)
+    response = get_conditional_response(request, etag=entry.etag)
+    if response is None:
+        response = HttpResponse(entry.payload, content_type='application/json')
+    response['ETag'] = entry.etag
+    patch_cache_control(response, public=True, max_age=settings.CATALOGUE_MAX_AGE)
+    return response
+
+
+@require_GET
+async def get_industries(request):
+    return await _catalogue_response(request, 'industries')
+
+
+@require_GET
+async def get_skills(request):
+    return await _catalogue_response(request, 'skills')
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core import signing
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
+
+# Stateless access tokens. Logging in checks the password once and returns
+# a token signed with SECRET_KEY that names the role and the account id;
+# every later request is authenticated by verifying the signature and the
+# age of the token, with no password hashing and no database query.
+
+TOKEN_SALT = 'users.access-token'
+STUDENT, ORGANISATION, ADMIN = 'student', 'organisation', 'admin'
+
+
+def issue_token(role, account_id):
+    """Return ``{"token": ..., "expires_in": seconds}`` for a logged-in account."""
+    token = signing.dumps({'role': role, 'id': str(account_id)}, salt=TOKEN_SALT)
+    return {'token': token, 'expires_in': settings.ACCESS_TOKEN_MAX_AGE}
+
+
+class TokenUser:
+    """The account a verified token speaks for; built without touching the database."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, role, account_id):
+        self.role = role
+        self.id = account_id
+
+    def __str__(self):
+        return f'{self.role}:{self.id}'
+
+    @property
+    def is_admin(self):
+        return self.role == ADMIN
+
+    def can_act_for_student(self, student_id):
+        return self.is_admin or (self.role == STUDENT and self.id == str(student_id))
+
+    def can_act_for_organisation(self, org_id):
+        return self.is_admin or (self.role == ORGANISATION and self.id == str(org_id))
+
+
+def token_user(token):
+    """Return the TokenUser for a token, or raise AuthenticationFailed."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.ACCESS_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed('Token expired, please log in again.')
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    return TokenUser(payload['role'], payload['id'])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <token>`` with a token from issue_token()."""
+
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeDecodeError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return token_user(token), token
+
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+
+class HasRole(BasePermission):
+    """Allow tokens of the listed roles; admins are always allowed."""
+
+    roles = ()
+
+    def has_permission(self, request, view):
+        role = getattr(request.user, 'role', None)
+        return role == ADMIN or role in self.roles
+
+
+class IsAdmin(HasRole):
+    roles = (ADMIN,)
+
+
+class IsStudent(HasRole):
+    roles = (STUDENT,)
+
+
+class IsOrganisation(HasRole):
+    roles = (ORGANISATION,)
+
+
+class IsStudentOrOrganisation(HasRole):
+    roles = (STUDENT, ORGANISATION)
+
+
+class IsOwner(BasePermission):
+    """
+    For views with a ``student_id`` or ``org_id`` URL argument: only that
+    student or organisation (or an admin) may call them.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not getattr(user, 'is_authenticated', False) or not hasattr(user, 'role'):
+            return False
+        return owns(user, view.kwargs)
+
+
+def owns(user, kwargs):
+    """Whether ``user`` may act for the student_id/org_id in a view's URL arguments."""
+    if 'student_id' in kwargs:
+        return user.can_act_for_student(kwargs['student_id'])
+    if 'org_id' in kwargs:
+        return user.can_act_for_organisation(kwargs['org_id'])
+    return user.is_admin
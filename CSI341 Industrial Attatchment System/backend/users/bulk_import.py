@@ -0,0 +1,250 @@
+import codecs
+import csv
+import functools
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import Industry, Location, Organisation, Student
+
+# Bulk onboarding of students and organisations from CSV or NDJSON.
+#
+# Rows are read lazily and handled a batch at a time: model validation runs
+# without touching the database, uniqueness is checked with one query per
+# unique field per batch, passwords are hashed on a thread pool (hashlib
+# releases the GIL while running PBKDF2) and the valid rows are inserted
+# with bulk_create. Invalid rows are reported by their line number and do
+# not stop the import.
+
+FORMATS = ('csv', 'ndjson')
+
+STUDENT_FIELDS = [
+    'student_id', 'first_name', 'last_name', 'year_of_study',
+    'student_email', 'student_contact_number', 'password',
+]
+ORGANISATION_FIELDS = [
+    'org_name', 'industry', 'town', 'street', 'plot_number',
+    'contact_number', 'contact_email', 'password',
+]
+
+
+class ImportFormatError(ValueError):
+    """The upload as a whole cannot be read."""
+
+
+def detect_format(name='', content_type=''):
+    """Guess the format from a file name or content type; None if unknown."""
+    name, content_type = (name or '').lower(), (content_type or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return None
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, row)`` from a text stream or anything yielding
+    lines of bytes (files, uploads, the request body). Rows that cannot be
+    decoded are yielded as ``(line_number, ImportFormatError)``.
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unsupported format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    if not isinstance(stream, io.TextIOBase):
+        stream = codecs.iterdecode(stream, 'utf-8-sig')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("each line must be a JSON object")
+            yield line_number, row
+        except ValueError as e:
+            yield line_number, ImportFormatError(f"Invalid JSON: {e}")
+
+
+def _hash(password, keep_hashes=False):
+    # A value is only kept as a hash (e.g. exported from another instance)
+    # when the import asks for it: otherwise whoever wrote the file would
+    # choose the stored hash, and any value that looks like one would be
+    # stored unhashed.
+    if keep_hashes:
+        try:
+            identify_hasher(password)
+            return password
+        except ValueError:
+            pass
+    return make_password(password)
+
+
+class BulkImporter:
+    """Base class; subclasses describe one model."""
+
+    model = None
+    fields = []
+    unique_fields = []
+    # Not validated per row: passwords are hashed later and foreign keys
+    # are resolved up front by the subclass.
+    clean_exclude = ['password']
+
+    def __init__(self, batch_size=1000, workers=None, keep_hashes=False):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.keep_hashes = keep_hashes
+        self.seen = {field: set() for field in self.unique_fields}
+        self.created = 0
+        self.total = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while batch := list(islice(rows, self.batch_size)):
+                self.total += len(batch)
+                self.import_batch(batch, pool)
+        return self.report()
+
+    def report(self):
+        errors = sorted(self.errors, key=lambda error: error['row'])
+        return {'total': self.total, 'created': self.created, 'failed': len(errors), 'errors': errors}
+
+    def error(self, line, errors):
+        if isinstance(errors, ValidationError):
+            errors = errors.message_dict if hasattr(errors, 'error_dict') else {'non_field_errors': errors.messages}
+        elif not isinstance(errors, dict):
+            errors = {'non_field_errors': [str(errors)]}
+        self.errors.append({'row': line, 'errors': errors})
+
+    def build(self, row):
+        """Return an unsaved instance for ``row``; raise ValidationError."""
+        missing = [field for field in self.fields if row.get(field) in (None, '')]
+        if missing:
+            raise ValidationError({field: ["This field is required."] for field in missing})
+        obj = self.model(**self.values(row))
+        obj.full_clean(exclude=self.clean_exclude, validate_unique=False)
+        return obj
+
+    def values(self, row):
+        return {field: row[field] for field in self.fields}
+
+    def import_batch(self, batch, pool):
+        candidates = []
+        for line, row in batch:
+            if isinstance(row, Exception):
+                self.error(line, row)
+                continue
+            try:
+                candidates.append((line, row, self.build(row)))
+            except ValidationError as e:
+                self.error(line, e)
+
+        candidates = self.drop_duplicates(candidates)
+        passwords = pool.map(
+            functools.partial(_hash, keep_hashes=self.keep_hashes), [str(row['password']) for _, row, _ in candidates],
+        )
+        for (_, _, obj), password in zip(candidates, passwords):
+            obj.password = password
+        self.insert(candidates)
+
+    def drop_duplicates(self, candidates):
+        """Drop rows clashing with the database or with earlier rows of the upload."""
+        existing = {}
+        for field in self.unique_fields:
+            values = [getattr(obj, field) for _, _, obj in candidates]
+            existing[field] = set(
+                self.model.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True)
+            )
+
+        kept = []
+        for line, row, obj in candidates:
+            clashes = {}
+            for field in self.unique_fields:
+                value = getattr(obj, field)
+                if value in existing[field]:
+                    clashes[field] = ["Already registered."]
+                elif value in self.seen[field]:
+                    clashes[field] = ["Duplicated earlier in this file."]
+            if clashes:
+                self.error(line, clashes)
+                continue
+            for field in self.unique_fields:
+                self.seen[field].add(getattr(obj, field))
+            kept.append((line, row, obj))
+        return kept
+
+    def insert(self, candidates):
+        objs = [obj for _, _, obj in candidates]
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objs)
+                self.after_insert(candidates)
+            self.created += len(objs)
+        except IntegrityError:
+            # Someone registered a clashing row meanwhile; find it row by row.
+            for line, row, obj in candidates:
+                try:
+                    with transaction.atomic():
+                        self.model.objects.bulk_create([obj])
+                        self.after_insert([(line, row, obj)])
+                    self.created += 1
+                except IntegrityError as e:
+                    self.error(line, e)
+
+    def after_insert(self, candidates):
+        pass
+
+
+class StudentImporter(BulkImporter):
+    model = Student
+    fields = STUDENT_FIELDS
+    unique_fields = ['student_id', 'student_email', 'student_contact_number']
+
+
+class OrganisationImporter(BulkImporter):
+    model = Organisation
+    fields = ORGANISATION_FIELDS
+    unique_fields = ['org_name', 'contact_email', 'contact_number']
+    clean_exclude = ['password', 'industry']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The industry column may hold either the id or the name.
+        self.industries = {}
+        for industry_id, name in Industry.objects.values_list('industry_id', 'industry_name'):
+            self.industries[industry_id.lower()] = industry_id
+            self.industries.setdefault(name.strip().lower(), industry_id)
+
+    def values(self, row):
+        values = super().values(row)
+        industry_id = self.industries.get(str(values.pop('industry')).strip().lower())
+        if industry_id is None:
+            raise ValidationError({'industry': ["Invalid industry selected"]})
+        values['industry_id'] = industry_id
+        return values
+
+    def after_insert(self, candidates):
+        # register_organisation records each address as a Location too.
+        Location.objects.bulk_create(
+            [Location(town=obj.town, street=obj.street, plot_no=obj.plot_number) for _, _, obj in candidates],
+            ignore_conflicts=True,
+        )
+
+
+IMPORTERS = {
+    'students': StudentImporter,
+    'organisations': OrganisationImporter,
+}
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from .models import Industry, Skill
+from .routers import primary
+
+# Industries and skills change perhaps once a term but every registration
+# and preference form loads them. Each list is kept as ready-to-send JSON
+# with its ETag at two levels:
+#   * the shared cache holds the payload under a version token, and
+#   * each process keeps the last payload it used in memory,
+# so a request costs one cache lookup for the version token and no
+# database work. Saving or deleting an Industry or Skill replaces the token
+# (see signals.py), which makes every process rebuild on its next request.
+
+CATALOGUES = {
+    'industries': lambda: list(Industry.objects.order_by('industry_id').values('industry_id', 'industry_name')),
+    'skills': lambda: list(Skill.objects.order_by('skill_id').values('skill_id', 'name')),
+}
+
+
+class Entry:
+    def __init__(self, version, payload):
+        self.version = version
+        self.payload = payload
+        self.etag = '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+# Payloads of replaced versions are left to expire.
+DATA_TIMEOUT = 24 * 60 * 60
+
+_local = {}
+_lock = threading.Lock()
+
+
+def _version_key(name):
+    return f'catalogue:{name}:version'
+
+
+def _current_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+def get(name):
+    """Return the current Entry (payload bytes and ETag) of a catalogue."""
+    version = _current_version(name)
+    entry = _local.get(name)
+    if entry is not None and entry.version == version:
+        return entry
+
+    data_key = f'catalogue:{name}:{version}'
+    payload = cache.get(data_key)
+    if payload is None:
+        # Cached until the next change, so not read from a lagging replica.
+        with primary():
+            payload = json.dumps(CATALOGUES[name](), separators=(',', ':')).encode()
+        cache.set(data_key, payload, timeout=DATA_TIMEOUT)
+    entry = Entry(version, payload)
+    with _lock:
+        _local[name] = entry
+    return entry
+
+
+def invalidate(name):
+    cache.set(_version_key(name), uuid.uuid4().hex, timeout=None)
+    with _lock:
+        _local.pop(name, None)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Deployment checks, run by `manage.py check --deploy`.
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_caches(app_configs, **kwargs):
+    """The caches must be shared once more than one process serves requests."""
+    local = [alias for alias, config in settings.CACHES.items() if config['BACKEND'] in PROCESS_LOCAL_CACHES]
+    if not local:
+        return []
+    return [Warning(
+        f"Cache aliases {', '.join(local)} are local to each process, so with several workers the "
+        "catalogue and profile caches serve stale JSON after writes, replica pins are lost "
+        "and throttles count per worker.",
+        hint="Set CACHE_REDIS_URL, or run a single process.",
+        id='users.W001',
+    )]
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import Logbook, LogbookCounter
+
+# Pending/viewed logbook counts per organisation and per student, stored in
+# LogbookCounter so a dashboard badge is one primary-key read. Counts move
+# in the same transaction as the logbook rows:
+#   * saving a logbook (signals.py) compares the state it was loaded with
+#     (Logbook.from_db) to the saved one,
+#   * the bulk paths (bulk_create, the mark-viewed UPDATE) call adjust(),
+#   * logbooks go when their student or organisation is deleted; forget()
+#     uncounts them first with one grouped query, which leaves Django free
+#     to delete the logbooks without loading them.
+# rebuild() recounts everything from the logbook table.
+
+STATUSES = ('pending', 'viewed')
+
+
+def org_key(org_id):
+    return f'org:{org_id}'
+
+
+def student_key(student_id):
+    return f'student:{student_id}'
+
+
+def _deltas():
+    return defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+
+
+def _add(deltas, state, n):
+    org_id, student_id, status = state
+    deltas[org_key(org_id)][status] += n
+    deltas[student_key(student_id)][status] += n
+
+
+def _write(deltas):
+    with transaction.atomic():
+        # Fixed order, so concurrent writers lock the rows the same way.
+        for key in sorted(deltas):
+            delta = {status: n for status, n in deltas[key].items() if n}
+            if delta:
+                _apply(key, delta)
+
+
+def adjust(removed=(), added=()):
+    """
+    Move counts from the ``removed`` states to the ``added`` ones; each
+    state is an ``(org_id, student_id, status)`` tuple.
+    """
+    deltas = _deltas()
+    for state in removed:
+        _add(deltas, state, -1)
+    for state in added:
+        _add(deltas, state, 1)
+    _write(deltas)
+
+
+def forget(logbooks):
+    """Uncount a queryset of logbooks that is about to be deleted."""
+    deltas = _deltas()
+    for row in logbooks.order_by().values('org_id', 'student_id', 'status').annotate(n=Count('logbook_id')):
+        _add(deltas, (row['org_id'], row['student_id'], row['status']), -row['n'])
+    _write(deltas)
+
+
+def _apply(key, delta):
+    update = {status: F(status) + n for status, n in delta.items()}
+    if LogbookCounter.objects.filter(key=key).update(**update):
+        return
+    try:
+        with transaction.atomic():
+            LogbookCounter.objects.create(key=key, **delta)
+    except IntegrityError:
+        # Another transaction created it first.
+        LogbookCounter.objects.filter(key=key).update(**update)
+
+
+def counts(key):
+    row = LogbookCounter.objects.filter(key=key).values(*STATUSES).first()
+    return row or dict.fromkeys(STATUSES, 0)
+
+
+def rebuild():
+    """Recount every organisation and student from the logbook table."""
+    per_status = {status: Count('logbook_id', filter=Q(status=status)) for status in STATUSES}
+    rows = []
+    for field, make_key in (('org_id', org_key), ('student_id', student_key)):
+        for row in Logbook.objects.order_by().values(field).annotate(**per_status):
+            rows.append(LogbookCounter(key=make_key(row[field]), **{status: row[status] for status in STATUSES}))
+    with transaction.atomic():
+        LogbookCounter.objects.all().delete()
+        LogbookCounter.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
@@ -0,0 +1,168 @@
+from itertools import islice
+
+import numpy as np
+from django.apps import apps as global_apps
+from django.db import transaction
+
+# Hard filters for a student preference / organisation preference pair:
+#   * the availability window overlaps the placement dates,
+#   * the student's year of study is at least pref_education_level,
+#   * the student has no industry preference, or shares one with the
+#     organisation (its own industry or one of its preferred fields).
+# Pairs that pass are materialised in EligiblePair so matching and the
+# manual matching screens never look at the full cross product.
+
+
+class IntervalIndex:
+    """
+    Date intervals sorted by start date. ``overlapping(start, end)``
+    binary-searches the last interval starting on or before ``end`` and only
+    checks the end dates of those.
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: interval[1])
+        self.keys = [key for key, _, _ in intervals]
+        self.starts = np.array([start for _, start, _ in intervals], dtype="datetime64[D]")
+        self.ends = np.array([end for _, _, end in intervals], dtype="datetime64[D]")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def overlapping(self, start, end):
+        stop = np.searchsorted(self.starts, np.datetime64(end, "D"), side="right")
+        hits = np.flatnonzero(self.ends[:stop] >= np.datetime64(start, "D"))
+        return [self.keys[k] for k in hits]
+
+
+def _student_rows(apps, pref_ids=None, **filters):
+    """Return ``{pref_id: (from, to, year, industries)}``, of the preferences matching ``filters``."""
+    StudentPreference = apps.get_model("users", "StudentPreference")
+    PreferredIndustry = apps.get_model("users", "PreferredIndustry")
+    prefs = StudentPreference.objects.filter(**filters)
+    industries = PreferredIndustry.objects.all()
+    if pref_ids is not None:
+        prefs = prefs.filter(student_pref_id__in=pref_ids)
+        industries = industries.filter(student_id__in=pref_ids)
+    elif filters:
+        industries = industries.filter(student__in=prefs)
+
+    rows = {
+        pref_id: (available_from, available_to, year, set())
+        for pref_id, available_from, available_to, year in prefs.values_list(
+            "student_pref_id", "available_from", "available_to", "student__year_of_study"
+        )
+    }
+    for pref_id, industry_id in industries.values_list("student_id", "industry_id"):
+        if pref_id in rows:
+            rows[pref_id][3].add(industry_id)
+    return rows
+
+
+def _organisation_rows(apps, pref_ids=None, **filters):
+    """Return ``{pref_id: (start, end, level, industries)}``, of the preferences matching ``filters``."""
+    Industry = apps.get_model("users", "Industry")
+    OrganisationPreference = apps.get_model("users", "OrganisationPreference")
+    PreferredField = apps.get_model("users", "PreferredField")
+    prefs = OrganisationPreference.objects.filter(**filters)
+    fields = PreferredField.objects.all()
+    if pref_ids is not None:
+        prefs = prefs.filter(pref_id__in=pref_ids)
+        fields = fields.filter(preference_id__in=pref_ids)
+    elif filters:
+        fields = fields.filter(preference__in=prefs)
+
+    rows = {
+        pref_id: (start_date, end_date, level, {industry_id})
+        for pref_id, start_date, end_date, level, industry_id in prefs.values_list(
+            "pref_id", "start_date", "end_date", "pref_education_level", "organisation__industry_id"
+        )
+    }
+    # Preferred fields are stored by industry name.
+    industry_ids_by_name = {
+        name.strip().lower(): industry_id
+        for industry_id, name in Industry.objects.values_list("industry_id", "industry_name")
+    }
+    for pref_id, field_name in fields.values_list("preference_id", "field_name"):
+        industry_id = industry_ids_by_name.get(field_name.strip().lower())
+        if industry_id is not None and pref_id in rows:
+            rows[pref_id][3].add(industry_id)
+    return rows
+
+
+def _passes(student, organisation):
+    """Year and industry filters; the date filter is done by IntervalIndex."""
+    _, _, year, student_industries = student
+    _, _, level, organisation_industries = organisation
+    if year < level:
+        return False
+    return not student_industries or bool(student_industries & organisation_industries)
+
+
+def _pairs(students, organisations):
+    index = IntervalIndex((pref_id, row[0], row[1]) for pref_id, row in organisations.items())
+    for student_pref_id, student in students.items():
+        for org_pref_id in index.overlapping(student[0], student[1]):
+            if _passes(student, organisations[org_pref_id]):
+                yield student_pref_id, org_pref_id
+
+
+def rebuild(apps=global_apps, batch_size=5000):
+    """Recompute the whole EligiblePair table. Returns the number of pairs."""
+    EligiblePair = apps.get_model("users", "EligiblePair")
+    pairs = _pairs(_student_rows(apps), _organisation_rows(apps))
+    count = 0
+    with transaction.atomic():
+        EligiblePair.objects.all().delete()
+        # Insert as the pairs are generated; the table can be far larger
+        # than the preferences it is built from.
+        while batch := [
+            EligiblePair(student_preference_id=s, organisation_preference_id=o)
+            for s, o in islice(pairs, batch_size)
+        ]:
+            EligiblePair.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+def refresh_students(pref_ids, apps=global_apps):
+    """Recompute the eligible pairs of the given student preferences."""
+    EligiblePair = apps.get_model("users", "EligiblePair")
+    students = _student_rows(apps, pref_ids)
+    pairs = []
+    if students:
+        # One fetch for all the students: the database narrows the candidates
+        # down to the union of their dates and years, and _pairs() checks
+        # each student against them.
+        froms, tos, years, _ = zip(*students.values())
+        organisations = _organisation_rows(
+            apps, start_date__lte=max(tos), end_date__gte=min(froms), pref_education_level__lte=max(years),
+        )
+        pairs = [
+            EligiblePair(student_preference_id=s, organisation_preference_id=o)
+            for s, o in _pairs(students, organisations)
+        ]
+    with transaction.atomic():
+        EligiblePair.objects.filter(student_preference_id__in=pref_ids).delete()
+        EligiblePair.objects.bulk_create(pairs)
+    return pairs
+
+
+def refresh_organisations(pref_ids, apps=global_apps):
+    """Recompute the eligible pairs of the given organisation preferences."""
+    EligiblePair = apps.get_model("users", "EligiblePair")
+    organisations = _organisation_rows(apps, pref_ids)
+    pairs = []
+    if organisations:
+        starts, ends, levels, _ = zip(*organisations.values())
+        students = _student_rows(
+            apps, available_from__lte=max(ends), available_to__gte=min(starts), student__year_of_study__gte=min(levels),
+        )
+        pairs = [
+            EligiblePair(student_preference_id=s, organisation_preference_id=o)
+            for s, o in _pairs(students, organisations)
+        ]
+    with transaction.atomic():
+        EligiblePair.objects.filter(organisation_preference_id__in=pref_ids).delete()
+        EligiblePair.objects.bulk_create(pairs)
+    return pairs
@@ -0,0 +1,249 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from functools import partial
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .authentication import ADMIN, ORGANISATION, STUDENT
+
+# In-process publish/subscribe behind the dashboards' event stream
+# (views.event_stream). Writes publish small deltas - a logbook submitted
+# or viewed, a match saved or removed - after their transaction commits, and
+# every open stream whose channels the event is addressed to receives it.
+#
+# Channels are "admin", "organisation:<org_id>" and "student:<student_id>";
+# a token's role and id pick the one a stream listens on. Every event gets
+# an id "<boot>:<n>" and the last HISTORY events are kept, so a client that
+# reconnects with Last-Event-ID is sent what it missed. When those events
+# are gone, or the id is from before a restart, it gets a "reset" event and
+# reloads its lists instead.
+#
+# The bus lives in one process: streams only see events published by the
+# worker serving them. EventBus is the piece to replace with a shared
+# broker when the backend runs several workers.
+
+HISTORY = 1000
+# Events a slow stream may have waiting; beyond that it is closed and the
+# client catches up from HISTORY when it reconnects.
+QUEUE_SIZE = 256
+# Seconds between keep-alive comments on an idle stream.
+HEARTBEAT = 15
+# Milliseconds the browser waits before reconnecting.
+RETRY_MS = 3000
+# Served over WSGI a stream holds a worker thread, so it ends after this
+# many seconds and the browser reconnects.
+WSGI_STREAM_SECONDS = 25
+
+_encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class Event:
+    __slots__ = ('id', 'number', 'kind', 'channels', 'message')
+
+    def __init__(self, boot, number, kind, data, channels):
+        self.id = event_id = f'{boot}:{number}'
+        self.number = number
+        self.kind = kind
+        self.channels = channels
+        # Encoded once, whatever the number of streams.
+        self.message = f'id: {event_id}\nevent: {kind}\ndata: {_encoder.encode(data)}\n\n'
+
+
+class Subscription:
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.overflowed = False
+
+    def wants(self, event):
+        return not self.channels.isdisjoint(event.channels)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read by a coroutine; events may be published from any thread."""
+
+    def __init__(self, channels):
+        super().__init__(channels)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's event loop has already closed.
+            pass
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Return the next event, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SyncSubscription(Subscription):
+    """Subscription read by a worker thread (streams served over WSGI)."""
+
+    def __init__(self, channels):
+        super().__init__(channels)
+        self._queue = queue.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    def __init__(self, history=HISTORY):
+        self._lock = threading.Lock()
+        self._boot = uuid.uuid4().hex[:8]
+        self._numbers = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+
+    def publish(self, kind, data, channels):
+        with self._lock:
+            event = Event(self._boot, next(self._numbers), kind, data, frozenset(channels))
+            self._history.append(event)
+            # Delivery only queues the event, so it is done under the lock
+            # and every stream sees events in publishing order.
+            for subscription in self._subscribers:
+                if subscription.wants(event):
+                    subscription.deliver(event)
+        return event
+
+    def subscribe(self, subscription, last_event_id=None):
+        """
+        Start delivering events to ``subscription``. Returns the events after
+        ``last_event_id`` it should be sent first, or None if they are no
+        longer known.
+        """
+        with self._lock:
+            self._subscribers.add(subscription)
+            if not last_event_id:
+                return []
+            boot, _, number = last_event_id.partition(':')
+            if boot != self._boot or not number.isdigit():
+                return None
+            number = int(number)
+            if self._history and self._history[0].number > number + 1:
+                return None
+            return [event for event in self._history if event.number > number and subscription.wants(event)]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+bus = EventBus()
+
+
+def _opening(backlog):
+    yield f'retry: {RETRY_MS}\n\n'
+    if backlog is None:
+        yield 'event: reset\ndata: {}\n\n'
+        return
+    for event in backlog:
+        yield event.message
+
+
+async def stream(channels, last_event_id=None):
+    """The text/event-stream body for ``channels``, until the client leaves."""
+    subscription = AsyncSubscription(channels)
+    backlog = bus.subscribe(subscription, last_event_id)
+    try:
+        for message in _opening(backlog):
+            yield message
+        while not subscription.overflowed:
+            event = await subscription.get(HEARTBEAT)
+            yield ': keep-alive\n\n' if event is None else event.message
+    finally:
+        bus.unsubscribe(subscription)
+
+
+def bounded_stream(channels, last_event_id=None):
+    """Like stream(), for a worker thread; ends after WSGI_STREAM_SECONDS."""
+    subscription = SyncSubscription(channels)
+    backlog = bus.subscribe(subscription, last_event_id)
+    deadline = time.monotonic() + WSGI_STREAM_SECONDS
+    try:
+        yield from _opening(backlog)
+        while not subscription.overflowed and (left := deadline - time.monotonic()) > 0:
+            event = subscription.get(min(HEARTBEAT, left))
+            if event is not None:
+                yield event.message
+    finally:
+        bus.unsubscribe(subscription)
+
+
+def channels(org_id=None, student_id=None):
+    """The channels of an event about an organisation and/or a student."""
+    names = [ADMIN]
+    if org_id is not None:
+        names.append(f'{ORGANISATION}:{org_id}')
+    if student_id is not None:
+        names.append(f'{STUDENT}:{student_id}')
+    return names
+
+
+def user_channels(user):
+    return [ADMIN] if user.is_admin else [f'{user.role}:{user.id}']
+
+
+def publish_on_commit(kind, data, channels):
+    transaction.on_commit(partial(bus.publish, kind, data, channels))
+
+
+def logbook_submitted(logbook):
+    publish_on_commit('logbook.submitted', {
+        'logbook_id': logbook.logbook_id,
+        'student_id': logbook.student_id_id,
+        'org_id': logbook.org_id_id,
+        'week_number': logbook.week_number,
+        'submitted_at': logbook.submitted_at,
+    }, channels(logbook.org_id_id, logbook.student_id_id))
+
+
+def logbook_viewed(logbook_id, org_id, student_id, viewed_at):
+    publish_on_commit('logbook.viewed', {
+        'logbook_id': logbook_id,
+        'student_id': student_id,
+        'org_id': org_id,
+        'viewed_at': viewed_at,
+    }, channels(org_id, student_id))
+
+
+def _match_event(kind, match):
+    student_id = match.student_id
+    data = {'student_pref_id': match.student_preference_id, 'student_id': student_id, 'org_id': match.organisation_id}
+    if kind == 'match.saved':
+        data['score'] = match.score
+    publish_on_commit(kind, data, channels(match.organisation_id, student_id))
+
+
+def match_saved(match):
+    _match_event('match.saved', match)
+
+
+def match_deleted(match):
+    _match_event('match.deleted', match)
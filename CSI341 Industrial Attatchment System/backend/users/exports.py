@@ -0,0 +1,185 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .authentication import ORGANISATION, STUDENT
+from .models import Logbook, Organisation, Student, StudentMatch
+
+# Streaming CSV/NDJSON exports. Rows are read with values_list().iterator(),
+# which fetches them from the database cursor in chunks without building
+# model instances or caching the queryset, and are encoded and sent a block
+# at a time. A worker holds one chunk of an export in memory whatever its
+# size, and the header goes out before the query has run.
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+# Rows joined into one piece of the response body.
+BLOCK_ROWS = 500
+
+
+class Export:
+    """
+    One exportable table: ``columns`` maps output names to values() paths,
+    ``scope(queryset, user)`` narrows the rows to what the user may see (or
+    returns None if the user may not export it at all), and ``filters`` are
+    the query parameters accepted as exact-match filters; a bad filter value
+    raises ValidationError.
+    """
+
+    def __init__(self, queryset, columns, ordering, scope, filters=()):
+        self.queryset = queryset
+        self.columns = columns
+        self.ordering = ordering
+        self.scope = scope
+        self.filters = filters
+
+    def rows(self, user, params):
+        queryset = self.scope(self.queryset(), user)
+        if queryset is None:
+            return None
+        for name in self.filters:
+            if params.get(name):
+                # Converted up front: a bad value must fail before streaming starts.
+                field = queryset.model._meta.get_field(self.columns[name])
+                queryset = queryset.filter(**{self.columns[name]: field.to_python(params[name])})
+        return queryset.order_by(*self.ordering).values_list(*self.columns.values()).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _admin_only(queryset, user):
+    return queryset if user.is_admin else None
+
+
+def _own_logbooks(queryset, user):
+    if user.role == STUDENT:
+        return queryset.filter(student_id=user.id)
+    if user.role == ORGANISATION:
+        return queryset.filter(org_id=user.id)
+    return queryset
+
+
+def _own_matches(queryset, user):
+    if user.role == ORGANISATION:
+        return queryset.filter(organisation_id=user.id)
+    if user.role == STUDENT:
+        return queryset.filter(student_preference__student_id=user.id)
+    return queryset
+
+
+EXPORTS = {
+    'logbooks': Export(
+        Logbook.objects.all,
+        {
+            'logbook_id': 'logbook_id',
+            'student_id': 'student_id',
+            'first_name': 'student_id__first_name',
+            'last_name': 'student_id__last_name',
+            'org_id': 'org_id',
+            'org_name': 'org_id__org_name',
+            'week_number': 'week_number',
+            'log_entry': 'log_entry',
+            'submitted_at': 'submitted_at',
+            'status': 'status',
+            'viewed_at': 'viewed_at',
+        },
+        ordering=('submitted_at', 'logbook_id'),
+        scope=_own_logbooks,
+        filters=('student_id', 'org_id', 'week_number', 'status'),
+    ),
+    'students': Export(
+        Student.objects.all,
+        {
+            'student_id': 'student_id',
+            'first_name': 'first_name',
+            'last_name': 'last_name',
+            'year_of_study': 'year_of_study',
+            'student_email': 'student_email',
+            'student_contact_number': 'student_contact_number',
+        },
+        ordering=('student_id',),
+        scope=_admin_only,
+        filters=('year_of_study',),
+    ),
+    'organisations': Export(
+        Organisation.objects.all,
+        {
+            'org_id': 'org_id',
+            'org_name': 'org_name',
+            'industry': 'industry_id',
+            'town': 'town',
+            'street': 'street',
+            'plot_number': 'plot_number',
+            'contact_number': 'contact_number',
+            'contact_email': 'contact_email',
+        },
+        ordering=('org_id',),
+        scope=_admin_only,
+        filters=('industry', 'town'),
+    ),
+    'matches': Export(
+        StudentMatch.objects.all,
+        {
+            'student_pref_id': 'student_preference_id',
+            'student_id': 'student_preference__student_id',
+            'first_name': 'student_preference__student__first_name',
+            'last_name': 'student_preference__student__last_name',
+            'org_id': 'organisation_id',
+            'org_name': 'organisation__org_name',
+            'score': 'score',
+            'matched_at': 'matched_at',
+            'admin_note': 'admin_note',
+        },
+        ordering=('student_preference_id',),
+        scope=_own_matches,
+        filters=('org_id',),
+    ),
+}
+
+
+class _Echo:
+    """File-like object whose write() hands back what csv.writer wrote."""
+
+    def write(self, value):
+        return value
+
+
+def _blocks(lines):
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= BLOCK_ROWS:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+# Spreadsheets run a cell starting with one of these as a formula; a
+# leading ' makes them show it as text. Only text is escaped, so negative
+# numbers stay numbers.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    yield from _blocks(writer.writerow([_cell(value) for value in row]) for row in rows)
+
+
+def encode_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield from _blocks(encoder.encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
@@ -0,0 +1,104 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import IdSequence, Logbook, StudentPreference
+
+# Primary keys handed out from IdSequence rows instead of count()+1 or
+# random strings. Each allocation is a single-row UPDATE ... SET value =
+# value + n followed by a read of that row, inside one transaction: the
+# UPDATE takes the row lock (the write lock on SQLite) before anything is
+# read, so concurrent callers queue up instead of seeing the same value.
+# Sequences are created on first use, seeded from the largest key already
+# in the table so existing identifiers keep their meaning.
+
+BASE36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+LOGBOOK_ID_LENGTH = 8
+LOGBOOK_SEQUENCE = 'logbook'
+# Random keys from before the sequence (see generate_random_logbook_id) are
+# spread up to ZZZZZZZZ, so continuing after the largest one could leave
+# next to no ids. Keys in the top 36**6 of the id space are left out of the
+# seed, which keeps at least that many ids for the sequence; logbook_ids()
+# skips the few random keys among them.
+LOGBOOK_SEED_LIMIT = 36 ** LOGBOOK_ID_LENGTH - 36 ** 6
+
+
+class SequenceExhausted(Exception):
+    pass
+
+
+def allocate(name, count=1, floor=None):
+    """
+    Reserve ``count`` consecutive values of sequence ``name`` and return the
+    first. ``floor()`` gives the last value already in use when the sequence
+    does not exist yet.
+    """
+    with transaction.atomic():
+        if not IdSequence.objects.filter(name=name).update(value=F('value') + count):
+            try:
+                with transaction.atomic():
+                    IdSequence.objects.create(name=name, value=(floor() if floor else 0) + count)
+            except IntegrityError:
+                # Another caller created it first.
+                IdSequence.objects.filter(name=name).update(value=F('value') + count)
+        last = IdSequence.objects.get(name=name).value
+    return last - count + 1
+
+
+def to_base36(value, width=LOGBOOK_ID_LENGTH):
+    digits, rest = '', value
+    while rest:
+        rest, remainder = divmod(rest, 36)
+        digits = BASE36[remainder] + digits
+    if len(digits) > width:
+        raise SequenceExhausted(f"{value} does not fit in {width} base-36 digits.")
+    return digits.rjust(width, '0')
+
+
+def from_base36(text):
+    return int(text, 36)
+
+
+def _last_logbook_number():
+    # Fixed-width upper-case base 36 sorts like the numbers it encodes, so
+    # the largest key below the limit is the one to continue from.
+    last = (
+        Logbook.objects.filter(logbook_id__regex=r'^[0-9A-Z]{8}$', logbook_id__lt=to_base36(LOGBOOK_SEED_LIMIT))
+        .order_by('-logbook_id').values_list('logbook_id', flat=True).first()
+    )
+    return from_base36(last) if last else 0
+
+
+def logbook_ids(count):
+    """
+    Return ``count`` new, increasing logbook ids. Raises SequenceExhausted
+    once the ids no longer fit in LOGBOOK_ID_LENGTH characters.
+    """
+    ids = []
+    while len(ids) < count:
+        wanted = count - len(ids)
+        first = allocate(LOGBOOK_SEQUENCE, wanted, floor=_last_logbook_number)
+        block = [to_base36(value) for value in range(first, first + wanted)]
+        taken = set(Logbook.objects.filter(logbook_id__in=block).values_list('logbook_id', flat=True))
+        ids.extend(logbook_id for logbook_id in block if logbook_id not in taken)
+    return ids
+
+
+def next_logbook_id():
+    return logbook_ids(1)[0]
+
+
+def _last_preference_number(student_id):
+    prefix = f'{student_id}_PREF'
+    numbers = [
+        int(pref_id[len(prefix):])
+        for pref_id in StudentPreference.objects.filter(student_pref_id__startswith=prefix)
+        .values_list('student_pref_id', flat=True)
+        if pref_id[len(prefix):].isdigit()
+    ]
+    return max(numbers, default=0)
+
+
+def next_preference_id(student_id):
+    """Return the next ``<student_id>_PREFnnn`` id; numbers are never reused."""
+    number = allocate(f'student_pref:{student_id}', floor=lambda: _last_preference_number(student_id))
+    return f'{student_id}_PREF{number:03d}'
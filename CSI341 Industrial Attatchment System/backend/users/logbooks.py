@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, events
+from .ids import logbook_ids
+from .models import DUPLICATE_WEEK, Logbook, Organisation, Student
+from .search import index_logbooks
+from .serializers import LogbookEntrySerializer
+
+# Batch operations on logbooks. Both take a list of items and return one
+# result per item, in order, so a client can tell which ones went through.
+
+MAX_BATCH = 500
+
+
+def mark_viewed(logbook_ids, org_id=None):
+    """
+    Mark the given logbooks viewed with one UPDATE. A status change does not
+    touch the entry text, so Logbook.full_clean is not needed.
+
+    Returns ``[{"logbook_id": ..., "result": "viewed" | "already_viewed" |
+    "not_found"}]``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        logbooks = Logbook.objects.filter(logbook_id__in=logbook_ids)
+        if org_id is not None:
+            logbooks = logbooks.filter(org_id=org_id)
+        # logbook_id -> (org_id, student_id, status), the counted state.
+        states = {row[0]: row[1:] for row in logbooks.select_for_update().values_list(
+            'logbook_id', 'org_id', 'student_id', 'status',
+        )}
+        pending = [logbook_id for logbook_id, state in states.items() if state[2] == 'pending']
+        if pending:
+            Logbook.objects.filter(logbook_id__in=pending).update(status='viewed', viewed_at=now)
+            # update() sends no signals.
+            counters.adjust(
+                removed=[states[logbook_id] for logbook_id in pending],
+                added=[(*states[logbook_id][:2], 'viewed') for logbook_id in pending],
+            )
+            for logbook_id in pending:
+                events.logbook_viewed(logbook_id, *states[logbook_id][:2], now)
+
+    results = []
+    for logbook_id in logbook_ids:
+        if logbook_id not in states:
+            results.append({"logbook_id": logbook_id, "result": "not_found"})
+        elif states[logbook_id][2] == 'pending':
+            results.append({"logbook_id": logbook_id, "result": "viewed", "viewed_at": now})
+        else:
+            results.append({"logbook_id": logbook_id, "result": "already_viewed"})
+    return results
+
+
+def submit_logbooks(entries):
+    """
+    Validate and create several logbook entries at once, e.g. a student
+    back-filling missed weeks. Students, organisations and already submitted
+    weeks are looked up once for the whole batch. A week submitted by a
+    concurrent request meanwhile fails the batch on the unique constraint,
+    with IntegrityError.
+
+    Returns ``(results, created)`` where each result is
+    ``{"index": i, "result": "created", "logbook_id": ...}`` or
+    ``{"index": i, "result": "error", "errors": {...}}``.
+    """
+    results = [None] * len(entries)
+    valid = []
+    for index, entry in enumerate(entries):
+        serializer = LogbookEntrySerializer(data=entry)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "result": "error", "errors": serializer.errors}
+
+    student_ids = {data['student_id'] for _, data in valid}
+    students = set(Student.objects.filter(student_id__in=student_ids).values_list('student_id', flat=True))
+    organisations = set(
+        Organisation.objects.filter(org_id__in={data['org_id'] for _, data in valid}).values_list('org_id', flat=True)
+    )
+    submitted = set(
+        Logbook.objects.filter(student_id__in=students).values_list('student_id', 'week_number')
+    )
+
+    accepted = []
+    for index, data in valid:
+        errors = {}
+        if data['student_id'] not in students:
+            errors['student_id'] = ["Student ID does not exist."]
+        if data['org_id'] not in organisations:
+            errors['org_id'] = ["Organisation ID does not exist."]
+        week = (data['student_id'], data['week_number'])
+        if week in submitted:
+            errors['week_number'] = [DUPLICATE_WEEK]
+        if errors:
+            results[index] = {"index": index, "result": "error", "errors": errors}
+            continue
+        submitted.add(week)
+        accepted.append((index, data))
+
+    # One sequence allocation for the whole batch.
+    logbooks = []
+    for (index, data), logbook_id in zip(accepted, logbook_ids(len(accepted)) if accepted else []):
+        logbooks.append(Logbook(
+            logbook_id=logbook_id,
+            student_id_id=data['student_id'],
+            org_id_id=data['org_id'],
+            week_number=data['week_number'],
+            log_entry=data['log_entry'],
+        ))
+        results[index] = {"index": index, "result": "created", "logbook_id": logbook_id}
+
+    with transaction.atomic():
+        Logbook.objects.bulk_create(logbooks)
+        index_logbooks(logbooks)
+        counters.adjust(added=[logbook.counter_state() for logbook in logbooks])
+        for logbook in logbooks:
+            events.logbook_submitted(logbook)
+    return results, len(logbooks)
@@ -0,0 +1,405 @@
+import asyncio
+import io
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users.authentication import ADMIN, issue_token
+from users.matching import MatchingEngine
+from users.models import (
+    EligiblePair,
+    Logbook,
+    Organisation,
+    OrganisationPreference,
+    Student,
+    StudentPreference,
+)
+
+
+def git_revision():
+    """Return ``(commit, dirty)`` of the working tree, or (None, None)."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def summarise(timings_ms, elapsed_s):
+    timings = np.array(timings_ms)
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+    return {
+        'requests': len(timings),
+        'mean_ms': round(float(timings.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(timings.max()), 3),
+        'throughput_rps': round(len(timings) / elapsed_s, 1) if elapsed_s else None,
+    }
+
+
+class QueryDelay:
+    """Execute wrapper sleeping before every query, like a database across the network."""
+
+    def __init__(self, ms):
+        self.seconds = ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        for alias in connections:
+            self.install(connections[alias])
+        connection_created.connect(self.install)
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self.install)
+
+
+def wsgi_get(app, path, params, authorization):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': urlencode(params),
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_AUTHORIZATION': authorization,
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+    status = []
+    body = app(environ, lambda line, headers: status.append(int(line.split()[0])))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return status[0]
+
+
+async def asgi_get(app, path, params, authorization):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params).encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    request = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = []
+
+    async def receive():
+        if request:
+            return request.pop()
+        # No disconnect: Django stops listening once the response is sent.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot API endpoints and the matching engine against the "
+        "configured database and report latency percentiles and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=10, help="Untimed requests per endpoint.")
+        parser.add_argument('--rounds', type=int, default=3, help="Timed runs of each matching step.")
+        parser.add_argument('--endpoints', nargs='*', help="Only run these URL names.")
+        parser.add_argument('--skip-matching', action='store_true')
+        parser.add_argument('--label', default='', help="Free text stored with the results.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Print the change against an earlier --output file.")
+        parser.add_argument(
+            '--accept-encoding', default='gzip, br',
+            help="Accept-Encoding of the endpoint requests; '' asks for uncompressed bodies.",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+',
+            help="Also serve the endpoints with async twins through the WSGI and the ASGI handler "
+                 "to this many concurrent clients, e.g. 1 8 32.",
+        )
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=4, help="Worker threads of the WSGI server in --concurrency runs.",
+        )
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=0.0,
+            help="Delay added to every query in --concurrency runs, for a database across the network.",
+        )
+
+    def handle(self, *args, **options):
+        if not StudentPreference.objects.exists() or not OrganisationPreference.objects.exists():
+            raise CommandError("The database is empty; run generate_cohort first.")
+
+        commit, dirty = git_revision()
+        results = {
+            'commit': commit,
+            'accept_encoding': options['accept_encoding'],
+            'dirty': dirty,
+            'label': options['label'],
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (Student, StudentPreference, Organisation, OrganisationPreference, Logbook, EligiblePair)
+            },
+            'endpoints': self.run_endpoints(options),
+            'matching': {} if options['skip_matching'] else self.run_matching(options['rounds']),
+            'concurrency': self.run_concurrency(options) if options['concurrency'] else {},
+        }
+
+        self.report(results)
+        if options['compare']:
+            self.compare(results, json.loads(Path(options['compare']).read_text()))
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def endpoints(self):
+        """``{url name: (path, query params)}`` for the read endpoints the screens hit most."""
+        org_id = Logbook.objects.values_list('org_id', flat=True).first() or Organisation.objects.values_list('pk', flat=True).first()
+        org_pref_id = OrganisationPreference.objects.values_list('pk', flat=True).first()
+        student_pref_id = StudentPreference.objects.values_list('pk', flat=True).first()
+        return {
+            'list_all_students': (reverse('list_all_students'), {}),
+            'list_all_organisations': (reverse('list_all_organisations'), {}),
+            'student_preference_list': (reverse('student_preference_list'), {}),
+            'logbook': (reverse('logbook'), {}),
+            'org_logbooks': (reverse('org_logbooks', args=[org_id]), {}),
+            'list_organisation_preferences': (reverse('list_organisation_preferences', args=[org_id]), {}),
+            'student_recommendations': (reverse('student_recommendations', args=[student_pref_id]), {}),
+            'organisation_candidates': (reverse('organisation_candidates', args=[org_pref_id]), {}),
+        }
+
+    def async_endpoints(self):
+        """``{url name: (path, async path, query params)}`` for the endpoints with a twin in async_views."""
+        org_id = Logbook.objects.values_list('org_id', flat=True).first() or Organisation.objects.values_list('pk', flat=True).first()
+        return {
+            'student_preference_list': (
+                reverse('student_preference_list'), reverse('async_student_preference_list'), {},
+            ),
+            'org_logbooks': (
+                reverse('org_logbooks', args=[org_id]), reverse('async_org_logbooks', args=[org_id]), {},
+            ),
+            'list_organisation_preferences': (
+                reverse('list_organisation_preferences', args=[org_id]),
+                reverse('async_list_organisation_preferences', args=[org_id]),
+                {},
+            ),
+            'update_organisation_profile': (
+                reverse('update_organisation_profile', args=[org_id]),
+                reverse('async_organisation_profile', args=[org_id]),
+                {},
+            ),
+            'get_industries': (reverse('get_industries'), reverse('async_get_industries'), {}),
+        }
+
+    def run_endpoints(self, options):
+        endpoints = self.endpoints()
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints) - set(self.async_endpoints())
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = {name: endpoints[name] for name in options['endpoints'] if name in endpoints}
+
+        # Token checks are a signature verification; an admin token reaches every endpoint.
+        client = Client(
+            HTTP_AUTHORIZATION='Bearer ' + issue_token(ADMIN, 'benchmark')['token'],
+            HTTP_ACCEPT_ENCODING=options['accept_encoding'],
+        )
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], ENDPOINT_BUDGETS_STRICT=False):
+            for name, (path, params) in endpoints.items():
+                for _ in range(options['warmup']):
+                    client.get(path, params)
+                timings, cpu, queries = [], [], []
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    start, start_cpu = time.perf_counter(), time.thread_time()
+                    response = client.get(path, params)
+                    # The test client serves the request in this thread.
+                    cpu.append((time.thread_time() - start_cpu) * 1000)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f"{name} returned {response.status_code}: {response.content[:200]!r}")
+                    queries.append(int(response.get('X-Query-Count', 0)))
+                results[name] = summarise(timings, time.perf_counter() - started)
+                results[name]['queries'] = max(queries)
+                results[name]['cpu_ms'] = round(float(np.mean(cpu)), 3)
+                # Body size as sent, after any Content-Encoding.
+                results[name]['bytes'] = len(response.content)
+                results[name]['encoding'] = response.get('Content-Encoding', 'identity')
+        return results
+
+    def run_concurrency(self, options):
+        """
+        Serve each async-capable endpoint to 1..N closed-loop clients, once
+        through a WSGI handler with a fixed pool of worker threads and once
+        through the ASGI handler on one event loop, and return both
+        summaries per client count.
+        """
+        endpoints = self.async_endpoints()
+        if options['endpoints']:
+            endpoints = {name: endpoints[name] for name in options['endpoints'] if name in endpoints}
+        authorization = 'Bearer ' + issue_token(ADMIN, 'benchmark')['token']
+        total = options['requests']
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], ENDPOINT_BUDGETS_STRICT=False), \
+                QueryDelay(options['db_latency_ms']):
+            wsgi, asgi = WSGIHandler(), ASGIHandler()
+            for name, (path, async_path, params) in endpoints.items():
+                results[name] = {'wsgi': {}, 'asgi': {}}
+                for clients in options['concurrency']:
+                    results[name]['wsgi'][clients] = self.closed_loop_wsgi(
+                        wsgi, path, params, authorization, clients, options['wsgi_threads'], total,
+                    )
+                    results[name]['asgi'][clients] = asyncio.run(
+                        self.closed_loop_asgi(asgi, async_path, params, authorization, clients, total)
+                    )
+        return results
+
+    def closed_loop_wsgi(self, app, path, params, authorization, clients, threads, total):
+        # Clients wait for their previous response; the pool is the server.
+        timings, remaining, lock = [], [total], threading.Lock()
+
+        def client(pool):
+            while True:
+                with lock:
+                    if not remaining[0]:
+                        return
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                status = pool.submit(wsgi_get, app, path, params, authorization).result()
+                timings.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    raise CommandError(f"{path} returned {status}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool, ThreadPoolExecutor(clients) as users:
+            for future in [users.submit(client, pool) for _ in range(clients)]:
+                future.result()
+        return summarise(timings, time.perf_counter() - started)
+
+    async def closed_loop_asgi(self, app, path, params, authorization, clients, total):
+        timings, remaining = [], [total]
+
+        async def client():
+            while remaining[0]:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                status = await asgi_get(app, path, params, authorization)
+                timings.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    raise CommandError(f"{path} returned {status}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return summarise(timings, time.perf_counter() - started)
+
+    def run_matching(self, rounds):
+        steps = {
+            'load': lambda engine: engine.load(),
+            'score': lambda engine: engine.score(),
+            'ranked_candidates': lambda engine: engine.ranked_candidates(k=5),
+            'assign': lambda engine: engine.assign(),
+        }
+        timings = {name: [] for name in steps}
+        for _ in range(rounds):
+            engine = MatchingEngine()
+            for name, step in steps.items():
+                start = time.perf_counter()
+                step(engine)
+                timings[name].append((time.perf_counter() - start) * 1000)
+        return {name: summarise(values, None) for name, values in timings.items()}
+
+    def report(self, results):
+        revision = (results['commit'] or 'unknown')[:10] + (' (dirty)' if results['dirty'] else '')
+        self.stdout.write(f"{revision} on {results['database']}: {results['rows']}")
+        self.stdout.write(
+            f"{'endpoint':32} {'p50':>9} {'p90':>9} {'p99':>9} {'req/s':>8} {'queries':>8} {'cpu ms':>8} {'bytes':>9}"
+        )
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:32} {row['p50_ms']:9.2f} {row['p90_ms']:9.2f} {row['p99_ms']:9.2f} "
+                f"{row['throughput_rps']:8.1f} {row['queries']:8d} {row['cpu_ms']:8.2f} {row['bytes']:9d}"
+            )
+        for name, row in results['matching'].items():
+            self.stdout.write(f"{'matching.' + name:32} {row['p50_ms']:9.2f} {row['max_ms']:9.2f} (p50/max ms)")
+        if results['concurrency']:
+            self.stdout.write(
+                f"{'endpoint':32} {'clients':>7} {'wsgi req/s':>11} {'asgi req/s':>11} {'wsgi p99':>9} {'asgi p99':>9}"
+            )
+        for name, modes in results['concurrency'].items():
+            for clients, wsgi in modes['wsgi'].items():
+                asgi = modes['asgi'][clients]
+                self.stdout.write(
+                    f"{name:32} {clients:7d} {wsgi['throughput_rps']:11.1f} {asgi['throughput_rps']:11.1f} "
+                    f"{wsgi['p99_ms']:9.2f} {asgi['p99_ms']:9.2f}"
+                )
+
+    def compare(self, results, baseline):
+        self.stdout.write(
+            f"Change against {(baseline.get('commit') or 'unknown')[:10]} (p50 / p99 / cpu ms / bytes):"
+        )
+        for section in ('endpoints', 'matching'):
+            for name, row in results[section].items():
+                before = baseline.get(section, {}).get(name)
+                if not before:
+                    continue
+                # Older result files have no cpu_ms or bytes.
+                deltas = [
+                    f"{(row[key] - before[key]) / before[key] * 100:+.1f}%" if before.get(key) else 'n/a'
+                    for key in ('p50_ms', 'p99_ms', 'cpu_ms', 'bytes') if key in row
+                ]
+                self.stdout.write(f"  {name:32} " + ' '.join(f"{delta:>9}" for delta in deltas))
@@ -0,0 +1,48 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import IMPORTERS, ImportFormatError, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Register students or organisations from a CSV or NDJSON file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='fmt', choices=['csv', 'ndjson'], help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help="Password hashing threads (default: CPU count).")
+        parser.add_argument('--errors', help="Write the per-row error report to this JSON file.")
+        parser.add_argument(
+            '--keep-hashes', action='store_true',
+            help="Store passwords that already are hashes (e.g. exported from another instance) as they are.",
+        )
+
+    def handle(self, *args, kind, path, fmt, batch_size, workers, keep_hashes, **options):
+        fmt = fmt or detect_format(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        importer = IMPORTERS[kind](batch_size=batch_size, workers=workers, keep_hashes=keep_hashes)
+        try:
+            if path == '-':
+                report = importer.run(read_rows(sys.stdin.buffer, fmt))
+            else:
+                with open(path, 'rb') as stream:
+                    report = importer.run(read_rows(stream, fmt))
+        except (OSError, ImportFormatError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors'][:20]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        if report['failed'] > 20:
+            self.stderr.write(f"... and {report['failed'] - 20} more")
+        if options['errors']:
+            with open(options['errors'], 'w') as out:
+                json.dump(report['errors'], out, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} of {report['total']} {kind} created, {report['failed']} failed"
+        ))
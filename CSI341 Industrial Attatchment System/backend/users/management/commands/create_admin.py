@@ -0,0 +1,28 @@
+from getpass import getpass
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.serializers import AdminSerializer
+
+
+class Command(BaseCommand):
+    help = "Create an admin account, e.g. the first one; admins then register the others through the API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('first_name')
+        parser.add_argument('last_name')
+        parser.add_argument('--password', help="Default: prompt for it.")
+
+    def handle(self, *args, email, first_name, last_name, password, **options):
+        if password is None:
+            password = getpass("Password: ")
+            if password != getpass("Password (again): "):
+                raise CommandError("The passwords do not match.")
+        serializer = AdminSerializer(data={
+            'email': email, 'first_name': first_name, 'last_name': last_name, 'password': password,
+        })
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        admin = serializer.save()
+        self.stdout.write(self.style.SUCCESS(f"Admin {admin.email} created (id {admin.admin_id})"))
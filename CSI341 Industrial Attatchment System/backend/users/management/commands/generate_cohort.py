@@ -0,0 +1,248 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from users import catalogue, counters, eligibility, matching, search, signals
+from users.ids import logbook_ids
+from users.models import (
+    DesiredSkill,
+    Industry,
+    Logbook,
+    Organisation,
+    OrganisationPreference,
+    PreferredField,
+    PreferredIndustry,
+    RequiredSkill,
+    Skill,
+    Student,
+    StudentPreference,
+)
+
+# Synthetic rows are recognisable by their e-mail domain so --clear only
+# removes what this command created.
+EMAIL_DOMAIN = 'cohort.example.com'
+
+INDUSTRIES = [
+    ('IT', 'Information Technology'),
+    ('FIN', 'Finance'),
+    ('ENG', 'Engineering'),
+    ('HLT', 'Healthcare'),
+    ('EDU', 'Education'),
+    ('AGR', 'Agriculture'),
+    ('MIN', 'Mining'),
+    ('TOU', 'Tourism'),
+    ('TEL', 'Telecommunications'),
+    ('RET', 'Retail'),
+]
+SKILLS = [
+    ('PY', 'Python'), ('JS', 'JavaScript'), ('JAVA', 'Java'), ('SQL', 'SQL'),
+    ('NET', 'Networking'), ('AC', 'Accounting'), ('CAD', 'AutoCAD'), ('XL', 'Excel'),
+    ('ML', 'Machine Learning'), ('WEB', 'Web Design'), ('SEC', 'Security'), ('PM', 'Project Management'),
+]
+TOWNS = ['Gaborone', 'Francistown', 'Maun', 'Lobatse', 'Serowe', 'Palapye', 'Kasane', 'Molepolole']
+WORDS = (
+    'configured deployed reviewed tested documented designed met supervisor client '
+    'report network database server ledger audit site survey lesson patients stock'
+).split()
+
+# Student numbers are <year><5 digits> for admission years 2015-2022.
+ADMISSION_YEARS = range(2015, 2023)
+STUDENTS_PER_YEAR = 100000
+
+
+def student_number(n):
+    year = ADMISSION_YEARS[n // STUDENTS_PER_YEAR]
+    return f'{year}{n % STUDENTS_PER_YEAR:05d}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic cohort (students, organisations, "
+        "preferences, skills and logbooks) for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--organisations', type=int, default=2000)
+        parser.add_argument('--logbooks', type=int, default=500000)
+        parser.add_argument('--seed', type=int, default=341)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help="Delete a previously generated cohort first.")
+        parser.add_argument(
+            '--skip-eligibility', action='store_true',
+            help="Do not rebuild EligiblePair and its scores afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        students = options['students']
+        if students > len(ADMISSION_YEARS) * STUDENTS_PER_YEAR:
+            raise CommandError(f"At most {len(ADMISSION_YEARS) * STUDENTS_PER_YEAR} valid student numbers exist.")
+        if options['organisations'] < 1 and options['logbooks']:
+            raise CommandError("Logbooks need at least one organisation.")
+        if options['logbooks'] > 10 * students:
+            raise CommandError("A student writes one logbook per week, 10 at most.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.today = datetime.date.today()
+
+        if options['clear']:
+            self.clear()
+        try:
+            with transaction.atomic():
+                industries, skills = self.catalogue()
+                organisations = self.create_organisations(options['organisations'], industries, skills)
+                student_ids = self.create_students(students, industries, skills)
+                self.create_logbooks(options['logbooks'], student_ids, organisations)
+        except IntegrityError as e:
+            raise CommandError(f"{e}. Run with --clear to replace an existing cohort.")
+
+        if not options['skip_eligibility']:
+            pairs = eligibility.rebuild()
+            matching.store_scores()
+            self.stdout.write(f"{pairs} eligible pairs")
+        self.stdout.write(self.style.SUCCESS(
+            f"{students} students, {len(organisations)} organisations, {options['logbooks']} logbooks"
+        ))
+
+    def clear(self):
+        # Deleting students and organisations cascades to everything else;
+        # refresh eligibility once rather than per deleted row.
+        with signals.batched():
+            Student.objects.filter(student_email__endswith='@' + EMAIL_DOMAIN).delete()
+            Organisation.objects.filter(contact_email__endswith='@' + EMAIL_DOMAIN).delete()
+
+    def catalogue(self):
+        # bulk_create sends no signals, so drop the cached lists by hand.
+        if not Industry.objects.exists():
+            Industry.objects.bulk_create([Industry(industry_id=i, industry_name=name) for i, name in INDUSTRIES])
+            transaction.on_commit(lambda: catalogue.invalidate('industries'))
+        if not Skill.objects.exists():
+            Skill.objects.bulk_create([Skill(skill_id=i, name=name) for i, name in SKILLS])
+            transaction.on_commit(lambda: catalogue.invalidate('skills'))
+        industries = list(Industry.objects.values_list('industry_id', 'industry_name'))
+        skills = list(Skill.objects.values_list('skill_id', flat=True))
+        return industries, skills
+
+    def window(self, max_offset, min_days, max_days):
+        start = self.today + datetime.timedelta(days=self.rng.randint(1, max_offset))
+        return start, start + datetime.timedelta(days=self.rng.randint(min_days, max_days))
+
+    def create_organisations(self, count, industries, skills):
+        # Hashing is deliberately slow; every synthetic account shares one hash.
+        password = make_password('password')
+        Organisation.objects.bulk_create([
+            Organisation(
+                org_name=f'Synthetic Organisation {n}',
+                industry_id=self.rng.choice(industries)[0],
+                town=self.rng.choice(TOWNS),
+                street=f'Street {n % 97}',
+                plot_number=str(n),
+                contact_number=f'7{n:08d}',
+                contact_email=f'org{n}@{EMAIL_DOMAIN}',
+                password=password,
+            )
+            for n in range(count)
+        ], batch_size=self.batch_size)
+        # Not every backend returns primary keys from bulk_create.
+        org_ids = list(
+            Organisation.objects.filter(contact_email__endswith='@' + EMAIL_DOMAIN)
+            .order_by('org_id').values_list('org_id', flat=True)
+        )
+
+        preferences = []
+        for org_id in org_ids:
+            start, end = self.window(120, 30, 120)
+            preferences.append(OrganisationPreference(
+                organisation_id=org_id,
+                pref_education_level=self.rng.randint(1, 4),
+                positions_available=self.rng.randint(1, 10),
+                start_date=start,
+                end_date=end,
+            ))
+        OrganisationPreference.objects.bulk_create(preferences, batch_size=self.batch_size)
+        pref_ids = (
+            OrganisationPreference.objects.filter(organisation__contact_email__endswith='@' + EMAIL_DOMAIN)
+            .order_by('pref_id').values_list('pref_id', flat=True)
+        )
+
+        fields, required = [], []
+        for pref_id in pref_ids:
+            for _, name in self.rng.sample(industries, self.rng.randint(0, min(2, len(industries)))):
+                fields.append(PreferredField(preference_id=pref_id, field_name=name))
+            for skill_id in self.rng.sample(skills, self.rng.randint(1, min(3, len(skills)))):
+                required.append(RequiredSkill(preference_id=pref_id, skill_id=skill_id))
+        PreferredField.objects.bulk_create(fields, batch_size=self.batch_size)
+        RequiredSkill.objects.bulk_create(required, batch_size=self.batch_size)
+        return org_ids
+
+    def create_students(self, count, industries, skills):
+        password = make_password('password')
+        student_ids = [student_number(n) for n in range(count)]
+        Student.objects.bulk_create([
+            Student(
+                student_id=student_id,
+                first_name='Synthetic',
+                last_name=f'Student{n}',
+                year_of_study=self.rng.randint(1, 5),
+                student_email=f'student{n}@{EMAIL_DOMAIN}',
+                student_contact_number=f'7{n:08d}',
+                password=password,
+            )
+            for n, student_id in enumerate(student_ids)
+        ], batch_size=self.batch_size)
+
+        preferences, preferred, desired = [], [], []
+        for student_id in student_ids:
+            pref_id = f'{student_id}_PREF001'
+            start, end = self.window(60, 60, 180)
+            preferences.append(StudentPreference(
+                student_pref_id=pref_id,
+                student_id=student_id,
+                pref_location=self.rng.choice(TOWNS),
+                available_from=start,
+                available_to=end,
+            ))
+            for industry_id, _ in self.rng.sample(industries, self.rng.randint(1, min(2, len(industries)))):
+                preferred.append(PreferredIndustry(student_id=pref_id, industry_id=industry_id))
+            for skill_id in self.rng.sample(skills, self.rng.randint(1, min(3, len(skills)))):
+                desired.append(DesiredSkill(student_pref_id=pref_id, skill_id=skill_id))
+        StudentPreference.objects.bulk_create(preferences, batch_size=self.batch_size)
+        PreferredIndustry.objects.bulk_create(preferred, batch_size=self.batch_size)
+        DesiredSkill.objects.bulk_create(desired, batch_size=self.batch_size)
+        return student_ids
+
+    def create_logbooks(self, count, student_ids, org_ids):
+        if not count or not student_ids:
+            return
+        # Student s writes weeks 1..10 in turn, always to the same organisation.
+        now = timezone.now()
+        ids = logbook_ids(count)
+        batch = []
+        for n in range(count):
+            s = n % len(student_ids)
+            status = self.rng.choice(('pending', 'viewed'))
+            batch.append(Logbook(
+                logbook_id=ids[n],
+                student_id_id=student_ids[s],
+                org_id_id=org_ids[s % len(org_ids)],
+                week_number=(n // len(student_ids)) % 10 + 1,
+                log_entry=' '.join(self.rng.choices(WORDS, k=self.rng.randint(20, 80))),
+                status=status,
+                viewed_at=now if status == 'viewed' else None,
+            ))
+            if len(batch) == self.batch_size:
+                self.save_logbooks(batch)
+                batch = []
+        self.save_logbooks(batch)
+
+    @staticmethod
+    def save_logbooks(batch):
+        # bulk_create sends no signals; index and count the rows here.
+        Logbook.objects.bulk_create(batch)
+        search.index_logbooks(batch)
+        counters.adjust(added=[logbook.counter_state() for logbook in batch])
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from users import eligibility, matching
+
+
+class Command(BaseCommand):
+    help = "Recompute the EligiblePair table and its scores from all student and organisation preferences."
+
+    def handle(self, *args, **options):
+        count = eligibility.rebuild()
+        matching.store_scores()
+        self.stdout.write(self.style.SUCCESS(f"{count} eligible pairs"))
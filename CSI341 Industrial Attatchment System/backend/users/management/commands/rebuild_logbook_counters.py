@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users import counters
+
+
+class Command(BaseCommand):
+    help = "Recount the pending/viewed logbooks of every organisation and student (LogbookCounter)."
+
+    def handle(self, *args, **options):
+        count = counters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} counters"))
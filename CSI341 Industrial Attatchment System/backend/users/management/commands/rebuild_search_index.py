@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the logbook search index (LogbookTerm) from every logbook entry."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.INDEX_BATCH)
+
+    def handle(self, *args, batch_size, **options):
+        count = search.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"{count} logbooks indexed"))
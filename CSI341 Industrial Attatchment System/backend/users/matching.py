@@ -0,0 +1,724 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+
+from . import events
+from .ids import allocate as allocate_sequence
+from .models import IdSequence, OrganisationPreference, StudentMatch
+from .routers import primary
+
+# Relative weight of each score component. The weights add up to 1 so a
+# perfect pair scores 1.0.
+DEFAULT_WEIGHTS = {
+    "industry": 0.4,
+    "skills": 0.35,
+    "dates": 0.15,
+    "location": 0.1,
+}
+
+
+class _Vocabulary:
+    """Maps ids (industry ids, skill ids, towns) to matrix columns."""
+
+    def __init__(self):
+        self.index = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, key):
+        if key not in self.index:
+            self.index[key] = len(self.index)
+        return self.index[key]
+
+
+STUDENT_ARRAYS = (
+    "student_owner", "student_year", "student_town", "student_from", "student_to",
+    "student_industries", "student_skills",
+)
+ORGANISATION_ARRAYS = (
+    "org_ids", "org_town", "org_level", "org_positions", "org_start", "org_end",
+    "org_industries", "org_skills",
+)
+
+
+def _normalise_town(value):
+    return (value or "").strip().lower()
+
+
+def allocate(scores, feasible, capacities, owners=None):
+    """
+    Capacity-constrained allocation of student preferences (rows) to
+    organisation preferences (columns), at most one row per student.
+    ``owners`` gives the student of each row; without it every row is a
+    different student.
+
+    Both sides rank each other by the same pairwise score, so the
+    student-proposing deferred acceptance (hospitals/residents) outcome is
+    the one obtained by accepting pairs in descending score order while the
+    student is free and the column still has capacity. This makes it a
+    single sort plus one linear pass instead of rounds of proposals. A
+    student's rows are that student's options: once one is accepted the
+    others are skipped.
+
+    Returns an int array with the column assigned to each row, or -1.
+    """
+    n_rows = scores.shape[0]
+    assignment = np.full(n_rows, -1, dtype=np.int64)
+    capacity = [int(c) for c in capacities]
+    owners = list(range(n_rows)) if owners is None else list(owners)
+    rows, columns = np.nonzero(feasible)
+    if not len(rows):
+        return assignment
+    order = np.argsort(-scores[rows, columns], kind="stable")
+    rows = rows[order].tolist()
+    columns = columns[order].tolist()
+
+    assigned = [-1] * n_rows
+    placed = set()
+    students_left = len({owners[i] for i in rows})
+    capacity_left = sum(capacity)
+    for i, j in zip(rows, columns):
+        if owners[i] in placed or capacity[j] <= 0:
+            continue
+        assigned[i] = j
+        placed.add(owners[i])
+        capacity[j] -= 1
+        students_left -= 1
+        capacity_left -= 1
+        if not students_left or not capacity_left:
+            break
+    assignment[:] = assigned
+    return assignment
+
+
+class MatchingEngine:
+    """
+    Scores every StudentPreference against every OrganisationPreference in
+    one batch.
+
+    Industries and skills are encoded as 0/1 matrices (one row per
+    preference, one column per industry or skill) so overlaps for the whole
+    cohort come out of a single matrix product. Only pairs present in
+    EligiblePair (see eligibility.py) are feasible.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.scores = None
+        self.feasible = None
+
+    def _objects(self, model_name):
+        return apps.get_model("users", model_name).objects
+
+    # ------------------------------------------------------------------ load
+    def load(self, student_pref_ids=None, org_pref_ids=None):
+        """
+        Load all preferences, or only the given student and organisation
+        preference ids.
+        """
+        self.industry_ids_by_name = {
+            name.strip().lower(): industry_id
+            for industry_id, name in self._objects("Industry").values_list("industry_id", "industry_name")
+        }
+        self.industries = _Vocabulary()
+        self.skills = _Vocabulary()
+        self.towns = _Vocabulary()
+
+        students = self._fetch_students(student_pref_ids)
+        self.student_ids = [row[0] for row in students]
+        for name, value in self._student_arrays(students).items():
+            setattr(self, name, value)
+
+        orgs = self._fetch_organisations(org_pref_ids)
+        self.org_pref_ids = [row[0] for row in orgs]
+        for name, value in self._organisation_arrays(orgs).items():
+            setattr(self, name, value)
+
+        self._pad_columns()
+        self._reindex()
+        self.feasible = self._read_eligible(
+            rows=None if student_pref_ids is None else self.student_ids,
+            columns=None if org_pref_ids is None else self.org_pref_ids,
+        )
+        self.scores = None
+        self.invalid_matches = {}
+        self._dirty_students = set(self.student_ids)
+        self._dirty_organisations = set()
+        return self
+
+    def _fetch_students(self, pref_ids=None):
+        """
+        Return ``[pref_id, year, town, from, to, industries, skills,
+        student_id]`` rows, optionally limited to the given student
+        preference ids.
+        """
+        prefs = self._objects("StudentPreference").all()
+        industries = self._objects("PreferredIndustry").all()
+        skills = self._objects("DesiredSkill").all()
+        if pref_ids is not None:
+            prefs = prefs.filter(student_pref_id__in=pref_ids)
+            industries = industries.filter(student_id__in=pref_ids)
+            skills = skills.filter(student_pref_id__in=pref_ids)
+
+        rows = {
+            row[0]: list(row[:5]) + [[], [], row[5]]
+            for row in prefs.values_list(
+                "student_pref_id", "student__year_of_study", "pref_location",
+                "available_from", "available_to", "student_id",
+            )
+        }
+        for pref_id, industry_id in industries.values_list("student_id", "industry_id"):
+            if pref_id in rows:
+                rows[pref_id][5].append(industry_id)
+        for pref_id, skill_id in skills.values_list("student_pref_id", "skill_id"):
+            if pref_id in rows:
+                rows[pref_id][6].append(skill_id)
+        return list(rows.values())
+
+    def _fetch_organisations(self, pref_ids=None):
+        """
+        Return ``[pref_id, org_id, town, level, positions, start, end,
+        industries, skills]`` rows, optionally limited to the given
+        organisation preference ids.
+        """
+        prefs = self._objects("OrganisationPreference").all()
+        fields = self._objects("PreferredField").all()
+        skills = self._objects("RequiredSkill").all()
+        if pref_ids is not None:
+            prefs = prefs.filter(pref_id__in=pref_ids)
+            fields = fields.filter(preference_id__in=pref_ids)
+            skills = skills.filter(preference_id__in=pref_ids)
+
+        rows = {}
+        for row in prefs.values_list(
+            "pref_id", "organisation_id", "organisation__industry_id", "organisation__town",
+            "pref_education_level", "positions_available", "start_date", "end_date",
+        ):
+            # An organisation preference covers the organisation's own
+            # industry plus every preferred field (stored by industry name).
+            rows[row[0]] = [row[0], row[1]] + list(row[3:]) + [[row[2]], []]
+        for pref_id, field_name in fields.values_list("preference_id", "field_name"):
+            industry_id = self.industry_ids_by_name.get(field_name.strip().lower())
+            if industry_id is not None and pref_id in rows:
+                rows[pref_id][7].append(industry_id)
+        for pref_id, skill_id in skills.values_list("preference_id", "skill_id"):
+            if pref_id in rows:
+                rows[pref_id][8].append(skill_id)
+        return list(rows.values())
+
+    def _student_arrays(self, rows):
+        return {
+            "student_owner": np.array([row[7] for row in rows], dtype=object),
+            "student_year": np.array([row[1] for row in rows], dtype=np.int16),
+            "student_town": np.array([self.towns.add(_normalise_town(row[2])) for row in rows], dtype=np.int32),
+            "student_from": np.array([row[3] for row in rows], dtype="datetime64[D]"),
+            "student_to": np.array([row[4] for row in rows], dtype="datetime64[D]"),
+            "student_industries": self._encode(rows, 5, self.industries),
+            "student_skills": self._encode(rows, 6, self.skills),
+        }
+
+    def _organisation_arrays(self, rows):
+        return {
+            "org_ids": np.array([row[1] for row in rows], dtype=np.int64),
+            "org_town": np.array([self.towns.add(_normalise_town(row[2])) for row in rows], dtype=np.int32),
+            "org_level": np.array([row[3] for row in rows], dtype=np.int16),
+            "org_positions": np.array([row[4] for row in rows], dtype=np.int32),
+            "org_start": np.array([row[5] for row in rows], dtype="datetime64[D]"),
+            "org_end": np.array([row[6] for row in rows], dtype="datetime64[D]"),
+            "org_industries": self._encode(rows, 7, self.industries),
+            "org_skills": self._encode(rows, 8, self.skills),
+        }
+
+    @staticmethod
+    def _encode(rows, position, vocabulary):
+        pairs = [(n, vocabulary.add(key)) for n, row in enumerate(rows) for key in row[position]]
+        matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+        if pairs:
+            r, c = zip(*pairs)
+            matrix[list(r), list(c)] = 1.0
+        return matrix
+
+    def _pad_columns(self):
+        """Widen the industry and skill matrices after the vocabularies grew."""
+        for name, vocabulary in (
+            ("student_industries", self.industries), ("org_industries", self.industries),
+            ("student_skills", self.skills), ("org_skills", self.skills),
+        ):
+            matrix = getattr(self, name)
+            missing = len(vocabulary) - matrix.shape[1]
+            if missing:
+                setattr(self, name, np.pad(matrix, ((0, 0), (0, missing))))
+
+    def _read_eligible(self, rows=None, columns=None):
+        """
+        Read the EligiblePair mask for the given student (rows) and
+        organisation (columns) preference ids, or all of them, as a boolean
+        block.
+        """
+        row_ids = self.student_ids if rows is None else rows
+        column_ids = self.org_pref_ids if columns is None else columns
+        row_position = {pref_id: n for n, pref_id in enumerate(row_ids)}
+        column_position = {pref_id: n for n, pref_id in enumerate(column_ids)}
+        pairs = self._objects("EligiblePair").all()
+        if rows is not None:
+            pairs = pairs.filter(student_preference_id__in=rows)
+        if columns is not None:
+            pairs = pairs.filter(organisation_preference_id__in=columns)
+
+        mask = np.zeros((len(row_ids), len(column_ids)), dtype=bool)
+        for student_pref_id, org_pref_id in pairs.values_list("student_preference_id", "organisation_preference_id"):
+            i = row_position.get(student_pref_id)
+            j = column_position.get(org_pref_id)
+            if i is not None and j is not None:
+                mask[i, j] = True
+        return mask
+
+    def _reindex(self):
+        self.student_index = {pref_id: i for i, pref_id in enumerate(self.student_ids)}
+        self.org_index = {pref_id: j for j, pref_id in enumerate(self.org_pref_ids)}
+
+    # ----------------------------------------------------------- incremental
+    def refresh_students(self, pref_ids):
+        """
+        Re-read the given student preferences and rescore only their rows.
+        Deleted preferences are dropped and new ones appended.
+        """
+        pref_ids = set(pref_ids)
+        self._drop(pref_ids, self.student_ids, STUDENT_ARRAYS, axis=0)
+        rows = self._fetch_students(pref_ids)
+        if rows:
+            arrays = self._student_arrays(rows)
+            self._pad_columns()
+            for name, value in arrays.items():
+                setattr(self, name, np.concatenate([getattr(self, name), value]))
+            self.student_ids.extend(row[0] for row in rows)
+        self._reindex()
+        if rows:
+            self.feasible = np.concatenate([self.feasible, self._read_eligible(rows=[row[0] for row in rows])])
+        if self.scores is not None and rows:
+            new = [self.student_index[row[0]] for row in rows]
+            self.scores = np.concatenate([self.scores, self._score_block(rows=new)])
+        self._dirty_students |= pref_ids
+
+    def refresh_organisations(self, pref_ids):
+        """
+        Re-read the given organisation preferences and rescore only their
+        columns. Deleted preferences are dropped and new ones appended.
+        """
+        pref_ids = set(pref_ids)
+        self._dirty_organisations.update(
+            int(self.org_ids[self.org_index[p]]) for p in pref_ids if p in self.org_index
+        )
+        self._drop(pref_ids, self.org_pref_ids, ORGANISATION_ARRAYS, axis=1)
+        rows = self._fetch_organisations(pref_ids)
+        if rows:
+            arrays = self._organisation_arrays(rows)
+            self._pad_columns()
+            for name, value in arrays.items():
+                setattr(self, name, np.concatenate([getattr(self, name), value]))
+            self.org_pref_ids.extend(row[0] for row in rows)
+            self._dirty_organisations.update(row[1] for row in rows)
+        self._reindex()
+        if rows:
+            eligible = self._read_eligible(columns=[row[0] for row in rows])
+            self.feasible = np.concatenate([self.feasible, eligible], axis=1)
+        if self.scores is not None and rows:
+            new = [self.org_index[row[0]] for row in rows]
+            self.scores = np.concatenate([self.scores, self._score_block(columns=new)], axis=1)
+
+    def _drop(self, pref_ids, ids, array_names, axis):
+        """Remove the rows (axis 0) or columns (axis 1) for ``pref_ids``."""
+        positions = [n for n, pref_id in enumerate(ids) if pref_id in pref_ids]
+        if not positions:
+            return
+        for name in array_names:
+            setattr(self, name, np.delete(getattr(self, name), positions, axis=0))
+        self.feasible = np.delete(self.feasible, positions, axis=axis)
+        if self.scores is not None:
+            self.scores = np.delete(self.scores, positions, axis=axis)
+        ids[:] = [pref_id for pref_id in ids if pref_id not in pref_ids]
+
+    def matches_changed(self, student_pref_ids):
+        """Queue matches for re-validation after a StudentMatch change."""
+        self._dirty_students.update(student_pref_ids)
+
+    def report_invalid_matches(self):
+        """
+        Return the StudentMatch rows whose student preference is no longer
+        feasible with any preference of the matched organisation.
+
+        Only matches touched since the last call are re-validated.
+        """
+        if self.scores is None:
+            self.score()
+        dirty_students, dirty_organisations = self._dirty_students, self._dirty_organisations
+        self._dirty_students, self._dirty_organisations = set(), set()
+        for pref_id in dirty_students:
+            self.invalid_matches.pop(pref_id, None)
+
+        matches = StudentMatch.objects.filter(
+            Q(student_preference_id__in=dirty_students) | Q(organisation_id__in=dirty_organisations)
+        ).values_list("student_preference_id", "organisation_id")
+        for student_pref_id, organisation_id in matches:
+            self.invalid_matches.pop(student_pref_id, None)
+            i = self.student_index.get(student_pref_id)
+            if i is None:
+                continue
+            offered = self.org_ids == organisation_id
+            if not offered.any():
+                reason = "Organisation has no open preferences."
+            elif not (self.feasible[i] & offered).any():
+                reason = "Student preference no longer fits any of the organisation's preferences."
+            else:
+                continue
+            self.invalid_matches[student_pref_id] = {
+                "student_pref_id": student_pref_id,
+                "organisation_id": organisation_id,
+                "reason": reason,
+            }
+        return list(self.invalid_matches.values())
+
+    # ----------------------------------------------------------------- score
+    def score(self):
+        """Compute the (students x organisation preferences) score matrix."""
+        self.scores = self._score_block()
+        return self.scores
+
+    def _score_block(self, rows=slice(None), columns=slice(None)):
+        """Weighted score for a block; pairs that are not eligible score 0."""
+        total = self.total(self.components(rows, columns))
+        return np.where(self.feasible[rows][:, columns], total, 0.0).astype(np.float32)
+
+    def total(self, components):
+        return sum(self.weights[name] * value for name, value in components.items())
+
+    def components(self, rows=slice(None), columns=slice(None)):
+        """
+        Return each score component for the given student rows and
+        organisation columns, all as 2-D arrays in the 0..1 range. Hard
+        constraints are not applied here; ``self.feasible`` holds them.
+        """
+        s_ind, o_ind = self.student_industries[rows], self.org_industries[columns]
+        s_sk, o_sk = self.student_skills[rows], self.org_skills[columns]
+
+        industry_overlap = s_ind @ o_ind.T
+        no_industry_pref = s_ind.sum(axis=1, keepdims=True) == 0
+        industry = np.where(no_industry_pref, 0.5, (industry_overlap > 0).astype(np.float32))
+
+        required = o_sk.sum(axis=1)[None, :]
+        skill_overlap = s_sk @ o_sk.T
+        skills = np.divide(skill_overlap, required, out=np.ones_like(skill_overlap), where=required > 0)
+
+        start = np.maximum(self.student_from[rows][:, None], self.org_start[columns][None, :])
+        end = np.minimum(self.student_to[rows][:, None], self.org_end[columns][None, :])
+        overlap_days = (end - start).astype(np.int64) + 1
+        placement_days = (self.org_end[columns] - self.org_start[columns]).astype(np.int64) + 1
+        dates = np.clip(overlap_days / np.maximum(placement_days, 1)[None, :], 0.0, 1.0)
+
+        location = (self.student_town[rows][:, None] == self.org_town[columns][None, :]).astype(np.float32)
+
+        return {
+            "industry": industry,
+            "skills": skills,
+            "dates": dates,
+            "location": location,
+        }
+
+    # ---------------------------------------------------------------- output
+    def ranked_candidates(self, k=None):
+        """
+        Return ``{student_pref_id: [candidate, ...]}`` with feasible
+        organisation preferences ordered best first.
+        """
+        if self.scores is None:
+            self.score()
+        results = {}
+        for i, student_pref_id in enumerate(self.student_ids):
+            results[student_pref_id] = self._rank_row(i, k)
+        return results
+
+    def _rank_row(self, i, k=None):
+        row = np.where(self.feasible[i], self.scores[i], -1.0)
+        candidates = np.flatnonzero(self.feasible[i])
+        if k is not None and k < len(candidates):
+            candidates = candidates[np.argpartition(-row[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-row[candidates], kind="stable")]
+        return [
+            {
+                "pref_id": self.org_pref_ids[j],
+                "organisation_id": int(self.org_ids[j]),
+                "score": round(float(self.scores[i, j]), 4),
+            }
+            for j in candidates
+        ]
+
+    def assign(self, keep_existing=True):
+        """
+        Allocate student preferences to organisation preferences without
+        exceeding ``positions_available``.
+
+        A student with several preferences gets at most one place. With
+        ``keep_existing`` the students already in StudentMatch stay where
+        they are, on whichever preference, and use up their organisation's
+        positions.
+
+        Returns a list of ``{"student_pref_id", "student_id", "pref_id",
+        "organisation_id", "score"}`` dicts.
+        """
+        if self.scores is None:
+            self.score()
+        feasible = self.feasible.copy()
+        capacities = self.org_positions.copy()
+        self.kept = set()
+
+        if keep_existing:
+            existing = StudentMatch.objects.values_list(
+                "student_preference_id", "student_preference__student_id", "organisation_id",
+            )
+            used = {}
+            matched_students = set()
+            for student_pref_id, student_id, organisation_id in existing:
+                if student_pref_id in self.student_index:
+                    self.kept.add(student_pref_id)
+                matched_students.add(student_id)
+                used[organisation_id] = used.get(organisation_id, 0) + 1
+            feasible[np.isin(self.student_owner, list(matched_students))] = False
+            # Take the positions used by existing matches out of each
+            # organisation's preferences, in pref_id order.
+            for j in np.argsort(self.org_pref_ids, kind="stable"):
+                organisation_id = int(self.org_ids[j])
+                taken = min(used.get(organisation_id, 0), int(capacities[j]))
+                if taken:
+                    capacities[j] -= taken
+                    used[organisation_id] -= taken
+
+        assignment = allocate(self.scores, feasible, capacities, owners=self.student_owner)
+        return [
+            {
+                "student_pref_id": self.student_ids[i],
+                "student_id": self.student_owner[i],
+                "pref_id": self.org_pref_ids[j],
+                "organisation_id": int(self.org_ids[j]),
+                "score": round(float(self.scores[i, j]), 4),
+            }
+            for i, j in enumerate(assignment.tolist())
+            if j >= 0
+        ]
+
+    def commit_assignment(self, assignments, keep_existing=True):
+        """
+        Write an allocation from ``assign()`` to StudentMatch in a single
+        transaction. Without ``keep_existing`` every current match is
+        replaced.
+
+        A student has at most one match (StudentMatch.student is unique):
+        an allocation placing a student twice raises ValueError, and one
+        placing a student matched meanwhile raises IntegrityError, both
+        without writing anything.
+        """
+        students = [a["student_id"] for a in assignments]
+        if len(set(students)) != len(students):
+            raise ValueError("An allocation may place each student only once.")
+        matches = [
+            StudentMatch(
+                student_preference_id=a["student_pref_id"],
+                student_id=a["student_id"],
+                organisation_id=a["organisation_id"],
+                score=a["score"],
+                admin_note=f"Assigned by capacity solver (score {a['score']:.2f})",
+            )
+            for a in assignments
+        ]
+        with transaction.atomic():
+            if not keep_existing:
+                StudentMatch.objects.all().delete()
+            StudentMatch.objects.bulk_create(matches)
+            # bulk_create() sends no post_save.
+            for match in matches:
+                events.match_saved(match)
+        return matches
+
+    def write_matches(self, candidates=None):
+        """
+        Create a StudentMatch for every unmatched student using the best
+        candidate of any of their preferences. Existing matches are left
+        untouched, and students matched on any preference are skipped.
+
+        Returns the list of created matches.
+        """
+        if candidates is None:
+            candidates = self.ranked_candidates(k=1)
+        matched = set(StudentMatch.objects.values_list("student_id", flat=True))
+        best = {}
+        for student_pref_id, ranked in candidates.items():
+            student_id = self.student_owner[self.student_index[student_pref_id]]
+            if not ranked or student_id in matched:
+                continue
+            if student_id not in best or ranked[0]["score"] > best[student_id][1]["score"]:
+                best[student_id] = (student_pref_id, ranked[0])
+        new_matches = [
+            StudentMatch(
+                student_preference_id=student_pref_id,
+                student_id=student_id,
+                organisation_id=top["organisation_id"],
+                score=top["score"],
+                admin_note=f"Automatically matched (score {top['score']:.2f})",
+            )
+            for student_id, (student_pref_id, top) in best.items()
+        ]
+        with transaction.atomic():
+            StudentMatch.objects.bulk_create(new_matches)
+            for match in new_matches:
+                events.match_saved(match)
+        return new_matches
+
+
+def organisation_capacity(organisation_id):
+    """
+    Return ``(positions, matched)`` for an organisation: the positions
+    offered across its preferences and the matches already made.
+    """
+    positions = OrganisationPreference.objects.filter(
+        organisation_id=organisation_id
+    ).aggregate(total=Sum("positions_available"))["total"] or 0
+    matched = StudentMatch.objects.filter(organisation_id=organisation_id).count()
+    return positions, matched
+
+
+# The engine is kept in memory between requests and updated one row or
+# column at a time from model signals (see signals.py). A generation counter
+# lets a process notice when another process changed preferences it has not
+# applied, in which case it reloads from scratch. The counter is an
+# IdSequence row, so every process sees the same value whatever the cache
+# backend; it is read from the primary.
+GENERATION_SEQUENCE = "matching-generation"
+
+_engine = None
+_engine_lock = threading.RLock()
+
+
+def _current_generation():
+    with primary():
+        return IdSequence.objects.filter(name=GENERATION_SEQUENCE).values_list("value", flat=True).first() or 0
+
+
+def _bump_generation():
+    return allocate_sequence(GENERATION_SEQUENCE)
+
+
+@contextmanager
+def engine_session(reload=False):
+    """
+    Yield the shared, scored engine while holding its lock. The engine is
+    (re)loaded when none exists, when ``reload`` is set or when another
+    process changed preferences since it was loaded.
+    """
+    global _engine
+    with _engine_lock:
+        generation = _current_generation()
+        if reload or _engine is None or _engine.generation != generation:
+            # Tagged with the current generation, so it must not miss
+            # changes a replica has yet to receive.
+            with primary():
+                engine = MatchingEngine().load()
+            engine.score()
+            engine.generation = generation
+            _engine = engine
+        yield _engine
+
+
+def _apply(change):
+    with _engine_lock:
+        generation = _bump_generation()
+        if _engine is None:
+            return
+        if _engine.generation == generation - 1:
+            change(_engine)
+            _engine.generation = generation
+
+
+def student_preferences_changed(pref_ids):
+    _apply(lambda engine: engine.refresh_students(pref_ids))
+
+
+def organisation_preferences_changed(pref_ids):
+    _apply(lambda engine: engine.refresh_organisations(pref_ids))
+
+
+def matches_changed(student_pref_ids):
+    _apply(lambda engine: engine.matches_changed(student_pref_ids))
+
+
+SCORE_FIELDS = {
+    "score": None,
+    "industry_score": "industry",
+    "skills_score": "skills",
+    "dates_score": "dates",
+    "location_score": "location",
+}
+
+
+def store_scores(student_pref_ids=None, org_pref_ids=None, batch_size=2000):
+    """
+    Save the score and its breakdown on the EligiblePair rows of the given
+    student or organisation preferences, or on every pair when neither is
+    given. Only the preferences involved in those pairs are loaded.
+
+    Returns the number of pairs scored.
+    """
+    EligiblePair = apps.get_model("users", "EligiblePair")
+    if student_pref_ids is None and org_pref_ids is None:
+        # Score the whole table a block of students at a time so the score
+        # matrices stay block-sized on large cohorts.
+        StudentPreference = apps.get_model("users", "StudentPreference")
+        all_ids = list(StudentPreference.objects.order_by("pk").values_list("pk", flat=True))
+        return sum(
+            store_scores(student_pref_ids=all_ids[k:k + batch_size], batch_size=batch_size)
+            for k in range(0, len(all_ids), batch_size)
+        )
+
+    scope = EligiblePair.objects.all()
+    if student_pref_ids is not None:
+        scope = scope.filter(student_preference_id__in=student_pref_ids)
+    if org_pref_ids is not None:
+        scope = scope.filter(organisation_preference_id__in=org_pref_ids)
+
+    with transaction.atomic():
+        pairs = list(scope.select_for_update().values_list("id", "student_preference_id", "organisation_preference_id"))
+        if not pairs:
+            return 0
+
+        engine = MatchingEngine().load(
+            student_pref_ids={s for _, s, _ in pairs},
+            org_pref_ids={o for _, _, o in pairs},
+        )
+        components = engine.components()
+        components[None] = engine.total(components)
+        rows = np.array([engine.student_index[s] for _, s, _ in pairs], dtype=np.int64)
+        columns = np.array([engine.org_index[o] for _, _, o in pairs], dtype=np.int64)
+        values = [
+            np.round(components[component][rows, columns].astype(np.float64), 4).tolist()
+            for component in SCORE_FIELDS.values()
+        ]
+        # The rows are updated in place with one prepared UPDATE run for
+        # every pair. Through the ORM the per-row, per-field SQL building
+        # costs several times more: deleting and re-inserting the rows
+        # about 10x and bulk_update(), whose CASE WHEN per row grows the
+        # statement with every pair, over 100x.
+        table = EligiblePair._meta
+        quote = connection.ops.quote_name
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            quote(table.db_table),
+            ", ".join(f"{quote(table.get_field(field).column)} = %s" for field in SCORE_FIELDS),
+            quote(table.pk.column),
+        )
+        params = list(zip(*values, (pk for pk, _, _ in pairs)))
+        with connection.cursor() as cursor:
+            for k in range(0, len(params), batch_size):
+                cursor.executemany(sql, params[k:k + batch_size])
+    return len(pairs)
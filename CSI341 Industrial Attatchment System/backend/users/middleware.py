@@ -0,0 +1,422 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import routers
+from .authentication import token_user
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is used instead
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last bucket is open ended.
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+QUERY_BUCKETS = [1, 2, 5, 10, 20, 50, 100]
+
+
+class BudgetExceeded(AssertionError):
+    """Raised instead of logging when ENDPOINT_BUDGETS_STRICT is on."""
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.bounds] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'sum': round(self.total, 3),
+            'max': round(self.max, 3),
+        }
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.over_budget = 0
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.render_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.total_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'over_budget': self.over_budget,
+            'queries': self.queries.as_dict(),
+            'db_ms': self.db_ms.as_dict(),
+            'render_ms': self.render_ms.as_dict(),
+            'total_ms': self.total_ms.as_dict(),
+        }
+
+
+class MetricsRegistry:
+    """Per-process aggregates keyed by URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, name, sample, over_budget):
+        with self._lock:
+            endpoint = self._endpoints.setdefault(name, EndpointMetrics())
+            endpoint.requests += 1
+            endpoint.over_budget += bool(over_budget)
+            endpoint.queries.observe(sample.queries)
+            endpoint.db_ms.observe(sample.db_ms)
+            endpoint.render_ms.observe(sample.render_ms)
+            endpoint.total_ms.observe(sample.total_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: endpoint.as_dict() for name, endpoint in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class RequestSample:
+    """Query count and timings of one request, filled in by the middleware."""
+
+    def __init__(self):
+        self.started = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: time every statement.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - start) * 1000
+
+
+# The sample of the request being served. A context variable rather than
+# a per-connection wrapper: async views run their queries on connections
+# in other threads, which the context (and so the sample) follows.
+_current_sample = ContextVar('query_metrics_sample', default=None)
+
+
+def _record(execute, sql, params, many, context):
+    sample = _current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    """Install the query recorder on a connection (once)."""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(instrument)
+
+
+def endpoint_budget(name, method='GET'):
+    """
+    Return ``{'queries': n, 'latency_ms': n}`` for a URL name and HTTP
+    method, or {}. A budget split by method (``{'GET': {...}, 'POST':
+    {...}}``) gives the methods it leaves out the '*' budget.
+    """
+    budgets = getattr(settings, 'ENDPOINT_BUDGETS', {})
+    default = budgets.get('*', {})
+    budget = budgets.get(name, default)
+    if any(key.isupper() for key in budget):
+        return budget.get(method, default)
+    return budget
+
+
+def budget_violations(sample, budget):
+    violations = []
+    if 'queries' in budget and sample.queries > budget['queries']:
+        violations.append(f"{sample.queries} queries (budget {budget['queries']})")
+    if 'latency_ms' in budget and sample.total_ms > budget['latency_ms']:
+        violations.append(f"{sample.total_ms:.1f} ms (budget {budget['latency_ms']} ms)")
+    return violations
+
+
+class QueryMetricsMiddleware:
+    """
+    Count the SQL queries and time the database, response rendering and the
+    whole request. Samples are aggregated per URL name in ``metrics`` and
+    checked against ``settings.ENDPOINT_BUDGETS``; over-budget requests are
+    logged, or raise BudgetExceeded when ENDPOINT_BUDGETS_STRICT is set.
+    With QUERY_METRICS_HEADERS the sample is also sent back as Server-Timing
+    and X-Query-Count headers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Async-capable, so async views are not pushed into a thread.
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported.
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        sample, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        return self.finish(request, sample, response)
+
+    async def __acall__(self, request):
+        sample, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        return self.finish(request, sample, response)
+
+    def start(self, request):
+        sample = RequestSample()
+        sample.started = time.perf_counter()
+        request._query_metrics = sample
+        return sample, _current_sample.set(sample)
+
+    def finish(self, request, sample, response):
+        sample.total_ms = (time.perf_counter() - sample.started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        name = match.url_name or match.route
+
+        violations = budget_violations(sample, endpoint_budget(name, request.method))
+        metrics.record(name, sample, violations)
+        if getattr(settings, 'QUERY_METRICS_HEADERS', settings.DEBUG):
+            response['Server-Timing'] = (
+                f'db;dur={sample.db_ms:.1f}, render;dur={sample.render_ms:.1f}, total;dur={sample.total_ms:.1f}'
+            )
+            response['X-Query-Count'] = str(sample.queries)
+        if violations:
+            message = f"{name} exceeded its budget: {', '.join(violations)}"
+            if getattr(settings, 'ENDPOINT_BUDGETS_STRICT', False):
+                raise BudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._query_metrics.render_ms += (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+# Methods whose requests may read from a replica.
+READ_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def _pin_keys(request):
+    """Cache keys of the client's recent-write pins: its account and its IP."""
+    keys = []
+    keyword, _, token = request.headers.get('Authorization', '').partition(' ')
+    if keyword.lower() == 'bearer' and token:
+        try:
+            user = token_user(token)
+        except AuthenticationFailed:
+            pass
+        else:
+            keys.append(f'db:pin:{user.role}:{user.id}')
+    keys.append(f"db:pin:ip:{request.META.get('REMOTE_ADDR', '')}")
+    return keys
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let read-only requests read from a replica (see users.routers). A
+    client that writes is pinned to the primary for
+    DATABASE_REPLICA_PIN_SECONDS, so the pages it loads next show its
+    change even while the replicas are behind; the pin is kept in the
+    shared cache under the account and, for sign-ups, the client IP.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        keys, (routing, token) = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end(token)
+        return self.finish(keys, routing, response)
+
+    async def __acall__(self, request):
+        keys, (routing, token) = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end(token)
+        return self.finish(keys, routing, response)
+
+    def start(self, request):
+        if not routers.replicas():
+            return None, routers.begin(False)
+        keys = _pin_keys(request)
+        use_replica = request.method in READ_METHODS and not cache.get_many(keys)
+        return keys, routers.begin(use_replica)
+
+    def finish(self, keys, routing, response):
+        if keys is not None and routing.wrote:
+            self.pin(keys)
+        if response.streaming and routing.replica is not None:
+            # Exports read their rows while the body is sent.
+            response.streaming_content = self.routed(response, routing)
+        return response
+
+    def pin(self, keys):
+        # The account when the request had one, otherwise the IP.
+        cache.set(keys[0], True, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+    def routed(self, response, routing):
+        # The routing is set only while a chunk is produced, so none is left
+        # behind in the thread when the client stops reading.
+        chunks = response.streaming_content
+        if response.is_async:
+            async def content():
+                iterator = aiter(chunks)
+                while True:
+                    token = routers.enter(routing)
+                    try:
+                        chunk = await anext(iterator)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        routers.end(token)
+                    yield chunk
+        else:
+            def content():
+                iterator = iter(chunks)
+                while True:
+                    token = routers.enter(routing)
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        routers.end(token)
+                    yield chunk
+        return content()
+
+
+# Quality 4-5 compresses JSON better than gzip at about the same speed;
+# the higher levels are meant for static files.
+BROTLI_QUALITY = 5
+
+
+def _accepts_brotli(request):
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() == 'br':
+            quality = params.strip().removeprefix('q=').strip()
+            try:
+                return not quality or float(quality) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _brotli_sequence(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        # Flushed per chunk, so a streamed export keeps streaming.
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+async def _brotli_async_sequence(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    async for chunk in chunks:
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress response bodies with brotli when the client accepts it and the
+    brotli package is installed, otherwise with gzip (see GZipMiddleware).
+    Event streams are sent as they are: a compressor would hold events back
+    until it had a block to send.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if brotli is None or not _accepts_brotli(request):
+            return super().process_response(request, response)
+        if not response.streaming and len(response.content) < 200:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _brotli_async_sequence(response.streaming_content)
+            else:
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body differs from the uncompressed one byte for byte.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentmatch',
+            name='score',
+            field=models.FloatField(blank=True, help_text='Matching score when the match was produced automatically', null=True),
+        ),
+    ]
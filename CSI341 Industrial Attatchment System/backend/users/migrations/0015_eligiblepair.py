@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The table starts empty: fill it with `manage.py rebuild_eligibility` after
+# migrating a database that already has preferences. Signals keep it
+# current from then on.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_studentmatch_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EligiblePair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organisation_preference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligible_pairs', to='users.organisationpreference')),
+                ('student_preference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligible_pairs', to='users.studentpreference')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organisation_preference', 'student_preference'], name='eligible_org_student_idx')],
+                'unique_together': {('student_preference', 'organisation_preference')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+
+# Existing pairs keep a score of 0 until `manage.py rebuild_eligibility`
+# scores them.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_eligiblepair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eligiblepair',
+            name='dates_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eligiblepair',
+            name='industry_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eligiblepair',
+            name='location_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eligiblepair',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eligiblepair',
+            name='skills_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='eligiblepair',
+            index=models.Index(fields=['student_preference', '-score'], name='eligible_student_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eligiblepair',
+            index=models.Index(fields=['organisation_preference', '-score'], name='eligible_org_score_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_eligiblepair_scores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logbook',
+            index=models.Index(fields=['status', 'week_number'], name='logbook_status_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logbook',
+            index=models.Index(fields=['submitted_at'], name='logbook_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisation',
+            index=models.Index(fields=['town'], name='organisation_town_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['year_of_study'], name='student_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentpreference',
+            index=models.Index(fields=['available_from', 'available_to'], name='studentpref_available_idx'),
+        ),
+    ]
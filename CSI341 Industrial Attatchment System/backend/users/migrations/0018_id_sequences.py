@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:21
+
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='logbook',
+            name='logbook_id',
+            field=models.CharField(default=users.models.generate_logbook_id, editable=False, max_length=8, primary_key=True, serialize=False),
+        ),
+    ]
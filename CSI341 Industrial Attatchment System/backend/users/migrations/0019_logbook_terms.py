@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_id_sequences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogbookTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32)),
+                ('count', models.PositiveSmallIntegerField()),
+                ('logbook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='users.logbook')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'logbook', 'count'], name='logbook_term_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:33
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_logbooks(apps, schema_editor):
+    Logbook = apps.get_model('users', 'Logbook')
+    LogbookCounter = apps.get_model('users', 'LogbookCounter')
+    per_status = {status: Count('logbook_id', filter=Q(status=status)) for status in ('pending', 'viewed')}
+    rows = []
+    for field, prefix in (('org_id', 'org'), ('student_id', 'student')):
+        for row in Logbook.objects.order_by().values(field).annotate(**per_status):
+            rows.append(LogbookCounter(key=f"{prefix}:{row[field]}", pending=row['pending'], viewed=row['viewed']))
+    LogbookCounter.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_logbook_terms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogbookCounter',
+            fields=[
+                ('key', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('viewed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_logbooks, migrations.RunPython.noop),
+    ]
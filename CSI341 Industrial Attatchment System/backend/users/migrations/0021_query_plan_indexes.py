@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_logbook_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_year_idx',
+        ),
+        migrations.AddIndex(
+            model_name='logbook',
+            index=models.Index(fields=['org_id', '-submitted_at'], name='logbook_org_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logbook',
+            index=models.Index(fields=['student_id', '-submitted_at'], name='logbook_student_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisation',
+            index=models.Index(fields=['org_name'], name='organisation_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisationpreference',
+            index=models.Index(fields=['organisation', 'positions_available'], name='orgpref_org_positions_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisationpreference',
+            index=models.Index(fields=['start_date', 'end_date'], name='orgpref_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['year_of_study', 'student_id'], name='student_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentpreference',
+            index=models.Index(fields=['student', 'student_pref_id'], name='studentpref_student_idx'),
+        ),
+    ]
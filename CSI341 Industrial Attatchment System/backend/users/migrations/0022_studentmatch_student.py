@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_students(apps, schema_editor):
+    # A student matched on several preferences keeps the earliest match.
+    StudentMatch = apps.get_model('users', 'StudentMatch')
+    seen, keep, duplicates = set(), [], []
+    for match in StudentMatch.objects.select_related('student_preference').order_by('matched_at', 'pk'):
+        student_id = match.student_preference.student_id
+        if student_id in seen:
+            duplicates.append(match.pk)
+            continue
+        seen.add(student_id)
+        match.student_id = student_id
+        keep.append(match)
+    StudentMatch.objects.filter(pk__in=duplicates).delete()
+    StudentMatch.objects.bulk_update(keep, ['student'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentmatch',
+            name='student',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.student',
+            ),
+        ),
+        migrations.RunPython(fill_students, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='studentmatch',
+            name='student',
+            field=models.OneToOneField(
+                help_text="The preference's student, who has at most one match across their preferences",
+                on_delete=django.db.models.deletion.CASCADE, related_name='match', to='users.student',
+            ),
+        ),
+    ]
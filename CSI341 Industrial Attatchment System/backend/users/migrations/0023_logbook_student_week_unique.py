@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_weeks(apps, schema_editor):
+    # Logbook text is the students' own work, so duplicates are not dropped
+    # here; they are left to an admin to merge or renumber.
+    Logbook = apps.get_model('users', 'Logbook')
+    duplicates = list(
+        Logbook.objects.values('student_id', 'week_number')
+        .annotate(logbooks=Count('pk')).filter(logbooks__gt=1)
+        .order_by('student_id', 'week_number')
+        .values_list('student_id', 'week_number')[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Students have several logbooks for the same week; resolve these before migrating: "
+            + ", ".join(f"{student_id} week {week}" for student_id, week in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_studentmatch_student'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_weeks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='logbook',
+            constraint=models.UniqueConstraint(
+                fields=('student_id', 'week_number'), name='logbook_student_week_unique',
+                violation_error_message='A logbook for this week has already been submitted.',
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
@@ -13,9 +13,8 @@ class User(models.Model):
     password = models.CharField(max_length=255)
 
 def generate_preference_id(student_id):
-    from .models import StudentPreference
-    existing = StudentPreference.objects.filter(student__student_id=student_id).count() + 1
-    return f"{student_id}_PREF{existing:03d}"
+    from .ids import next_preference_id
+    return next_preference_id(student_id)
 
 class Student(models.Model):
     student_id = models.CharField(
@@ -40,6 +39,19 @@ class Student(models.Model):
     )
     password = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            # Filter and pagination order in one index.
+            models.Index(fields=['year_of_study', 'student_id'], name='student_year_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        student = super().from_db(db, field_names, values)
+        # The year eligibility was last checked against; see users.signals.
+        student._saved_year = student.__dict__.get('year_of_study')
+        return student
+
     def clean(self):
         if self.first_name.strip() == "" or self.last_name.strip() == "":
             raise ValidationError("First and last names cannot be blank.")
@@ -60,6 +72,12 @@ class StudentPreference(models.Model):
     available_to = models.DateField()
     industries = models.ManyToManyField(Industry, blank=True)
     skills = models.ManyToManyField(Skill, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_from', 'available_to'], name='studentpref_available_idx'),
+            models.Index(fields=['student', 'student_pref_id'], name='studentpref_student_idx'),
+        ]
     
     def clean(self):
         if self.available_from > self.available_to:
@@ -86,6 +104,12 @@ class Organisation(models.Model):
     contact_email = models.EmailField(unique=True, validators=[EmailValidator()])
     password = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['town'], name='organisation_town_idx'),
+            models.Index(fields=['org_name'], name='organisation_name_idx'),
+        ]
+
 class Location(models.Model):
     id = models.AutoField(primary_key=True)
     town = models.CharField(max_length=100)
@@ -107,6 +131,14 @@ class OrganisationPreference(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Covers the positions total of matching.organisation_capacity().
+            models.Index(fields=['organisation', 'positions_available'], name='orgpref_org_positions_idx'),
+            # Date window of the eligibility candidates.
+            models.Index(fields=['start_date', 'end_date'], name='orgpref_dates_idx'),
+        ]
+
     def clean(self):
         errors = {}
         if self.start_date > self.end_date:
@@ -148,16 +180,24 @@ class DesiredSkill(models.Model):
     class Meta:
         unique_together = ('student_pref', 'skill')
 
+# Logbook ids used to be random; kept because migration 0002 refers to it.
 def generate_random_logbook_id():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
+def generate_logbook_id():
+    from .ids import next_logbook_id
+    return next_logbook_id()
+
+DUPLICATE_WEEK = "A logbook for this week has already been submitted."
+
+
 class Logbook(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('viewed', 'Viewed'),
     ]
 
-    logbook_id = models.CharField(max_length=8, primary_key=True, default=generate_random_logbook_id, editable=False)
+    logbook_id = models.CharField(max_length=8, primary_key=True, default=generate_logbook_id, editable=False)
     student_id = models.ForeignKey('Student', to_field='student_id', on_delete=models.CASCADE)
     org_id = models.ForeignKey('Organisation', to_field='org_id', on_delete=models.CASCADE)
     week_number = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)])
@@ -166,6 +206,22 @@ class Logbook(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     viewed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'week_number'], name='logbook_status_week_idx'),
+            models.Index(fields=['submitted_at'], name='logbook_submitted_idx'),
+            # An organisation's or a student's logbooks, newest first.
+            models.Index(fields=['org_id', '-submitted_at'], name='logbook_org_submitted_idx'),
+            models.Index(fields=['student_id', '-submitted_at'], name='logbook_student_submitted_idx'),
+        ]
+        constraints = [
+            # One logbook per student and week, however it is submitted.
+            models.UniqueConstraint(
+                fields=['student_id', 'week_number'], name='logbook_student_week_unique',
+                violation_error_message=DUPLICATE_WEEK,
+            ),
+        ]
+
     def clean(self):
         if not self.log_entry.strip():
             raise ValidationError("Log entry cannot be empty.")
@@ -174,7 +230,21 @@ class Logbook(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        # The search index and LogbookCounter are updated by post_save.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        logbook = super().from_db(db, field_names, values)
+        # What LogbookCounter has counted this row as; see users.counters.
+        logbook._counted = logbook.counter_state()
+        return logbook
+
+    def counter_state(self):
+        """``(org_id, student_id, status)``, or None if a field is not loaded."""
+        state = (self.__dict__.get('org_id_id'), self.__dict__.get('student_id_id'), self.__dict__.get('status'))
+        return None if None in state else state
 
     def __str__(self):
         return f"Logbook entry for {self.student_id} Week {self.week_number}"
@@ -182,7 +252,43 @@ class Logbook(models.Model):
 @receiver(pre_save, sender=Logbook)
 def set_logbook_id(sender, instance, **kwargs):
     if not instance.logbook_id:
-        instance.logbook_id = generate_random_logbook_id()
+        instance.logbook_id = generate_logbook_id()
+
+class LogbookTerm(models.Model):
+    """A word of a logbook entry and how often it occurs; the search index of users.search."""
+    logbook = models.ForeignKey(Logbook, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=32)
+    count = models.PositiveSmallIntegerField()
+
+    class Meta:
+        # Covers the search queries, which then never read the table itself.
+        # One row per (term, logbook) is kept by search.index_logbooks().
+        indexes = [
+            models.Index(fields=['term', 'logbook', 'count'], name='logbook_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} x{self.count} in {self.logbook_id}"
+
+class LogbookCounter(models.Model):
+    """
+    Pending and viewed logbooks of one organisation ("org:<org_id>") or
+    student ("student:<student_id>"), kept current by users.counters.
+    """
+    key = models.CharField(primary_key=True, max_length=20)
+    pending = models.PositiveIntegerField(default=0)
+    viewed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.pending} pending, {self.viewed} viewed"
+
+class IdSequence(models.Model):
+    """Last value handed out by a named key sequence; see users.ids."""
+    name = models.CharField(primary_key=True, max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
 
 class Admin(models.Model):
     admin_id = models.AutoField(primary_key=True)
@@ -207,6 +313,12 @@ class StudentMatch(models.Model):
         related_name="match",
         help_text="The student preference that has been manually matched"
     )
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="match",
+        help_text="The preference's student, who has at most one match across their preferences"
+    )
     organisation = models.ForeignKey(
         Organisation,
         on_delete=models.CASCADE,
@@ -214,6 +326,41 @@ class StudentMatch(models.Model):
     )
     matched_at = models.DateTimeField(auto_now_add=True)
     admin_note = models.TextField(blank=True, null=True)
+    score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Matching score when the match was produced automatically"
+    )
 
     def __str__(self):
         return f"Match: {self.student_preference.student.student_id} with {self.organisation.org_name}"
+
+class EligiblePair(models.Model):
+    """
+    A student preference / organisation preference pair that passes the hard
+    filters: overlapping dates, year of study and industry. Maintained by
+    users.eligibility, with the score breakdown filled in by users.matching.
+    """
+    student_preference = models.ForeignKey(
+        StudentPreference,
+        on_delete=models.CASCADE,
+        related_name="eligible_pairs"
+    )
+    organisation_preference = models.ForeignKey(
+        OrganisationPreference,
+        on_delete=models.CASCADE,
+        related_name="eligible_pairs"
+    )
+    score = models.FloatField(default=0)
+    industry_score = models.FloatField(default=0)
+    skills_score = models.FloatField(default=0)
+    dates_score = models.FloatField(default=0)
+    location_score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('student_preference', 'organisation_preference')
+        indexes = [
+            models.Index(fields=['organisation_preference', 'student_preference'], name='eligible_org_student_idx'),
+            models.Index(fields=['student_preference', '-score'], name='eligible_student_score_idx'),
+            models.Index(fields=['organisation_preference', '-score'], name='eligible_org_score_idx'),
+        ]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import time
+import uuid
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Organisation, OrganisationPreference, Student
+from .renderers import dumps
+from .routers import primary
+from .serializers import OrganisationPreferenceSerializer, OrganisationSerializer, StudentSerializer
+
+# Serialized students, organisations and organisation preferences, kept in
+# the shared cache as ready-to-send JSON. Profiles are read on every
+# dashboard load and change rarely, so a read costs two cache lookups: the
+# object's version, then the payload stored under that version. Changes to
+# an object or to the rows its representation shows (see signals.py)
+# replace the version once committed; payloads of replaced versions are
+# left to expire. Unlike catalogue.py there is no per-process copy, as
+# there are too many objects to keep one in every process.
+#
+# A version also records when it was made, which is served as
+# Last-Modified. It only moves forward, a second at a time at least, so a
+# client's If-Modified-Since never matches a newer version.
+
+KINDS = {
+    'student': (StudentSerializer, lambda: StudentSerializer.project(Student.objects.all())),
+    'organisation': (OrganisationSerializer, lambda: OrganisationSerializer.project(Organisation.objects.all())),
+    'organisation_preference': (
+        OrganisationPreferenceSerializer,
+        lambda: OrganisationPreferenceSerializer.setup_eager_loading(OrganisationPreference.objects.all()),
+    ),
+}
+
+DATA_TIMEOUT = 24 * 60 * 60
+# A lost version is only a miss: the next read makes a newer one.
+VERSION_TIMEOUT = 7 * DATA_TIMEOUT
+
+
+def _etag(payload):
+    return '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+class Entry:
+    def __init__(self, version, modified, payload):
+        self.version = version
+        self.modified = modified
+        self.payload = payload
+        self.etag = _etag(payload)
+
+    def select(self, fields=None):
+        """Return the payload and ETag of the representation with only ``fields``."""
+        if fields is None:
+            return self.payload, self.etag
+        payload = dumps({name: value for name, value in json.loads(self.payload).items() if name in fields})
+        return payload, _etag(payload)
+
+
+def _version_key(kind, pk):
+    return f'object:{kind}:{quote(str(pk), safe="")}:version'
+
+
+def _data_key(kind, pk, version):
+    return f'object:{kind}:{quote(str(pk), safe="")}:{version}'
+
+
+def _versions(kind, pks):
+    keys = {_version_key(kind, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, (uuid.uuid4().hex, int(time.time())), timeout=VERSION_TIMEOUT)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_many(kind, pks):
+    """Return ``{pk: Entry}`` for the objects of ``pks`` that exist."""
+    serializer_class, queryset = KINDS[kind]
+    versions = _versions(kind, pks)
+    data_keys = {_data_key(kind, pk, versions[pk][0]): pk for pk in pks}
+    payloads = {data_keys[key]: payload for key, payload in cache.get_many(data_keys).items()}
+    missing = [pk for pk in pks if pk not in payloads]
+    if missing:
+        # Cached until the next change, so not read from a lagging replica.
+        with primary():
+            fresh = {obj.pk: dumps(serializer_class(obj).data) for obj in queryset().filter(pk__in=missing)}
+        cache.set_many(
+            {_data_key(kind, pk, versions[pk][0]): payload for pk, payload in fresh.items()}, timeout=DATA_TIMEOUT,
+        )
+        payloads.update(fresh)
+    return {pk: Entry(*versions[pk], payloads[pk]) for pk in pks if pk in payloads}
+
+
+def get(kind, pk):
+    """Return the Entry of one object, None if it does not exist."""
+    return get_many(kind, [pk]).get(pk)
+
+
+def invalidate(kind, pks):
+    keys = [_version_key(kind, pk) for pk in pks]
+    previous = cache.get_many(keys)
+    now = int(time.time())
+    cache.set_many(
+        {
+            key: (uuid.uuid4().hex, max(now, previous[key][1] + 1) if key in previous else now)
+            for key in keys
+        },
+        timeout=VERSION_TIMEOUT,
+    )
+
+
+def respond(request, payload, etag, last_modified=None):
+    """
+    Serve ``payload`` with its validators, or 304 Not Modified when the
+    client's copy is current. Browsers keep the body but revalidate it on
+    every use, as it belongs to one account.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def respond_many(request, entries):
+    """respond() with the JSON list of ``entries``; a list has no Last-Modified."""
+    payload = b'[' + b','.join(entry.payload for entry in entries) + b']'
+    return respond(request, payload, _etag(payload))
@@ -0,0 +1,77 @@
+from datetime import date
+
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination: each page is a ``WHERE key > last_key ...
+    LIMIT n`` range read, so the cost of a page does not grow with the table
+    or with how deep the client has paged.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def __init__(self, ordering='pk'):
+        self.ordering = ordering
+
+
+def paginated_response(request, queryset, serializer_class, ordering='pk'):
+    """
+    Serialize one page of ``queryset`` with ``next``/``previous`` links.
+    ``serializer_class`` is a RowSerializer or a SparseFieldsMixin
+    serializer; the page holds the fields picked by ?fields=.
+    """
+    try:
+        fields = fields_param(request, serializer_class)
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = KeysetPagination(ordering)
+    queryset = serializer_class.project(queryset, fields, ordering.lstrip('-'))
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
+
+
+class FilterError(ValueError):
+    pass
+
+
+def int_param(request, name):
+    """Return an integer query parameter, None when absent."""
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterError(f"{name} must be an integer.")
+
+
+def date_param(request, name):
+    """Return a YYYY-MM-DD query parameter as a date, None when absent."""
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise FilterError(f"{name} must be a date in YYYY-MM-DD format.")
+
+
+def fields_param(request, serializer_class):
+    """
+    Return the field names of a ?fields=a,b parameter, None when absent.
+    Raises FilterError for names the serializer does not render.
+    """
+    value = request.GET.get('fields')
+    if value in (None, ''):
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in serializer_class.readable_fields()]
+    if unknown:
+        raise FilterError(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
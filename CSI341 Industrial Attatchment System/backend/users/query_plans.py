@@ -0,0 +1,69 @@
+import re
+
+# EXPLAIN-based check that queries read through an index. plan_problems()
+# explains one query on SQLite or MySQL and reports
+#   * full scans: every row of a table (or of a whole index) is visited,
+#   * sorts: rows are sorted after reading instead of coming out of an
+#     index in order.
+# Two cases are not problems:
+#   * a scan by an unfiltered query with LIMIT: the first page of a list,
+#     read in index order, that stops after one page (.get() adds a LIMIT
+#     too, but it filters, so its scans count),
+#   * a sort of an IN (...) lookup, e.g. a prefetch, which reads several
+#     index ranges that no index returns in order.
+# Tables that are read whole by design go in WHOLE_TABLES.
+#
+# SQLite's planner assumes large tables when it has no statistics, so plans
+# on the small test database are those of a production-sized one. MySQL
+# may prefer a scan of a tiny table; run the check against a generated
+# cohort there (manage.py generate_cohort).
+
+WHOLE_TABLES = frozenset({'users_industry', 'users_skill'})
+
+_LIMIT = re.compile(r'\bLIMIT\s+\d+', re.IGNORECASE)
+_WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+_IN_LIST = re.compile(r'\bIN\s*\(', re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def explain(connection, sql):
+    """Return ``(table, access, detail)`` rows of the plan of ``sql``."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            rows = []
+            for *_, detail in cursor.fetchall():
+                scan = _SQLITE_SCAN.match(detail)
+                if scan:
+                    rows.append((scan.group(1), 'scan', detail))
+                elif detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+                    rows.append((None, 'sort', detail))
+                else:
+                    rows.append((None, 'lookup', detail))
+            return rows
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql)
+            columns = [column[0] for column in cursor.description]
+            rows = []
+            for values in cursor.fetchall():
+                row = dict(zip(columns, values))
+                extra = row.get('Extra') or ''
+                access = 'scan' if row.get('type') in ('ALL', 'index') else 'lookup'
+                rows.append((row.get('table'), access, f"type={row.get('type')} key={row.get('key')} {extra}"))
+                if 'Using filesort' in extra:
+                    rows.append((row.get('table'), 'sort', extra))
+            return rows
+    raise NotImplementedError(f'No EXPLAIN parser for {connection.vendor}')
+
+
+def plan_problems(connection, sql):
+    """Return descriptions of the full scans and sorts in the plan of ``sql``."""
+    first_page = bool(_LIMIT.search(sql)) and not _WHERE.search(sql)
+    lookup_list = bool(_IN_LIST.search(sql))
+    problems = []
+    for table, access, detail in explain(connection, sql):
+        if access == 'scan' and not first_page and table not in WHOLE_TABLES:
+            problems.append(f'full scan: {detail}')
+        elif access == 'sort' and not lookup_list:
+            problems.append(f'sort: {detail}')
+    return problems
@@ -0,0 +1,98 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read/write splitting between the primary database and the read replicas
+# listed in settings.DATABASE_REPLICAS. Writes always go to the primary.
+# Reads go to a replica only inside a request that ReplicaRoutingMiddleware
+# let use one - a GET/HEAD/OPTIONS request whose client has not written in
+# the last DATABASE_REPLICA_PIN_SECONDS - and only until the request
+# writes: from then on it reads from the primary, which has its changes.
+# Reads in a transaction, in management commands, signal handlers run
+# outside requests and the test suite go to the primary too.
+#
+# A request keeps to one replica, so its queries see one point in time.
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+
+class Routing:
+    """Where the reads of one request go."""
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+    def read_alias(self):
+        if self.replica is None or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return self.replica
+
+    def pin(self):
+        self.replica = None
+
+
+_routing = ContextVar('database_routing', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def begin(use_replica):
+    """Start routing a request; returns the Routing and the token for end()."""
+    aliases = replicas() if use_replica else []
+    routing = Routing(random.choice(aliases) if aliases else None)
+    return routing, enter(routing)
+
+
+def enter(routing):
+    """Route by ``routing`` again, e.g. while a streamed body is read."""
+    return _routing.set(routing)
+
+
+def end(token):
+    _routing.reset(token)
+
+
+def current():
+    return _routing.get()
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. to fill a shared cache."""
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None:
+            return None
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.pin()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {PRIMARY, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication.
+        return db not in replicas()
@@ -0,0 +1,175 @@
+from collections import defaultdict
+
+from django.db.models import F, Min
+
+from .models import DesiredSkill, OrganisationPreference, PreferredField, PreferredIndustry, RequiredSkill
+
+# Read-only serializers for the large list pages. Instead of loading model
+# instances and running DRF's fields on every attribute of every row, they
+# read the page with .values() and build each item from the row dict, with
+# one extra .values() query per nested list. The output is the same JSON as
+# the ModelSerializer named on each class; the parity tests hold them
+# together, so a field added there must be added here too.
+#
+# They follow the interface paginated_response() uses, with ``fields`` the
+# ?fields= selection (None for all):
+#
+#     rows = LogbookRows.project(queryset, fields)
+#     LogbookRows(rows, many=True, fields=fields).data
+#
+# project() reads only the columns of the selected fields, and complete()
+# skips the nested queries of fields that were not asked for.
+
+
+class RowSerializer:
+    # Output fields, in the order the serializer renders them.
+    fields = ()
+    # values() paths read for each row, by name; fields computed by
+    # complete() may need helper columns that are not output.
+    columns = {}
+    # The columns a computed field is made from; other fields are columns.
+    sources = {}
+
+    def __init__(self, rows, many=True, fields=None):
+        self.rows = rows
+        self.output = self.fields if fields is None else [name for name in self.fields if name in fields]
+
+    @classmethod
+    def readable_fields(cls):
+        return list(cls.fields)
+
+    @classmethod
+    def project(cls, queryset, fields=None, ordering=None):
+        """
+        ``queryset`` as the row dicts of ``fields`` (default: all); the
+        ``ordering`` column is read too, for the paginator.
+        """
+        needed = {ordering}
+        for name in fields or cls.fields:
+            needed.update(cls.sources.get(name, (name,)))
+        plain = [name for name, path in cls.columns.items() if name in needed and name == path]
+        renamed = {name: F(path) for name, path in cls.columns.items() if name in needed and name != path}
+        if ordering and ordering not in cls.columns:
+            plain.append(ordering)
+        return queryset.select_related(None).prefetch_related(None).values(*plain, **renamed)
+
+    def complete(self, rows, fields):
+        """Add the computed ``fields`` to ``rows``."""
+
+    @property
+    def data(self):
+        rows = list(self.rows)
+        output = self.output
+        self.complete(rows, set(output))
+        return [{name: row[name] for name in output} for row in rows]
+
+
+# Nested lists are ordered like the serializers' prefetches read them: by
+# the (parent, skill/industry) unique index, or by primary key.
+def _grouped(queryset, key, item):
+    groups = defaultdict(list)
+    for row in queryset:
+        groups[row[key]].append(item(row))
+    return groups
+
+
+class LogbookRows(RowSerializer):
+    """LogbookSerializer."""
+    fields = (
+        'logbook_id', 'student_id', 'student_name', 'org_id', 'week_number',
+        'log_entry', 'submitted_at', 'status', 'viewed_at',
+    )
+    columns = {
+        **{name: name for name in fields if name != 'student_name'},
+        'first_name': 'student_id__first_name',
+        'last_name': 'student_id__last_name',
+    }
+    sources = {'student_name': ('first_name', 'last_name')}
+
+    def complete(self, rows, fields):
+        if 'student_name' in fields:
+            for row in rows:
+                row['student_name'] = f"{row['first_name']} {row['last_name']}"
+
+
+class StudentPreferenceRows(RowSerializer):
+    """StudentPreferenceSerializer."""
+    fields = (
+        'student_pref_id', 'student_name', 'pref_location', 'available_from', 'available_to',
+        'industries_details', 'skills_details',
+    )
+    columns = {
+        'student_pref_id': 'student_pref_id',
+        'pref_location': 'pref_location',
+        'available_from': 'available_from',
+        'available_to': 'available_to',
+        'first_name': 'student__first_name',
+        'last_name': 'student__last_name',
+    }
+    sources = {
+        'student_name': ('first_name', 'last_name'),
+        'industries_details': ('student_pref_id',),
+        'skills_details': ('student_pref_id',),
+    }
+
+    def complete(self, rows, fields):
+        if 'student_name' in fields:
+            for row in rows:
+                row['student_name'] = f"{row['first_name']} {row['last_name']}"
+        pref_ids = [row['student_pref_id'] for row in rows]
+        if 'industries_details' in fields:
+            industries = _grouped(
+                PreferredIndustry.objects.filter(student_id__in=pref_ids).order_by('industry_id').values(
+                    'student_id', 'industry_id', 'industry__industry_name',
+                ),
+                'student_id',
+                lambda row: {'industry_id': row['industry_id'], 'industry_name': row['industry__industry_name']},
+            )
+            for row in rows:
+                row['industries_details'] = industries.get(row['student_pref_id'], [])
+        if 'skills_details' in fields:
+            skills = _grouped(
+                DesiredSkill.objects.filter(student_pref_id__in=pref_ids).order_by('skill_id').values(
+                    'student_pref_id', 'skill_id', 'skill__name',
+                ),
+                'student_pref_id',
+                lambda row: {'skill_id': row['skill_id'], 'skill_name': row['skill__name']},
+            )
+            for row in rows:
+                row['skills_details'] = skills.get(row['student_pref_id'], [])
+
+
+class OrganisationRows(RowSerializer):
+    """OrganisationWithPreferenceSerializer: an organisation and the names on its first preference."""
+    fields = (
+        'org_id', 'organisation_preference', 'org_name', 'town', 'street', 'plot_number',
+        'contact_number', 'contact_email', 'industry',
+    )
+    columns = {name: name for name in fields if name != 'organisation_preference'}
+    sources = {'organisation_preference': ('org_id',)}
+
+    def complete(self, rows, fields):
+        if 'organisation_preference' not in fields:
+            return
+        first = dict(
+            OrganisationPreference.objects.filter(organisation_id__in=[row['org_id'] for row in rows])
+            .order_by().values('organisation_id').annotate(first_pref_id=Min('pref_id'))
+            .values_list('organisation_id', 'first_pref_id')
+        )
+        pref_ids = list(first.values())
+        skills = _grouped(
+            RequiredSkill.objects.filter(preference_id__in=pref_ids).order_by('skill_id').values('preference_id', 'skill__name'),
+            'preference_id',
+            lambda row: row['skill__name'],
+        )
+        field_names = _grouped(
+            PreferredField.objects.filter(preference_id__in=pref_ids).order_by('pk').values('preference_id', 'field_name'),
+            'preference_id',
+            lambda row: row['field_name'],
+        )
+        for row in rows:
+            pref_id = first.get(row['org_id'])
+            row['organisation_preference'] = {} if pref_id is None else {
+                'required_skills_names': skills.get(pref_id, []),
+                'preferred_fields_names': field_names.get(pref_id, []),
+            }
@@ -0,0 +1,109 @@
+import math
+import re
+from collections import Counter
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, F, Sum, Value, When
+
+from .models import Logbook, LogbookTerm
+
+# Word search over logbook entries with an inverted index kept in the
+# database, so it works the same on MySQL and SQLite. Every entry is split
+# into lower-case words and each distinct word is stored as a LogbookTerm
+# row with its number of occurrences. A search reads only the index rows of
+# the query's words (the (term, logbook, count) index covers them, so the
+# table itself is not read) and ranks the entries by how many of the words
+# they contain, then by TF-IDF. The index is not unique: index_logbooks()
+# keeps one row per term and logbook by replacing all of a logbook's rows.
+#
+# The index is updated when a Logbook is saved (signals.py) and by the bulk
+# paths that create logbooks; `manage.py rebuild_search_index` rebuilds it.
+
+MAX_TERM_LENGTH = LogbookTerm._meta.get_field('term').max_length
+WORD = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+POSSESSIVE = re.compile(r"['’]s$")
+APOSTROPHE = re.compile(r"['’]")
+STOP_WORDS = frozenset("""
+    a an and are as at be been but by did do for from had has have i in into is it its me my of on or our so
+    that the their them then there they this to was we were what when which while with you your
+""".split())
+INDEX_BATCH = 2000
+# Seconds the logbook count used for IDF is reused.
+TOTAL_TIMEOUT = 5 * 60
+
+
+def terms(text):
+    """Return ``Counter({term: occurrences})`` for a piece of text."""
+    # "supervisor's" counts as "supervisor", "didn't" as "didnt".
+    words = (APOSTROPHE.sub('', POSSESSIVE.sub('', match.group().lower())) for match in WORD.finditer(text))
+    return Counter(word[:MAX_TERM_LENGTH] for word in words if len(word) > 1 and word not in STOP_WORDS)
+
+
+def index_logbooks(logbooks):
+    """Replace the index rows of the given Logbook instances."""
+    logbooks = list(logbooks)
+    if not logbooks:
+        return
+    rows = [
+        LogbookTerm(logbook_id=logbook.pk, term=term, count=min(count, 32767))
+        for logbook in logbooks
+        for term, count in terms(logbook.log_entry).items()
+    ]
+    with transaction.atomic():
+        LogbookTerm.objects.filter(logbook_id__in=[logbook.pk for logbook in logbooks]).delete()
+        LogbookTerm.objects.bulk_create(rows, batch_size=INDEX_BATCH)
+
+
+def rebuild(batch_size=INDEX_BATCH):
+    """Index every logbook from scratch; returns the number indexed."""
+    LogbookTerm.objects.all().delete()
+    logbooks = Logbook.objects.only('logbook_id', 'log_entry').order_by('pk').iterator(chunk_size=batch_size)
+    indexed = 0
+    while batch := list(islice(logbooks, batch_size)):
+        index_logbooks(batch)
+        indexed += len(batch)
+    return indexed
+
+
+def _total_logbooks():
+    # COUNT(*) is a full scan on InnoDB; IDF does not need it exact.
+    return cache.get_or_set('search:logbook_total', Logbook.objects.count, TOTAL_TIMEOUT)
+
+
+def search(query, filters=None, offset=0, limit=20):
+    """
+    Rank the logbooks matching any word of ``query``. ``filters`` are
+    Logbook field lookups, e.g. ``{'org_id': 3}``. Returns a list of
+    ``(logbook_id, score, matched_terms)``, best first.
+    """
+    words = list(terms(query))
+    if not words:
+        return []
+    postings = LogbookTerm.objects.filter(term__in=words)
+    if filters:
+        postings = postings.filter(**{f'logbook__{lookup}': value for lookup, value in filters.items()})
+
+    frequencies = {
+        row['term']: row['entries']
+        for row in LogbookTerm.objects.filter(term__in=words).values('term').annotate(entries=Count('logbook'))
+    }
+    total = max(_total_logbooks(), 1)
+    weights = {word: math.log(1 + total / frequencies[word]) for word in words if word in frequencies}
+    if not weights:
+        return []
+
+    ranked = postings.filter(term__in=list(weights)).values('logbook_id').annotate(
+        matched=Count('term'),
+        score=Sum(
+            Case(
+                *[When(term=word, then=Value(weight) * F('count')) for word, weight in weights.items()],
+                output_field=FloatField(),
+            )
+        ),
+    ).order_by('-matched', '-score', 'logbook_id')
+    return [
+        (row['logbook_id'], round(row['score'], 4), row['matched'])
+        for row in ranked[offset:offset + limit]
+    ]
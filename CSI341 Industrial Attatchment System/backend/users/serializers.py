@@ -1,13 +1,73 @@
+import functools
+
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
+from django.db.models import Prefetch
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from .models import User
 
+
+class SparseFieldsMixin:
+    """
+    Render only the fields named by ``fields=`` (the ?fields= parameter, see
+    pagination.fields_param) and load only what they read: project() turns
+    the field list into only()/select_related()/prefetch_related(). Fields
+    whose source is not a model path list what they read in
+    Meta.field_sources (model paths) or Meta.field_prefetches (lookups).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.readable_fields()) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    @functools.cache
+    def readable_fields(cls):
+        return [name for name, field in cls().fields.items() if not field.write_only]
+
+    @classmethod
+    @functools.cache
+    def _reads(cls):
+        """``{field: (model paths, prefetch lookups)}`` for the readable fields."""
+        declared = cls().fields
+        sources = getattr(cls.Meta, 'field_sources', {})
+        prefetches = getattr(cls.Meta, 'field_prefetches', {})
+        return {
+            name: ((), prefetches[name]) if name in prefetches
+            else (sources.get(name, (declared[name].source.replace('.', '__'),)), ())
+            for name in cls.readable_fields()
+        }
+
+    @classmethod
+    def project(cls, queryset, fields=None, ordering=None):
+        """``queryset`` loading only what ``fields`` (default: every readable field) need."""
+        reads = cls._reads()
+        columns, related, lookups = set(), set(), []
+        for name in fields or reads:
+            paths, prefetches = reads[name]
+            lookups.extend(prefetches)
+            for path in paths:
+                columns.add(path)
+                if '__' in path:
+                    related.add(path.rsplit('__', 1)[0])
+        if ordering:
+            columns.add(ordering)
+        queryset = queryset.only(*columns)
+        if related:
+            queryset = queryset.select_related(*related)
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
 
 from .models import (
     Student, 
@@ -24,10 +84,11 @@ from .models import (
     Admin
 )
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
 
     def validate(self, data):
         if data['first_name'].strip() == "" or data['last_name'].strip() == "":
@@ -52,6 +113,7 @@ class AdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = Admin
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
 
     def validate(self, data):
         if data['first_name'].strip() == '' or data['last_name'].strip() == '':
@@ -67,12 +129,13 @@ class SkillSerializer(serializers.ModelSerializer):
         model = Skill
         fields = ['skill_id', 'name']
 
-class OrganisationSerializer(serializers.ModelSerializer):
+class OrganisationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     industry_name = serializers.CharField(source="industry.industry_name", read_only=True)
 
     class Meta:
         model = Organisation
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
         validated_data['password'] = make_password(validated_data['password'])
@@ -110,6 +173,13 @@ class OrganisationPreferenceSerializer(serializers.ModelSerializer):
             'required_skills_names',
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the read-only fields need in a fixed number of queries."""
+        return queryset.select_related('organisation').prefetch_related(
+            'preferred_fields', 'required_skills__skill'
+        )
+
     def validate(self, data):
         if data['start_date'] > data['end_date']:
             raise serializers.ValidationError("Start date must be before end date.")
@@ -176,6 +246,13 @@ class StudentPreferenceSerializer(serializers.ModelSerializer):
             'skills_details',
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the read-only fields need in a fixed number of queries."""
+        return queryset.select_related('student').prefetch_related(
+            'preferredindustry_set__industry', 'desiredskill_set__skill'
+        )
+
     def validate(self, data):
         if data['available_from'] > data['available_to']:
             raise serializers.ValidationError("Available from date must be before available to date.")
@@ -225,13 +302,13 @@ class StudentPreferenceSerializer(serializers.ModelSerializer):
     def get_industries_details(self, obj):
         return [
             {"industry_id": i.industry.industry_id, "industry_name": i.industry.industry_name}
-            for i in obj.preferredindustry_set.select_related("industry").all()
+            for i in obj.preferredindustry_set.all()
         ]
 
     def get_skills_details(self, obj):
         return [
             {"skill_id": s.skill.skill_id, "skill_name": s.skill.name}
-            for s in obj.desiredskill_set.select_related("skill").all()
+            for s in obj.desiredskill_set.all()
         ]
 
     
@@ -253,6 +330,11 @@ class LogbookSerializer(serializers.ModelSerializer):
         fields = ['logbook_id', 'student_id', 'student_name', 'org_id', 'week_number', 
                  'log_entry', 'submitted_at', 'status', 'viewed_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join the student so get_student_name does not query per row."""
+        return queryset.select_related('student_id')
+
     def validate(self, data):
         if not data['log_entry'].strip():
             raise serializers.ValidationError("Log entry cannot be empty.")
@@ -263,15 +345,43 @@ class LogbookSerializer(serializers.ModelSerializer):
     def get_student_name(self, obj):
         return f"{obj.student_id.first_name} {obj.student_id.last_name}"
 
-class OrganisationWithPreferenceSerializer(serializers.ModelSerializer):
+class LogbookEntrySerializer(serializers.Serializer):
+    """One entry of a batch submission; students and organisations are checked in bulk."""
+    student_id = serializers.CharField()
+    org_id = serializers.IntegerField()
+    week_number = serializers.IntegerField(min_value=1, max_value=10)
+    log_entry = serializers.CharField()
+
+    validate = LogbookSerializer.validate
+
+class OrganisationWithPreferenceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organisation_preference = serializers.SerializerMethodField()
 
     class Meta:
         model = Organisation
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
+        field_prefetches = {
+            'organisation_preference': (
+                Prefetch(
+                    'preferences',
+                    queryset=OrganisationPreference.objects.order_by('pk').prefetch_related(
+                        'preferred_fields', 'required_skills__skill'
+                    ),
+                ),
+            ),
+        }
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Load the preferences and their skills/fields in a fixed number of queries."""
+        return cls.project(queryset)
 
     def get_organisation_preference(self, obj):
-        preference = obj.preferences.first()
+        # Index the prefetched list instead of calling first(), which would
+        # issue a new query per organisation.
+        preferences = obj.preferences.all()
+        preference = preferences[0] if preferences else None
         if preference:
             return {
                 "required_skills_names": [rs.skill.name for rs in preference.required_skills.all()],
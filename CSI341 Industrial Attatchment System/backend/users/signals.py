@@ -0,0 +1,261 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalogue, counters, eligibility, events, matching, object_cache, search
+from .models import (
+    Student,
+    StudentPreference,
+    PreferredIndustry,
+    DesiredSkill,
+    Organisation,
+    OrganisationPreference,
+    PreferredField,
+    RequiredSkill,
+    StudentMatch,
+    Industry,
+    Skill,
+    Logbook,
+    LogbookCounter,
+)
+
+# Keep the eligibility table, its stored scores and the in-memory matching
+# engine current. Updates run after the transaction commits so they re-read
+# the saved rows, and eligibility goes first because the others read it.
+# The cached representations of object_cache.py are replaced once the
+# change is committed too.
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched():
+    """
+    Collect the refreshes requested inside the block and run them once at
+    the end, e.g. around a delete that cascades to thousands of rows.
+    """
+    if getattr(_batch, "pending", None) is not None:
+        yield
+        return
+    _batch.pending = {"students": set(), "organisations": set(), "objects": set(), "counters": False}
+    try:
+        yield
+    finally:
+        pending, _batch.pending = _batch.pending, None
+    if pending["students"]:
+        _students_changed(list(pending["students"]))
+    if pending["organisations"]:
+        _organisations_changed(list(pending["organisations"]))
+    if pending["counters"]:
+        counters.rebuild()
+    if pending["objects"]:
+        _objects_changed(pending["objects"])
+
+
+def _students_changed(pref_ids):
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending["students"].update(pref_ids)
+        return
+
+    def refresh():
+        eligibility.refresh_students(pref_ids)
+        matching.store_scores(student_pref_ids=pref_ids)
+        matching.student_preferences_changed(pref_ids)
+    transaction.on_commit(refresh)
+
+
+def _organisations_changed(pref_ids):
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending["organisations"].update(pref_ids)
+        return
+
+    def refresh():
+        eligibility.refresh_organisations(pref_ids)
+        matching.store_scores(org_pref_ids=pref_ids)
+        matching.organisation_preferences_changed(pref_ids)
+    transaction.on_commit(refresh)
+
+
+def _objects_changed(objects):
+    """Replace the cached representations of ``(kind, pk)`` pairs."""
+    objects = set(objects)
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending["objects"].update(objects)
+        return
+
+    def refresh():
+        by_kind = {}
+        for kind, pk in objects:
+            by_kind.setdefault(kind, []).append(pk)
+        for kind, pks in by_kind.items():
+            object_cache.invalidate(kind, pks)
+    if objects:
+        transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=StudentPreference)
+@receiver(post_delete, sender=StudentPreference)
+def student_preference_changed(sender, instance, **kwargs):
+    _students_changed([instance.pk])
+
+
+@receiver(post_save, sender=PreferredIndustry)
+@receiver(post_delete, sender=PreferredIndustry)
+def preferred_industry_changed(sender, instance, **kwargs):
+    _students_changed([instance.student_id])
+
+
+@receiver(post_save, sender=DesiredSkill)
+@receiver(post_delete, sender=DesiredSkill)
+def desired_skill_changed(sender, instance, **kwargs):
+    _students_changed([instance.student_pref_id])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_cached(sender, instance, **kwargs):
+    _objects_changed([("student", instance.pk)])
+
+
+@receiver(pre_save, sender=Student)
+def student_saving(sender, instance, **kwargs):
+    # As for logbooks below: a student built by hand for an existing row, or
+    # loaded without year_of_study, reads the year before it is overwritten.
+    if not instance._state.adding and getattr(instance, "_saved_year", None) is None:
+        instance._saved_year = Student.objects.filter(pk=instance.pk).values_list("year_of_study", flat=True).first()
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    # year_of_study is a hard constraint, so every preference of the
+    # student has to be re-checked when it changes; other fields do not
+    # take part in eligibility.
+    saved_year, instance._saved_year = getattr(instance, "_saved_year", None), instance.year_of_study
+    if created or saved_year == instance.year_of_study:
+        return
+    pref_ids = list(StudentPreference.objects.filter(student=instance).values_list("student_pref_id", flat=True))
+    if pref_ids:
+        _students_changed(pref_ids)
+
+
+@receiver(post_save, sender=OrganisationPreference)
+@receiver(post_delete, sender=OrganisationPreference)
+def organisation_preference_changed(sender, instance, **kwargs):
+    _organisations_changed([instance.pk])
+    _objects_changed([("organisation_preference", instance.pk)])
+
+
+@receiver(post_save, sender=PreferredField)
+@receiver(post_delete, sender=PreferredField)
+@receiver(post_save, sender=RequiredSkill)
+@receiver(post_delete, sender=RequiredSkill)
+def organisation_requirement_changed(sender, instance, **kwargs):
+    _organisations_changed([instance.preference_id])
+    _objects_changed([("organisation_preference", instance.preference_id)])
+
+
+@receiver(post_save, sender=Organisation)
+@receiver(post_delete, sender=Organisation)
+def organisation_cached(sender, instance, **kwargs):
+    _objects_changed([("organisation", instance.pk)])
+
+
+@receiver(post_save, sender=Organisation)
+def organisation_changed(sender, instance, created, **kwargs):
+    # The organisation's industry and town feed into every one of its
+    # preferences, and its name is shown on them.
+    if created:
+        return
+    pref_ids = list(instance.preferences.values_list("pref_id", flat=True))
+    if pref_ids:
+        _organisations_changed(pref_ids)
+        _objects_changed(("organisation_preference", pk) for pk in pref_ids)
+
+
+@receiver(post_save, sender=StudentMatch)
+@receiver(post_delete, sender=StudentMatch)
+def student_match_changed(sender, instance, **kwargs):
+    pref_ids = [instance.student_preference_id]
+    transaction.on_commit(lambda: matching.matches_changed(pref_ids))
+
+
+@receiver(post_save, sender=StudentMatch)
+def student_match_saved(sender, instance, **kwargs):
+    events.match_saved(instance)
+
+
+@receiver(post_delete, sender=StudentMatch)
+def student_match_deleted(sender, instance, **kwargs):
+    events.match_deleted(instance)
+
+
+@receiver(post_save, sender=Industry)
+@receiver(post_delete, sender=Industry)
+def industry_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: catalogue.invalidate("industries"))
+    # Organisations show their industry's name.
+    org_ids = Organisation.objects.filter(industry_id=instance.pk).values_list("org_id", flat=True)
+    _objects_changed(("organisation", pk) for pk in org_ids)
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def skill_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: catalogue.invalidate("skills"))
+    # Preferences show the names of the skills they require.
+    pref_ids = RequiredSkill.objects.filter(skill_id=instance.pk).values_list("preference_id", flat=True)
+    _objects_changed(("organisation_preference", pk) for pk in pref_ids)
+
+
+@receiver(post_save, sender=Logbook)
+def logbook_saved(sender, instance, update_fields=None, **kwargs):
+    # Status changes leave the text, and so the search index, alone.
+    if update_fields is None or "log_entry" in update_fields:
+        search.index_logbooks([instance])
+
+
+@receiver(pre_save, sender=Logbook)
+def logbook_saving(sender, instance, **kwargs):
+    # A logbook built by hand for an existing row, or loaded with deferred
+    # fields, reads what was counted for it before it is overwritten.
+    if not instance._state.adding and getattr(instance, "_counted", None) is None:
+        instance._counted = Logbook.objects.filter(pk=instance.pk).values_list("org_id", "student_id", "status").first()
+
+
+@receiver(post_save, sender=Logbook)
+def logbook_state_changed(sender, instance, **kwargs):
+    counted, state = getattr(instance, "_counted", None), instance.counter_state()
+    if counted != state:
+        counters.adjust(removed=[counted] if counted else [], added=[state] if state else [])
+        # The dashboards' event stream follows the same changes.
+        if counted is None:
+            events.logbook_submitted(instance)
+        elif state and state[2] == "viewed" != counted[2]:
+            events.logbook_viewed(instance.pk, state[0], state[1], instance.viewed_at)
+    instance._counted = state
+
+
+def _owner_deleted(key, logbooks):
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending["counters"] = True
+        return
+    counters.forget(logbooks)
+    LogbookCounter.objects.filter(key=key).delete()
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleting(sender, instance, **kwargs):
+    _owner_deleted(counters.student_key(instance.pk), Logbook.objects.filter(student_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Organisation)
+def organisation_deleting(sender, instance, **kwargs):
+    _owner_deleted(counters.org_key(instance.pk), Logbook.objects.filter(org_id=instance.pk))
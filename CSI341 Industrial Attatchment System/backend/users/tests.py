@@ -1,3 +1,2213 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import itertools
+import json
+import os
+import random
+import runpy
+import tempfile
+import threading
+from asgiref.sync import async_to_sync
+from decimal import Decimal
+from unittest import SkipTest
+from unittest.mock import patch
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from . import checks, counters, eligibility, events, logbooks, matching, object_cache, routers, search, signals
+from .authentication import issue_token
+from .ids import (
+    LOGBOOK_SEQUENCE, SequenceExhausted, allocate as allocate_sequence, from_base36, logbook_ids, to_base36,
+)
+from .logbooks import mark_viewed, submit_logbooks
+from .matching import GENERATION_SEQUENCE, SCORE_FIELDS, MatchingEngine, allocate, engine_session, store_scores
+from .middleware import (
+    BudgetExceeded, ReplicaRoutingMiddleware, _accepts_brotli, brotli, endpoint_budget, metrics,
+)
+from .pagination import KeysetPagination
+from .query_plans import plan_problems
+from .renderers import dumps
+from .rows import LogbookRows, OrganisationRows, StudentPreferenceRows
+from .throttling import counters as throttle_counters, take
+from .models import (
+    DUPLICATE_WEEK,
+    Admin,
+    DesiredSkill,
+    EligiblePair,
+    IdSequence,
+    Industry,
+    Logbook,
+    LogbookCounter,
+    LogbookTerm,
+    Organisation,
+    OrganisationPreference,
+    PreferredField,
+    PreferredIndustry,
+    RequiredSkill,
+    Skill,
+    Student,
+    StudentMatch,
+    StudentPreference,
+)
+from .serializers import (
+    LogbookSerializer,
+    OrganisationWithPreferenceSerializer,
+    StudentPreferenceSerializer,
+)
+
+
+def bearer(role, account_id):
+    """Client kwargs authenticating a request as the given account."""
+    return {'HTTP_AUTHORIZATION': 'Bearer ' + issue_token(role, account_id)['token']}
+
+
+class MatchingEngineTests(TestCase):
+    """Scoring, ranking and capacity-constrained allocation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.it = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.finance = Industry.objects.create(industry_id='FIN', industry_name='Finance')
+        cls.python = Skill.objects.create(skill_id='PY', name='Python')
+        cls.sql = Skill.objects.create(skill_id='SQL', name='SQL')
+        cls.today = datetime.date.today()
+
+    @classmethod
+    def organisation(cls, name, industry=None, town='Gaborone', positions=1, skills=(), days=60, level=1):
+        organisation = Organisation.objects.create(
+            org_name=name, industry=industry or cls.it, town=town, street='Main', plot_number='1',
+            contact_number=f'71{Organisation.objects.count():05d}', contact_email=f'{name.lower()}@example.com',
+            password='x',
+        )
+        preference = OrganisationPreference.objects.create(
+            organisation=organisation, pref_education_level=level, positions_available=positions,
+            start_date=cls.today, end_date=cls.today + datetime.timedelta(days=days - 1),
+        )
+        for skill in skills:
+            RequiredSkill.objects.create(preference=preference, skill=skill)
+        return preference
+
+    @classmethod
+    def student(cls, student_id, year=3):
+        return Student.objects.create(
+            student_id=student_id, first_name='Ann', last_name=student_id, year_of_study=year,
+            student_email=f'{student_id}@example.com', student_contact_number=student_id[-7:], password='x',
+        )
+
+    @classmethod
+    def preference(cls, student, town='Gaborone', industries=(), skills=(), days=90):
+        preference = StudentPreference.objects.create(
+            student=student, pref_location=town,
+            available_from=cls.today, available_to=cls.today + datetime.timedelta(days=days - 1),
+        )
+        for industry in industries:
+            PreferredIndustry.objects.create(student=preference, industry=industry)
+        for skill in skills:
+            DesiredSkill.objects.create(student_pref=preference, skill=skill)
+        return preference
+
+    def engine(self):
+        eligibility.rebuild()
+        return MatchingEngine().load()
+
+    def test_scores_and_ranking(self):
+        # Industry 0.4, skills 0.35, dates 0.15, location 0.1.
+        half_skills = self.organisation('Acme', skills=[self.python, self.sql], days=60)
+        longer = self.organisation('Bolt', town='Maun', skills=[self.python], days=120)
+        no_skills = self.organisation('Bank', industry=self.finance)
+        ann = self.preference(self.student('202000001'), industries=[self.it], skills=[self.python], days=90)
+        open_minded = self.preference(self.student('202000002'), town='Maun', days=90)
+
+        engine = self.engine()
+        engine.score()
+        components = engine.components()
+        row, column = engine.student_index[ann.pk], engine.org_index[half_skills.pk]
+        self.assertEqual(
+            {name: float(value[row, column]) for name, value in components.items()},
+            {'industry': 1.0, 'skills': 0.5, 'dates': 1.0, 'location': 1.0},
+        )
+        column = engine.org_index[longer.pk]
+        self.assertEqual(
+            {name: float(value[row, column]) for name, value in components.items()},
+            {'industry': 1.0, 'skills': 1.0, 'dates': 0.75, 'location': 0.0},
+        )
+        # No industry preference is half an industry match.
+        self.assertEqual(float(components['industry'][engine.student_index[open_minded.pk], column]), 0.5)
+
+        ranked = engine.ranked_candidates()
+        # Bank's industry is not one Ann asked for, so it is not a candidate.
+        self.assertEqual(
+            [(c['pref_id'], c['score']) for c in ranked[ann.pk]], [(longer.pk, 0.8625), (half_skills.pk, 0.825)],
+        )
+        # A student without skills meets every requirement of a preference with none.
+        self.assertEqual(
+            [(c['pref_id'], c['score']) for c in ranked[open_minded.pk]],
+            [(no_skills.pk, 0.7), (longer.pk, 0.4125), (half_skills.pk, 0.35)],
+        )
+        self.assertEqual([c['pref_id'] for c in engine.ranked_candidates(k=1)[ann.pk]], [longer.pk])
+
+        # Weights change the order, not the candidates.
+        engine = MatchingEngine(weights={'location': 0.5}).load()
+        self.assertEqual([c['pref_id'] for c in engine.ranked_candidates()[ann.pk]], [half_skills.pk, longer.pk])
+
+    def test_allocation_is_stable_and_within_capacity(self):
+        rng = np.random.default_rng(7)
+        for _ in range(25):
+            n_rows, n_columns = rng.integers(1, 30), rng.integers(1, 8)
+            scores = rng.random((n_rows, n_columns))
+            feasible = rng.random((n_rows, n_columns)) < 0.6
+            capacities = rng.integers(0, 4, n_columns)
+            owners = rng.integers(0, max(1, n_rows // 2), n_rows).tolist()
+            assignment = allocate(scores, feasible, capacities, owners=owners)
+
+            placed = [owners[i] for i, j in enumerate(assignment) if j >= 0]
+            self.assertEqual(len(placed), len(set(placed)))
+            held = {j: [i for i in range(n_rows) if assignment[i] == j] for j in range(n_columns)}
+            for j, rows in held.items():
+                self.assertLessEqual(len(rows), capacities[j])
+                self.assertTrue(all(feasible[i, j] for i in rows))
+            # No blocking pair: a student preferring a column over their
+            # place finds it full of students it prefers to them.
+            best = {owners[i]: scores[i, j] for i, j in enumerate(assignment) if j >= 0}
+            for i, j in zip(*np.nonzero(feasible)):
+                if scores[i, j] > best.get(owners[i], -1.0):
+                    self.assertEqual(len(held[j]), capacities[j])
+                    self.assertTrue(all(scores[k, j] > scores[i, j] for k in held[j]))
+
+    def test_assign_fills_the_positions_left_by_existing_matches(self):
+        acme = self.organisation('Acme', positions=2)
+        first, second, third = (self.preference(self.student(f'20200000{n}'), days=60 - n) for n in (1, 2, 3))
+        StudentMatch.objects.create(student_preference=third, student=third.student, organisation=acme.organisation)
+
+        engine = self.engine()
+        engine.score()
+        assignments = engine.assign()
+        # The better-scoring student of the two unmatched ones takes the place left.
+        self.assertEqual([a['student_pref_id'] for a in assignments], [first.pk])
+        self.assertEqual(engine.kept, {third.pk})
+        self.assertEqual(
+            sorted(a['student_pref_id'] for a in engine.assign(keep_existing=False)), sorted([first.pk, second.pk]),
+        )
+
+    def test_a_student_with_several_preferences_gets_one_place(self):
+        acme = self.organisation('Acme', positions=2, skills=[self.python])
+        bank = self.organisation('Bank', industry=self.finance, town='Maun', positions=2)
+        ann = self.student('202000001')
+        first = self.preference(ann, industries=[self.it], skills=[self.python])
+        second = self.preference(ann, town='Maun', industries=[self.finance])
+        self.preference(self.student('202000002'), industries=[self.finance])
+
+        engine = self.engine()
+        assignments = engine.assign()
+        by_student = {}
+        for assignment in assignments:
+            by_student.setdefault(assignment['student_id'], []).append(assignment)
+        self.assertEqual(len(by_student['202000001']), 1)
+        self.assertEqual(by_student['202000001'][0]['student_pref_id'], first.pk)
+        self.assertEqual(by_student['202000001'][0]['pref_id'], acme.pk)
+        self.assertEqual([a['pref_id'] for a in by_student['202000002']], [bank.pk])
+
+        # A student matched on one preference is not placed again on another.
+        StudentMatch.objects.create(student_preference=second, student=ann, organisation=bank.organisation)
+        engine = self.engine()
+        assignments = engine.assign()
+        self.assertEqual({a['student_id'] for a in assignments}, {'202000002'})
+        self.assertEqual(engine.kept, {second.pk})
+
+
+    def test_writes_keep_one_match_per_student(self):
+        acme = self.organisation('Acme', positions=3, skills=[self.python])
+        bank = self.organisation('Bank', industry=self.finance, positions=3)
+        ann = self.student('202000001')
+        first = self.preference(ann, industries=[self.it], skills=[self.python])
+        second = self.preference(ann, industries=[self.finance])
+        self.preference(self.student('202000002'), industries=[self.finance])
+
+        engine = self.engine()
+        created = engine.write_matches()
+        self.assertEqual(sorted(match.student_id for match in created), ['202000001', '202000002'])
+        match = StudentMatch.objects.get(student=ann)
+        self.assertEqual((match.student_preference_id, match.organisation_id), (first.pk, acme.organisation_id))
+        self.assertEqual(engine.write_matches(), [])
+
+        twice = [
+            {'student_pref_id': pref.pk, 'student_id': ann.pk, 'organisation_id': bank.organisation_id, 'score': 0.5}
+            for pref in (first, second)
+        ]
+        with self.assertRaises(ValueError):
+            engine.commit_assignment(twice, keep_existing=False)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            engine.commit_assignment(twice[1:])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StudentMatch.objects.create(student_preference=second, student=ann, organisation=bank.organisation)
+        self.assertEqual(StudentMatch.objects.filter(student=ann).count(), 1)
+
+        # Matching another of the student's preferences by hand moves the match.
+        response = self.client.post(reverse('manual_match'), {
+            'student_pref_id': second.pk, 'organisation_id': bank.organisation_id,
+        }, content_type='application/json', **bearer('admin', 1))
+        self.assertEqual(response.status_code, 200)
+        match = StudentMatch.objects.get(student=ann)
+        self.assertEqual((match.student_preference_id, match.organisation_id), (second.pk, bank.organisation_id))
+
+
+    def test_engine_reloads_after_changes_made_by_other_processes(self):
+        self.organisation('Acme')
+        self.preference(self.student('202000001'))
+        eligibility.rebuild()
+        with engine_session(reload=True) as engine:
+            loaded = engine
+        with engine_session() as engine:
+            self.assertIs(engine, loaded)
+        # What another worker's signal handlers do; this process's engine
+        # has not seen the change.
+        allocate_sequence(GENERATION_SEQUENCE)
+        with engine_session() as engine:
+            self.assertIsNot(engine, loaded)
+
+    def test_saving_a_student_or_organisation_refreshes_in_place(self):
+        acme = self.organisation('Acme', level=2)
+        bank = self.organisation('Bank', industry=self.finance, town='Maun', skills=[self.python])
+        ann = self.student('202000001')
+        ann_it = self.preference(ann, industries=[self.it])
+        self.preference(self.student('202000002'), skills=[self.python])
+        eligibility.rebuild()
+        store_scores()
+
+        def scores(engine):
+            return {
+                (student_pref_id, org_pref_id): round(float(engine.scores[i, j]), 4)
+                for i, student_pref_id in enumerate(engine.student_ids)
+                for j, org_pref_id in enumerate(engine.org_pref_ids)
+                if engine.feasible[i, j]
+            }
+
+        self.enterContext(patch.object(matching, '_engine', None))
+        with engine_session() as engine:
+            loaded = engine
+        # Year of study is below Acme's level now; Bank moves into Ann's industry and Acme's town.
+        with self.captureOnCommitCallbacks(execute=True):
+            ann.year_of_study = 1
+            ann.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            bank.organisation.industry = self.it
+            bank.organisation.town = 'Gaborone'
+            bank.organisation.save()
+
+        with engine_session() as engine:
+            self.assertIs(engine, loaded)
+            refreshed = scores(engine)
+        fresh = MatchingEngine().load()
+        fresh.score()
+        self.assertEqual(refreshed, scores(fresh))
+        self.assertNotIn((ann_it.pk, acme.pk), refreshed)
+        self.assertIn((ann_it.pk, bank.pk), refreshed)
+
+        stored = set(EligiblePair.objects.values_list('student_preference_id', 'organisation_preference_id', 'score'))
+        eligibility.rebuild()
+        store_scores()
+        self.assertEqual(
+            stored,
+            set(EligiblePair.objects.values_list('student_preference_id', 'organisation_preference_id', 'score')),
+        )
+
+    def test_stored_scores_match_the_engine(self):
+        acme = self.organisation('Acme', skills=[self.python, self.sql])
+        bank = self.organisation('Bank', industry=self.finance)
+        ann = self.preference(self.student('202000001'), skills=[self.python], days=30)
+        self.preference(self.student('202000002'), industries=[self.finance])
+        engine = self.engine()
+        self.assertEqual(EligiblePair.objects.filter(score__gt=0).count(), 0)
+
+        self.assertEqual(store_scores(batch_size=1), EligiblePair.objects.count())
+        components = engine.components()
+        components[None] = engine.total(components)
+        for pair in EligiblePair.objects.all():
+            row = engine.student_index[pair.student_preference_id]
+            column = engine.org_index[pair.organisation_preference_id]
+            for field, component in SCORE_FIELDS.items():
+                self.assertAlmostEqual(getattr(pair, field), float(components[component][row, column]), places=4)
+        self.assertFalse(EligiblePair.objects.filter(score=0).exists())
+        self.assertEqual(store_scores(org_pref_ids=[bank.pk]), 2)
+        self.assertEqual(store_scores(student_pref_ids=[ann.pk], org_pref_ids=[acme.pk]), 1)
+
+    def test_creating_a_preference_refreshes_once(self):
+        acme = self.organisation('Acme')
+        self.student('202000001')
+        start = (self.today + datetime.timedelta(days=1)).isoformat()
+        end = (self.today + datetime.timedelta(days=60)).isoformat()
+        with patch.object(eligibility, 'refresh_students', wraps=eligibility.refresh_students) as students, \
+                patch.object(eligibility, 'refresh_organisations', wraps=eligibility.refresh_organisations) as organisations:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('create_organisation_preference', args=[acme.organisation_id]), {
+                    'organisation': acme.organisation_id, 'pref_education_level': 1, 'positions_available': 2,
+                    'start_date': start, 'end_date': end, 'preferred_fields': ['IT', 'FIN'],
+                    'required_skills': ['PY', 'SQL'],
+                }, content_type='application/json', **bearer('organisation', acme.organisation_id))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(organisations.call_count, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('create_student_preference'), {
+                    'student_id': '202000001', 'pref_location': 'Gaborone', 'available_from': start,
+                    'available_to': end, 'preferred_industry': 'IT', 'desired_skill': 'PY',
+                }, content_type='application/json', **bearer('student', '202000001'))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(students.call_count, 1)
+        preference = StudentPreference.objects.get(student_id='202000001')
+        self.assertEqual(EligiblePair.objects.filter(student_preference=preference).count(), 2)
+
+        # A preference naming an unknown skill is not left half-saved.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('create_student_preference'), {
+                'student_id': '202000001', 'pref_location': 'Gaborone', 'available_from': start,
+                'available_to': end, 'preferred_industry': 'IT', 'desired_skill': 'NOPE',
+            }, content_type='application/json', **bearer('student', '202000001'))
+        self.assertEqual(StudentPreference.objects.filter(student_id='202000001').count(), 1)
+
+    def test_only_a_new_year_of_study_refreshes_a_student(self):
+        self.preference(self.student('202000001'))
+        with patch.object(eligibility, 'refresh_students', wraps=eligibility.refresh_students) as students:
+            with self.captureOnCommitCallbacks(execute=True):
+                student = Student.objects.get(pk='202000001')
+                student.first_name = 'Anne'
+                student.save()
+                Student.objects.only('student_id').get(pk='202000001').save()
+            self.assertEqual(students.call_count, 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                student.year_of_study = 1
+                student.save()
+                student.save()
+            self.assertEqual(students.call_count, 1)
+
+
+class EligibilityTests(TestCase):
+    """EligiblePair against the hard filters applied to every pair by brute force."""
+
+    def setUp(self):
+        self.rng = random.Random(3)
+        self.today = datetime.date.today()
+        self.industries = [
+            Industry.objects.create(industry_id=industry_id, industry_name=name)
+            for industry_id, name in [('IT', 'Information Technology'), ('FIN', 'Finance'), ('ENG', 'Engineering')]
+        ]
+
+    def window(self):
+        start = self.today + datetime.timedelta(days=self.rng.randint(0, 60))
+        return start, start + datetime.timedelta(days=self.rng.randint(0, 90))
+
+    def cohort(self):
+        for n in range(6):
+            organisation = Organisation.objects.create(
+                org_name=f'Org {n}', industry=self.rng.choice(self.industries), town='Gaborone', street='Main',
+                plot_number=str(n), contact_number=f'71{n:05d}', contact_email=f'org{n}@example.com', password='x',
+            )
+            for _ in range(self.rng.randint(1, 2)):
+                start, end = self.window()
+                preference = OrganisationPreference.objects.create(
+                    organisation=organisation, pref_education_level=self.rng.randint(1, 4), positions_available=1,
+                    start_date=start, end_date=end,
+                )
+                # Fields are matched to industries by name, whatever the case and spacing.
+                for name in self.rng.sample([' finance ', 'ENGINEERING', 'Software'], self.rng.randint(0, 2)):
+                    PreferredField.objects.create(preference=preference, field_name=name)
+        for n in range(10):
+            student = Student.objects.create(
+                student_id=f'20200000{n}', first_name='Ann', last_name=f'Number{n}',
+                year_of_study=self.rng.randint(1, 4), student_email=f'ann{n}@example.com',
+                student_contact_number=f'720000{n}', password='x',
+            )
+            for _ in range(self.rng.randint(1, 2)):
+                start, end = self.window()
+                preference = StudentPreference.objects.create(
+                    student=student, pref_location='Gaborone', available_from=start, available_to=end,
+                )
+                for industry in self.rng.sample(self.industries, self.rng.randint(0, 2)):
+                    PreferredIndustry.objects.create(student=preference, industry=industry)
+
+    @staticmethod
+    def brute_force():
+        names = {industry.industry_name.lower(): industry.pk for industry in Industry.objects.all()}
+        pairs = set()
+        for student in StudentPreference.objects.select_related('student').prefetch_related('preferredindustry_set'):
+            wanted = {row.industry_id for row in student.preferredindustry_set.all()}
+            for organisation in OrganisationPreference.objects.select_related('organisation').prefetch_related(
+                'preferred_fields',
+            ):
+                offered = {organisation.organisation.industry_id} | {
+                    names[field.field_name.strip().lower()] for field in organisation.preferred_fields.all()
+                    if field.field_name.strip().lower() in names
+                }
+                if (
+                    student.available_from <= organisation.end_date
+                    and student.available_to >= organisation.start_date
+                    and student.student.year_of_study >= organisation.pref_education_level
+                    and (not wanted or wanted & offered)
+                ):
+                    pairs.add((student.pk, organisation.pk))
+        return pairs
+
+    @staticmethod
+    def stored():
+        return set(EligiblePair.objects.values_list('student_preference_id', 'organisation_preference_id'))
+
+    def test_interval_index_finds_every_overlap(self):
+        intervals = [(key, *self.window()) for key in range(200)]
+        index = eligibility.IntervalIndex(intervals)
+        self.assertEqual(len(index), 200)
+        for _ in range(100):
+            start, end = self.window()
+            self.assertEqual(
+                sorted(index.overlapping(start, end)),
+                [key for key, first, last in intervals if first <= end and last >= start],
+            )
+        self.assertEqual(eligibility.IntervalIndex([]).overlapping(self.today, self.today), [])
+
+    def test_table_matches_the_filters(self):
+        self.cohort()
+        eligibility.rebuild(batch_size=7)
+        self.assertTrue(self.stored())
+        self.assertEqual(self.stored(), self.brute_force())
+
+        # Incremental refreshes, through the signals, agree with a rebuild.
+        with self.captureOnCommitCallbacks(execute=True):
+            for preference in StudentPreference.objects.order_by('pk')[:4]:
+                preference.available_from, preference.available_to = self.window()
+                preference.save()
+            for student in Student.objects.order_by('pk')[:3]:
+                student.year_of_study = self.rng.randint(1, 4)
+                student.save()
+            for preference in OrganisationPreference.objects.order_by('pk')[:3]:
+                preference.pref_education_level = self.rng.randint(1, 4)
+                preference.save()
+            organisation = Organisation.objects.order_by('pk').first()
+            organisation.industry = self.industries[2]
+            organisation.save()
+            PreferredField.objects.order_by('pk').first().delete()
+            PreferredIndustry.objects.order_by('pk').first().delete()
+        self.assertEqual(self.stored(), self.brute_force())
+
+    def test_refreshes_take_the_same_queries_for_any_number_of_preferences(self):
+        self.cohort()
+        for refresh, model in [
+            (eligibility.refresh_students, StudentPreference),
+            (eligibility.refresh_organisations, OrganisationPreference),
+        ]:
+            with self.subTest(refresh.__name__):
+                EligiblePair.objects.all().delete()
+                pref_ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+                with CaptureQueriesContext(connection) as one:
+                    refresh(pref_ids[:1])
+                with CaptureQueriesContext(connection) as every:
+                    refresh(pref_ids)
+                self.assertEqual(len(every), len(one))
+                self.assertEqual(self.stored(), self.brute_force())
+
+
+class RecommendationTests(TestCase):
+    """The top-K and eligibility endpoints read the stored scores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        it = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        finance = Industry.objects.create(industry_id='FIN', industry_name='Finance')
+        python = Skill.objects.create(skill_id='PY', name='Python')
+        sql = Skill.objects.create(skill_id='SQL', name='SQL')
+        today = datetime.date.today()
+
+        def organisation(name, industry, town, skills, days):
+            organisation = Organisation.objects.create(
+                org_name=name, industry=industry, town=town, street='Main', plot_number='1',
+                contact_number=f'71{Organisation.objects.count():05d}', contact_email=f'{name.lower()}@example.com',
+                password='x',
+            )
+            preference = OrganisationPreference.objects.create(
+                organisation=organisation, pref_education_level=1, positions_available=1,
+                start_date=today, end_date=today + datetime.timedelta(days=days - 1),
+            )
+            for skill in skills:
+                RequiredSkill.objects.create(preference=preference, skill=skill)
+            return preference
+
+        def student(student_id, town, industries, skills):
+            student = Student.objects.create(
+                student_id=student_id, first_name='Ann', last_name=student_id, year_of_study=3,
+                student_email=f'{student_id}@example.com', student_contact_number=student_id[-7:], password='x',
+            )
+            preference = StudentPreference.objects.create(
+                student=student, pref_location=town, available_from=today,
+                available_to=today + datetime.timedelta(days=89),
+            )
+            for industry in industries:
+                PreferredIndustry.objects.create(student=preference, industry=industry)
+            for skill in skills:
+                DesiredSkill.objects.create(student_pref=preference, skill=skill)
+            return preference
+
+        cls.acme = organisation('Acme', it, 'Gaborone', [python, sql], 60)
+        cls.bolt = organisation('Bolt', it, 'Maun', [python], 120)
+        cls.bank = organisation('Bank', finance, 'Gaborone', [], 60)
+        cls.ann = student('202000001', 'Gaborone', [it], [python])
+        cls.bob = student('202000002', 'Maun', [], [])
+        eligibility.rebuild()
+        store_scores()
+
+    def get(self, name, pref_id, role, account_id, **params):
+        return self.client.get(reverse(name, args=[pref_id]), params, **bearer(role, account_id))
+
+    def test_student_recommendations(self):
+        response = self.get('student_recommendations', self.ann.pk, 'student', '202000001')
+        self.assertEqual(response.status_code, 200)
+        recommendations = response.json()
+        self.assertEqual(
+            [(r['pref_id'], r['organisation_name'], r['score']) for r in recommendations],
+            [(self.bolt.pk, 'Bolt', 0.8625), (self.acme.pk, 'Acme', 0.825)],
+        )
+        self.assertEqual(
+            recommendations[0]['breakdown'], {'industry': 1.0, 'skills': 1.0, 'dates': 0.75, 'location': 0.0},
+        )
+        self.assertEqual(recommendations[0]['organisation_id'], self.bolt.organisation_id)
+        self.assertNotIn('industry_score', recommendations[0])
+
+        response = self.get('student_recommendations', self.ann.pk, 'student', '202000001', k=1)
+        self.assertEqual([r['pref_id'] for r in response.json()], [self.bolt.pk])
+        for k in ('0', '101', 'x'):
+            response = self.get('student_recommendations', self.ann.pk, 'student', '202000001', k=k)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get('student_recommendations', self.bob.pk, 'student', '202000001').status_code, 403)
+        self.assertEqual(self.get('student_recommendations', 'nope', 'admin', 1).status_code, 404)
+
+    def test_organisation_candidates(self):
+        response = self.get('organisation_candidates', self.bolt.pk, 'organisation', self.bolt.organisation_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(c['student_pref_id'], c['student_id'], c['score']) for c in response.json()],
+            [(self.ann.pk, '202000001', 0.8625), (self.bob.pk, '202000002', 0.4125)],
+        )
+        response = self.get('organisation_candidates', self.bolt.pk, 'organisation', self.bolt.organisation_id, k=1)
+        self.assertEqual([c['student_pref_id'] for c in response.json()], [self.ann.pk])
+        # Bank's industry is not Ann's.
+        response = self.get('organisation_candidates', self.bank.pk, 'organisation', self.bank.organisation_id)
+        self.assertEqual([c['student_pref_id'] for c in response.json()], [self.bob.pk])
+        response = self.get('organisation_candidates', self.bolt.pk, 'organisation', self.bank.organisation_id)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get('organisation_candidates', 0, 'admin', 1).status_code, 404)
+
+    def test_eligible_lists(self):
+        response = self.get('eligible_organisations', self.ann.pk, 'student', '202000001')
+        self.assertEqual([p['pref_id'] for p in response.json()], sorted([self.acme.pk, self.bolt.pk]))
+        response = self.get('eligible_students', self.bank.pk, 'organisation', self.bank.organisation_id)
+        self.assertEqual([(p['student_pref_id'], p['year_of_study']) for p in response.json()], [(self.bob.pk, 3)])
+        self.assertEqual(self.get('eligible_organisations', self.ann.pk, 'student', '202000002').status_code, 403)
+        self.assertEqual(self.get('eligible_students', 0, 'admin', 1).status_code, 404)
+
+
+class PaginationTests(TestCase):
+    """Cursor pages at their edges: ties, the last page, sizes and bad input."""
+
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.students = [
+            Student.objects.create(
+                student_id=f'20200000{n}', first_name='Ann', last_name=f'Number{n}', year_of_study=n % 3 + 1,
+                student_email=f'ann{n}@example.com', student_contact_number=f'720000{n}', password='x',
+            )
+            for n in range(7)
+        ]
+        for student in cls.students:
+            for week in (1, 2):
+                Logbook.objects.create(student_id=student, org_id=cls.organisation, week_number=week, log_entry='Entry')
+
+    def setUp(self):
+        self.client.defaults.update(bearer('admin', 1))
+
+    def walk(self, url, params):
+        """Follow ``next`` from the first page; returns the pages' results."""
+        pages, response = [], self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            pages.append(page['results'])
+            if not page['next']:
+                return pages
+            response = self.client.get(page['next'])
+
+    def test_pages_cover_every_row_once(self):
+        pages = self.walk(reverse('list_all_students'), {'page_size': 3})
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [row['student_id'] for page in pages for row in page], [student.student_id for student in self.students],
+        )
+
+        first = self.client.get(reverse('list_all_students'), {'page_size': 3}).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_ties_in_the_ordering_are_not_skipped_or_repeated(self):
+        # Every logbook has the same submitted_at, the list's ordering.
+        Logbook.objects.update(submitted_at=timezone.now())
+        for page_size in (1, 4, 5):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(reverse('logbook'), {'page_size': page_size})
+                ids = [row['logbook_id'] for page in pages for row in page]
+                self.assertEqual(sorted(ids), sorted(Logbook.objects.values_list('logbook_id', flat=True)))
+
+    def test_page_sizes_and_bad_input(self):
+        # An unusable page_size falls back to the default.
+        for page_size in ('0', '-1', 'x'):
+            response = self.client.get(reverse('list_all_students'), {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), 7)
+        with patch.object(KeysetPagination, 'max_page_size', 2):
+            response = self.client.get(reverse('list_all_students'), {'page_size': 100})
+        self.assertEqual(len(response.json()['results']), 2)
+
+        response = self.client.get(reverse('list_all_students'), {'year_of_study': 4})
+        self.assertEqual(response.json(), {'next': None, 'previous': None, 'results': []})
+        self.assertEqual(self.client.get(reverse('list_all_students'), {'year_of_study': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('list_all_students'), {'cursor': 'bogus'}).status_code, 404)
+
+        # Filters carry over to the next page.
+        pages = self.walk(reverse('list_all_students'), {'year_of_study': 1, 'page_size': 1})
+        self.assertEqual([page[0]['student_id'] for page in pages], ['202000000', '202000003', '202000006'])
+
+
+@override_settings(ENDPOINT_BUDGETS_STRICT=True)
+class ListQueryCountTests(TestCase):
+    """List endpoints must issue the same number of queries for 1 row or many."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.skill = Skill.objects.create(skill_id='PY', name='Python')
+        cls.organisation = cls.make_organisation(0)
+
+    def setUp(self):
+        # Cached preferences would leave their queries out.
+        caches['default'].clear()
+        self.client.defaults.update(bearer('admin', 1))
+
+    @classmethod
+    def make_organisation(cls, n):
+        organisation = Organisation.objects.create(
+            org_name=f'Org {n}', industry=cls.industry, town='Gaborone', street='Main',
+            plot_number=str(n), contact_number=f'71{n:05d}', contact_email=f'org{n}@example.com',
+            password='x',
+        )
+        cls.make_organisation_preference(organisation)
+        return organisation
+
+    @staticmethod
+    def make_organisation_preference(organisation):
+        today = datetime.date.today()
+        preference = OrganisationPreference.objects.create(
+            organisation=organisation, pref_education_level=1, positions_available=2,
+            start_date=today, end_date=today + datetime.timedelta(days=60),
+        )
+        PreferredField.objects.create(preference=preference, field_name='Information Technology')
+        RequiredSkill.objects.create(preference=preference, skill_id='PY')
+        return preference
+
+    def make_student(self, n):
+        today = datetime.date.today()
+        student = Student.objects.create(
+            student_id=f'20200{n:04d}', first_name='First', last_name=f'Last{n}', year_of_study=3,
+            student_email=f'student{n}@example.com', student_contact_number=f'72{n:05d}',
+            password='x',
+        )
+        preference = StudentPreference.objects.create(
+            student=student, pref_location='Gaborone',
+            available_from=today, available_to=today + datetime.timedelta(days=90),
+        )
+        PreferredIndustry.objects.create(student=preference, industry=self.industry)
+        DesiredSkill.objects.create(student_pref=preference, skill=self.skill)
+        Logbook.objects.create(student_id=student, org_id=self.organisation, week_number=1, log_entry='Entry')
+        return student
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, add_rows, params=None):
+        add_rows(1)
+        baseline = self.count_queries(url, params)
+        add_rows(5)
+        self.assertEqual(self.count_queries(url, params), baseline)
+
+    def add_students(self, count):
+        start = Student.objects.count()
+        for n in range(start, start + count):
+            self.make_student(n)
+
+    def test_list_all_organisations(self):
+        def add(count):
+            start = Organisation.objects.count()
+            for n in range(start, start + count):
+                self.make_organisation(n)
+        self.assertConstantQueries(reverse('list_all_organisations'), add)
+
+    def test_list_organisation_preferences(self):
+        def add(count):
+            for _ in range(count):
+                self.make_organisation_preference(self.organisation)
+        url = reverse('list_organisation_preferences', args=[self.organisation.org_id])
+        self.assertConstantQueries(url, add)
+
+    def test_org_logbooks(self):
+        url = reverse('org_logbooks', args=[self.organisation.org_id])
+        self.assertConstantQueries(url, self.add_students)
+
+    def test_logbook_list(self):
+        self.assertConstantQueries(reverse('logbook'), self.add_students)
+
+    def test_student_preference_list(self):
+        self.assertConstantQueries(reverse('student_preference_list'), self.add_students)
+
+
+class QueryMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.client.defaults.update(bearer('admin', 1))
+        Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+
+    @override_settings(QUERY_METRICS_HEADERS=True)
+    def test_records_queries_and_timings_per_url_name(self):
+        response = self.client.get(reverse('list_all_organisations'))
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        snapshot = self.client.get(reverse('request_metrics')).json()
+        endpoint = snapshot['list_all_organisations']
+        self.assertEqual(endpoint['requests'], 1)
+        self.assertEqual(endpoint['queries']['buckets']['1'], 1)
+        self.assertEqual(sum(endpoint['total_ms']['buckets'].values()), 1)
+
+    @override_settings(QUERY_METRICS_HEADERS=False)
+    def test_headers_are_off_unless_enabled(self):
+        response = self.client.get(reverse('list_all_organisations'))
+        self.assertNotIn('X-Query-Count', response)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics.snapshot()['list_all_organisations']['requests'], 1)
+
+    @override_settings(ENDPOINT_BUDGETS={'list_all_organisations': {'queries': 0}})
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('users.middleware', 'WARNING') as logs:
+            self.client.get(reverse('list_all_organisations'))
+        self.assertIn('list_all_organisations exceeded its budget', logs.output[0])
+        self.assertEqual(metrics.snapshot()['list_all_organisations']['over_budget'], 1)
+
+    @override_settings(
+        ENDPOINT_BUDGETS={'list_all_organisations': {'queries': 0}},
+        ENDPOINT_BUDGETS_STRICT=True,
+    )
+    def test_over_budget_fails_in_strict_mode(self):
+        with self.assertRaises(BudgetExceeded):
+            self.client.get(reverse('list_all_organisations'))
+
+
+    @override_settings(ENDPOINT_BUDGETS_STRICT=True)
+    def test_budgets_can_differ_by_method(self):
+        industry = Industry.objects.get()
+        organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        # The first submission also creates the id sequence and the counter rows.
+        for week, entry in [(1, 'Short entry'), (2, ' '.join(f'word{n}' for n in range(300)))]:
+            response = self.client.post(reverse('logbook'), {
+                'student_id': student.student_id, 'org_id': organisation.org_id, 'week_number': week,
+                'log_entry': entry,
+            }, content_type='application/json', **bearer('student', student.student_id))
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(metrics.snapshot()['logbook']['over_budget'], 0)
+
+        with override_settings(ENDPOINT_BUDGETS={'logbook': {'GET': {'queries': 0}, 'POST': {'queries': 100}}}):
+            with self.assertRaises(BudgetExceeded):
+                self.client.get(reverse('logbook'))
+        self.assertEqual(endpoint_budget('logbook', 'DELETE'), settings.ENDPOINT_BUDGETS['*'])
+        self.assertEqual(endpoint_budget('list_all_students', 'POST'), {'queries': 5})
+
+
+class GenerateCohortTests(TestCase):
+    def test_generated_rows_pass_model_validation(self):
+        call_command('generate_cohort', students=30, organisations=3, logbooks=60, stdout=StringIO())
+
+        self.assertEqual(Student.objects.count(), 30)
+        self.assertEqual(Logbook.objects.count(), 60)
+        for model in (Student, Organisation):
+            for obj in model.objects.all():
+                obj.clean_fields(exclude=['password'])
+        self.assertTrue(EligiblePair.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.client.defaults.update(bearer('admin', 1))
+        Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        Student.objects.create(
+            student_id='202000001', first_name='Old', last_name='Student', year_of_study=2,
+            student_email='old@example.com', student_contact_number='7000001', password='x',
+        )
+
+    def test_csv_students_with_per_row_errors(self):
+        body = (
+            'student_id,first_name,last_name,year_of_study,student_email,student_contact_number,password\n'
+            '202100001,Ann,One,1,ann@example.com,7100001,secret\n'
+            '202100002,Ben,Two,9,ben@example.com,7100002,secret\n'
+            '202000001,Cat,Three,2,cat@example.com,7100003,secret\n'
+            '202100001,Dan,Four,2,dan@example.com,7100004,secret\n'
+            '12345,Eve,Five,2,eve@example.com,7100005,secret\n'
+            '202100006,Fay,Six,3,fay@example.com,7100006,secret\n'
+        )
+        response = self.client.post(reverse('bulk_import', args=['students']), body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['total'], report['created'], report['failed']), (6, 2, 4))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4, 5, 6])
+        self.assertIn('year_of_study', report['errors'][0]['errors'])
+        self.assertIn('student_id', report['errors'][1]['errors'])
+        student = Student.objects.get(student_id='202100001')
+        self.assertTrue(check_password('secret', student.password))
+
+    def test_ndjson_organisations_upload(self):
+        lines = [
+            {'org_name': 'Acme', 'industry': 'Information Technology', 'town': 'Gaborone', 'street': 'Main',
+             'plot_number': '1', 'contact_number': '7200001', 'contact_email': 'acme@example.com', 'password': 'pw'},
+            {'org_name': 'Nope', 'industry': 'Mining', 'town': 'Maun', 'street': 'Main',
+             'plot_number': '2', 'contact_number': '7200002', 'contact_email': 'nope@example.com', 'password': 'pw'},
+        ]
+        upload = SimpleUploadedFile(
+            'orgs.ndjson', ('\n'.join(json.dumps(line) for line in lines) + '\n{broken\n').encode(),
+        )
+        response = self.client.post(reverse('bulk_import', args=['organisations']), {'file': upload})
+
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (1, 2))
+        self.assertEqual(report['errors'][0]['errors'], {'industry': ['Invalid industry selected']})
+        self.assertEqual(Organisation.objects.get(org_name='Acme').industry_id, 'IT')
+
+    def test_hashes_are_kept_only_when_asked(self):
+        hashed = make_password('secret')
+        header = 'student_id,first_name,last_name,year_of_study,student_email,student_contact_number,password\n'
+        body = header + f'202100001,Ann,One,3,ann@example.com,7100001,{hashed}\n'
+        self.client.post(reverse('bulk_import', args=['students']), body, content_type='text/csv')
+        student = Student.objects.get(student_id='202100001')
+        self.assertNotEqual(student.password, hashed)
+        self.assertTrue(check_password(hashed, student.password))
+        self.assertFalse(check_password('secret', student.password))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as upload:
+            upload.write(header + f'202100002,Bob,Two,3,bob@example.com,7100002,{hashed}\n')
+        self.addCleanup(os.unlink, upload.name)
+        call_command('bulk_import', 'students', upload.name, keep_hashes=True, stdout=StringIO())
+        self.assertEqual(Student.objects.get(student_id='202100002').password, hashed)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.post(reverse('bulk_import', args=['students']), 'x', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+
+
+class LogbookBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+
+    def setUp(self):
+        self.client.defaults.update(bearer('admin', 1))
+
+    def make_logbook(self, week, status='pending'):
+        return Logbook.objects.create(
+            student_id=self.student, org_id=self.organisation, week_number=week, log_entry='Entry', status=status,
+        )
+
+    def test_bulk_mark_viewed_uses_one_update(self):
+        pending = [self.make_logbook(week) for week in (1, 2, 3)]
+        viewed = self.make_logbook(4, status='viewed')
+        ids = [logbook.logbook_id for logbook in pending] + [viewed.logbook_id, 'MISSING1']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('bulk_mark_logbooks_viewed'), {'logbook_ids': ids}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len([sql for sql in updates if sql.startswith('UPDATE "users_logbook"')]), 1)
+        # Plus one per counter row (the organisation's and the student's).
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(
+            [result['result'] for result in response.json()['results']],
+            ['viewed', 'viewed', 'viewed', 'already_viewed', 'not_found'],
+        )
+        self.assertFalse(Logbook.objects.filter(status='pending').exists())
+
+    def test_batch_submission_reports_each_entry(self):
+        self.make_logbook(1)
+        entry = {'student_id': self.student.student_id, 'org_id': self.organisation.org_id, 'log_entry': 'Did work'}
+        response = self.client.post(reverse('submit_logbook_batch'), {'entries': [
+            {**entry, 'week_number': 2},
+            {**entry, 'week_number': 1},
+            {**entry, 'week_number': 11},
+            {**entry, 'week_number': 3, 'student_id': '202099999'},
+            {**entry, 'week_number': 3},
+        ]}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([result['result'] for result in results], ['created', 'error', 'error', 'error', 'created'])
+        self.assertIn('week_number', results[1]['errors'])
+        self.assertIn('student_id', results[3]['errors'])
+        self.assertEqual(
+            sorted(Logbook.objects.values_list('week_number', flat=True)), [1, 2, 3],
+        )
+        self.assertTrue(Logbook.objects.filter(logbook_id=results[0]['logbook_id']).exists())
+
+    def test_logbook_ids_skip_legacy_keys_and_stop_at_the_end(self):
+        for week, logbook_id in enumerate(['00000ZZZ', 'ZZZZZZZY'], start=1):
+            Logbook.objects.create(
+                logbook_id=logbook_id, student_id=self.student, org_id=self.organisation, week_number=week,
+                log_entry='Old',
+            )
+        # A random key near the top does not use up the sequence.
+        self.assertEqual(logbook_ids(2), ['00001000', '00001001'])
+        self.assertEqual(self.make_logbook(3).logbook_id, '00001002')
+        Logbook.objects.create(
+            logbook_id='00001004', student_id=self.student, org_id=self.organisation, week_number=4, log_entry='Old',
+        )
+        self.assertEqual(logbook_ids(2), ['00001003', '00001005'])
+
+        IdSequence.objects.filter(name=LOGBOOK_SEQUENCE).update(value=from_base36('ZZZZZZZW'))
+        self.assertEqual(logbook_ids(1), ['ZZZZZZZX'])
+        # ZZZZZZZY is taken and ZZZZZZZZ is the last id there is.
+        self.assertEqual(logbook_ids(1), ['ZZZZZZZZ'])
+        with self.assertRaises(SequenceExhausted):
+            logbook_ids(1)
+
+    def test_a_week_is_submitted_once_on_either_path(self):
+        self.make_logbook(1)
+        entry = {'student_id': self.student.student_id, 'org_id': self.organisation.org_id, 'log_entry': 'Did work'}
+
+        response = self.client.post(reverse('logbook'), {**entry, 'week_number': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['non_field_errors'], [DUPLICATE_WEEK])
+        response = self.client.post(reverse('logbook'), {**entry, 'week_number': 2}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('submit_logbook_batch'), {'entries': [
+            {**entry, 'week_number': 2},
+        ]}, content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['errors'], {'week_number': [DUPLICATE_WEEK]})
+
+        # A week submitted by another request between the check and the insert.
+        def submitted_meanwhile(count):
+            self.make_logbook(3)
+            return logbook_ids(count)
+        with patch.object(logbooks, 'logbook_ids', submitted_meanwhile):
+            response = self.client.post(reverse('submit_logbook_batch'), {'entries': [
+                {**entry, 'week_number': 3}, {**entry, 'week_number': 4},
+            ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(sorted(Logbook.objects.values_list('week_number', flat=True)), [1, 2, 3])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Logbook.objects.bulk_create([Logbook(
+                logbook_id='ZZZZZZZZ', student_id=self.student, org_id=self.organisation, week_number=1,
+                log_entry='Entry',
+            )])
+
+
+class IdAllocationConcurrencyTests(TransactionTestCase):
+    """Create preferences and logbooks from many threads at once."""
+
+    threads = 8
+    per_thread = 5
+
+    @classmethod
+    def setUpClass(cls):
+        # Threads need their own connections to one database; an in-memory
+        # SQLite test database cannot be shared that way.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise SkipTest("needs a test database that allows several connections")
+        super().setUpClass()
+
+    def setUp(self):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        self.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        self.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+
+    def hammer(self, create):
+        barrier = threading.Barrier(self.threads)
+        created, failures = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                with signals.batched():
+                    for _ in range(self.per_thread):
+                        created.append(create())
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(failures, [])
+        return created
+
+    def test_parallel_preferences_get_distinct_sequential_ids(self):
+        today = datetime.date.today()
+
+        def create():
+            return StudentPreference.objects.create(
+                student=self.student, pref_location='Gaborone',
+                available_from=today + datetime.timedelta(days=1),
+                available_to=today + datetime.timedelta(days=60),
+            ).student_pref_id
+
+        ids = self.hammer(create)
+        total = self.threads * self.per_thread
+        self.assertEqual(sorted(ids), [f'202000001_PREF{n:03d}' for n in range(1, total + 1)])
+        self.assertEqual(StudentPreference.objects.count(), total)
+
+    def test_parallel_logbooks_get_distinct_increasing_ids(self):
+        # A pre-existing random id is where the sequence continues from.
+        Logbook.objects.create(
+            logbook_id='00000ZZZ', student_id=self.student, org_id=self.organisation, week_number=1, log_entry='Old',
+        )
+
+        # One logbook per student and week: student n // 10, week n % 10 + 1.
+        total = self.threads * self.per_thread
+        students = [self.student] + [
+            Student.objects.create(
+                student_id=f'2020000{n:02d}', first_name='Ann', last_name='One', year_of_study=3,
+                student_email=f'ann{n}@example.com', student_contact_number=f'72000{n:02d}', password='x',
+            )
+            for n in range(2, total // 10 + 2)
+        ]
+        slots = itertools.count(1)
+
+        def create():
+            n = next(slots)
+            return Logbook.objects.create(
+                student_id=students[n // 10], org_id=self.organisation, week_number=n % 10 + 1, log_entry='Entry',
+            ).logbook_id
+
+        ids = self.hammer(create)
+        self.assertEqual(len(set(ids)), total)
+        self.assertEqual(sorted(ids), [to_base36(from_base36('00000ZZZ') + n) for n in range(1, total + 1)])
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+            Skill.objects.create(skill_id='PY', name='Python')
+
+    def test_conditional_get_without_queries(self):
+        response = self.client.get(reverse('get_industries'))
+        self.assertEqual(response.json(), [{'industry_id': 'IT', 'industry_name': 'Information Technology'}])
+        self.assertIn('max-age', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('get_industries'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(self.client.get(reverse('get_industries')).status_code, 200)
+
+    def test_saving_a_skill_changes_the_etag(self):
+        etag = self.client.get(reverse('get_skills'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(skill_id='JS', name='JavaScript')
+
+        response = self.client.get(reverse('get_skills'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([skill['skill_id'] for skill in response.json()], ['JS', 'PY'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password=make_password('secret'),
+        )
+        cls.student, cls.other = [
+            Student.objects.create(
+                student_id=student_id, first_name='Ann', last_name='One', year_of_study=3,
+                student_email=f'{student_id}@example.com', student_contact_number=student_id[-7:],
+                password=make_password('secret'),
+            )
+            for student_id in ('202000001', '202000002')
+        ]
+        for student in (cls.student, cls.other):
+            Logbook.objects.create(student_id=student, org_id=cls.organisation, week_number=1, log_entry='Entry')
+
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+
+    def login_student(self, password='secret'):
+        return self.client.post(
+            reverse('login_student'), {'student_id': self.student.student_id, 'password': password},
+            content_type='application/json',
+        )
+
+    def test_login_issues_a_token_for_the_account(self):
+        response = self.login_student()
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['token']
+
+        profile = reverse('update_student_profile', args=[self.student.student_id])
+        self.assertEqual(self.client.get(profile, HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 200)
+        other = reverse('update_student_profile', args=[self.other.student_id])
+        self.assertEqual(self.client.get(other, HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 403)
+        self.assertNotIn('token', self.login_student('wrong').json())
+
+    def test_missing_tampered_or_expired_tokens_are_rejected(self):
+        profile = reverse('update_student_profile', args=[self.student.student_id])
+        response = self.client.get(profile)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+        token = bearer('student', self.student.student_id)['HTTP_AUTHORIZATION']
+        self.assertEqual(self.client.get(profile, HTTP_AUTHORIZATION=token[:-1] + 'x').status_code, 401)
+        with override_settings(ACCESS_TOKEN_MAX_AGE=-1):
+            response = self.client.get(profile, HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('expired', response.json()['detail'])
+
+    def test_settings_take_the_key_and_debug_from_the_environment(self):
+        path = settings.BASE_DIR / 'backend' / 'settings.py'
+        environ = {name: value for name, value in os.environ.items() if not name.startswith('DJANGO_')}
+        with patch.dict(os.environ, environ, clear=True), self.assertRaises(ImproperlyConfigured):
+            runpy.run_path(str(path))
+        with patch.dict(os.environ, dict(environ, DJANGO_SECRET_KEY='k'), clear=True):
+            loaded = runpy.run_path(str(path))
+        self.assertEqual(loaded['SECRET_KEY'], 'k')
+        self.assertFalse(loaded['DEBUG'])
+
+    def test_asgi_closes_connections_after_each_request(self):
+        settings_path = settings.BASE_DIR / 'backend' / 'settings.py'
+        asgi_path = settings.BASE_DIR / 'backend' / 'asgi.py'
+        environ = {name: value for name, value in os.environ.items() if name != 'DB_CONN_MAX_AGE'}
+        with patch.dict(os.environ, environ, clear=True):
+            self.assertEqual(runpy.run_path(str(settings_path))['DATABASES']['default']['CONN_MAX_AGE'], 60)
+            runpy.run_path(str(asgi_path))
+            self.assertEqual(runpy.run_path(str(settings_path))['DATABASES']['default']['CONN_MAX_AGE'], 0)
+        with patch.dict(os.environ, dict(environ, DB_CONN_MAX_AGE='30'), clear=True):
+            runpy.run_path(str(asgi_path))
+            self.assertEqual(runpy.run_path(str(settings_path))['DATABASES']['default']['CONN_MAX_AGE'], 30)
+
+    def test_roles_and_ownership(self):
+        student = bearer('student', self.student.student_id)
+        organisation = bearer('organisation', self.organisation.org_id)
+        self.assertEqual(self.client.get(reverse('list_all_students'), **student).status_code, 403)
+        self.assertEqual(self.client.get(reverse('list_all_students'), **bearer('admin', 1)).status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('org_logbooks', args=[self.organisation.org_id + 1]), **organisation).status_code,
+            403,
+        )
+        logbooks = self.client.get(reverse('logbook'), **student).json()['results']
+        self.assertEqual({logbook['student_id'] for logbook in logbooks}, {self.student.student_id})
+
+        response = self.client.post(reverse('logbook'), {
+            'student_id': self.other.student_id, 'org_id': self.organisation.org_id,
+            'week_number': 2, 'log_entry': 'Not mine',
+        }, content_type='application/json', **student)
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_admins_register_admins(self):
+        data = {'first_name': 'Ada', 'last_name': 'Admin', 'email': 'ada@example.com', 'password': 'secret'}
+        url = reverse('register_admin')
+        response = self.client.post(url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(
+            url, data, content_type='application/json', **bearer('student', self.student.student_id),
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Admin.objects.exists())
+
+        call_command('create_admin', 'root@example.com', 'Root', 'Admin', '--password', 'secret', stdout=StringIO())
+        admin = Admin.objects.get()
+        self.assertTrue(check_password('secret', admin.password))
+        response = self.client.post(url, data, content_type='application/json', **bearer('admin', admin.admin_id))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(check_password('secret', Admin.objects.get(email='ada@example.com').password))
+
+    def test_change_password(self):
+        url = reverse('change_password', args=[self.student.student_id])
+        response = self.client.post(
+            url, {'current_password': 'secret', 'new_password': 'changed'}, content_type='application/json',
+            **bearer('student', self.student.student_id),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.student.refresh_from_db()
+        self.assertTrue(check_password('changed', self.student.password))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CREDENTIAL_THROTTLE_RATES={
+        'ip': {'capacity': 4, 'per_minute': 1},
+        'account': {'capacity': 2, 'per_minute': 1},
+    },
+)
+class CredentialThrottleTests(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        throttle_counters.reset()
+
+    def login(self, email, **extra):
+        return self.client.post(
+            reverse('login_admin'), {'email': email, 'password': 'guess'}, content_type='application/json', **extra,
+        )
+
+    def test_account_bucket_rejects_before_any_query(self):
+        self.assertEqual([self.login('a@example.com').status_code for _ in range(2)], [404, 404])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('A@example.com ')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(queries), 0)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('b@example.com').status_code, 404)
+
+        counts = self.client.get(reverse('throttle_metrics')).json()
+        self.assertEqual(counts['account']['login_admin'], {'allowed': 3, 'rejected': 1})
+
+    def test_ip_bucket_covers_every_account(self):
+        for n in range(4):
+            self.assertEqual(self.login(f'{n}@example.com').status_code, 404)
+        self.assertEqual(self.login('4@example.com').status_code, 429)
+        self.assertEqual(self.login('4@example.com', REMOTE_ADDR='10.0.0.2').status_code, 404)
+
+    def test_a_rejected_attempt_spends_no_other_token(self):
+        self.assertEqual([self.login('a@example.com').status_code for _ in range(5)], [404, 404, 429, 429, 429])
+        # Only the two attempts the account bucket let through came out of the IP bucket.
+        self.assertEqual([self.login(f'{n}@example.com').status_code for n in range(3)], [404, 404, 429])
+
+    def test_concurrent_takes_never_share_a_token(self):
+        def attempt():
+            results.append(take('bucket', capacity=5, per_minute=1)[0])
+        results = []
+        threads = [threading.Thread(target=attempt) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 5)
+
+    def test_bucket_refills_over_time(self):
+        self.assertEqual(take('bucket', capacity=1, per_minute=6, now=0), (True, 0))
+        allowed, wait = take('bucket', capacity=1, per_minute=6, now=5)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 5)
+        self.assertEqual(take('bucket', capacity=1, per_minute=6, now=10)[0], True)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisations = [
+            Organisation.objects.create(
+                org_name=f'Org {n}', industry=industry, town='Gaborone', street='Main', plot_number=str(n),
+                contact_number=f'710000{n}', contact_email=f'org{n}@example.com', password='x',
+            )
+            for n in range(2)
+        ]
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One, Jr', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        for week, organisation in enumerate(cls.organisations * 3, start=1):
+            Logbook.objects.create(student_id=cls.student, org_id=organisation, week_number=week, log_entry='Entry')
+
+    def export(self, path, **auth):
+        response = self.client.get(reverse('export', args=path.split('.')), **auth)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_is_streamed_with_header(self):
+        response, body = self.export('logbooks.csv', **bearer('admin', 1))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="logbooks.csv"')
+        lines = body.splitlines()
+        self.assertTrue(lines[0].startswith('logbook_id,student_id,first_name,last_name,org_id,org_name'))
+        self.assertEqual(len(lines), 7)
+        self.assertIn('"One, Jr"', lines[1])
+
+    def test_csv_cells_are_not_run_as_formulas(self):
+        Logbook.objects.filter(week_number=1).update(log_entry='=HYPERLINK("http://evil.example","x")')
+        Logbook.objects.filter(week_number=2).update(log_entry='@SUM(A1)')
+        Logbook.objects.filter(week_number=3).update(log_entry='-2+3')
+        _, body = self.export('logbooks.csv', **bearer('admin', 1))
+        rows = {row['week_number']: row for row in csv.DictReader(StringIO(body))}
+        self.assertEqual(rows['1']['log_entry'], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(rows['2']['log_entry'], "'@SUM(A1)")
+        self.assertEqual(rows['3']['log_entry'], "'-2+3")
+        self.assertEqual(rows['4']['log_entry'], 'Entry')
+
+        # NDJSON is data, not a spreadsheet, and is left as it is.
+        _, body = self.export('logbooks.ndjson', **bearer('admin', 1))
+        self.assertIn('=HYPERLINK', json.loads(body.splitlines()[0])['log_entry'])
+
+    def test_ndjson_is_limited_to_the_organisations_rows(self):
+        organisation = self.organisations[0]
+        _, body = self.export('logbooks.ndjson', **bearer('organisation', organisation.org_id))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['week_number'] for row in rows], [1, 3, 5])
+        self.assertEqual({row['org_name'] for row in rows}, {organisation.org_name})
+
+    def test_admin_tables_and_bad_requests(self):
+        student = bearer('student', self.student.student_id)
+        self.assertEqual(self.client.get(reverse('export', args=['students', 'csv']), **student).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export', args=['students', 'xml']), **student).status_code, 404)
+        response = self.client.get(reverse('export', args=['logbooks', 'csv']), {'week_number': 'x'}, **student)
+        self.assertEqual(response.status_code, 400)
+        _, body = self.export('students.csv', **bearer('admin', 1))
+        self.assertNotIn('password', body)
+
+
+class LogbookSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisations = [
+            Organisation.objects.create(
+                org_name=f'Org {n}', industry=industry, town='Gaborone', street='Main', plot_number=str(n),
+                contact_number=f'710000{n}', contact_email=f'org{n}@example.com', password='x',
+            )
+            for n in range(2)
+        ]
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        entries = [
+            "Configured the network switches and the firewall.",
+            "Wrote Django views; the Django tests now pass.",
+            "Network cabling in the server room, then Django deployment.",
+            "Attended the weekly planning meeting.",
+        ]
+        cls.logbooks = [
+            Logbook.objects.create(
+                student_id=cls.student, org_id=cls.organisations[week % 2], week_number=week, log_entry=entry,
+            )
+            for week, entry in enumerate(entries, start=1)
+        ]
+
+    def setUp(self):
+        # The logbook total behind IDF is cached.
+        caches['default'].clear()
+
+    def search(self, auth=None, **params):
+        response = self.client.get(reverse('search_logbooks'), params, **(auth or bearer('admin', 1)))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_terms_are_indexed_on_save(self):
+        self.assertEqual(search.terms("The Django-tests, Django's views"), {'django': 2, 'tests': 1, 'views': 1})
+        logbook = self.logbooks[3]
+        logbook.log_entry = "Patched the firewall."
+        logbook.save()
+        self.assertEqual(
+            set(LogbookTerm.objects.filter(logbook=logbook).values_list('term', flat=True)), {'patched', 'firewall'},
+        )
+
+    def test_ranked_by_matched_words_then_score(self):
+        results = self.search(q='django network')['results']
+        self.assertEqual(results[0]['logbook_id'], self.logbooks[2].logbook_id)
+        self.assertEqual(results[0]['matched_terms'], 2)
+        self.assertEqual(
+            [result['logbook_id'] for result in results[1:]],
+            [self.logbooks[1].logbook_id, self.logbooks[0].logbook_id],
+        )
+
+    def test_filters_pages_and_scoping(self):
+        page = self.search(q='django network', page_size=2)
+        self.assertEqual(len(page['results']), 2)
+        self.assertEqual(len(self.client.get(page['next'], **bearer('admin', 1)).json()['results']), 1)
+        self.assertEqual(len(self.search(q='django network', week_number=1)['results']), 1)
+        own = self.search(bearer('organisation', self.organisations[1].org_id), q='django network')
+        self.assertEqual([result['week_number'] for result in own['results']], [3, 1])
+        response = self.client.get(reverse('search_logbooks'), {'q': 'the'}, **bearer('admin', 1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_submission_and_rebuild_index(self):
+        submit_logbooks([{
+            'student_id': self.student.student_id, 'org_id': self.organisations[0].org_id,
+            'week_number': 5, 'log_entry': 'Firewall rules review',
+        }])
+        self.assertEqual(len(self.search(q='firewall')['results']), 2)
+        LogbookTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search(q='firewall')['results']), 2)
+
+
+class LogbookCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.students = [
+            Student.objects.create(
+                student_id=f'20200000{n}', first_name='Ann', last_name='One', year_of_study=3,
+                student_email=f'{n}@example.com', student_contact_number=f'720000{n}', password='x',
+            )
+            for n in range(2)
+        ]
+
+    def counts(self, key):
+        return counters.counts(key)
+
+    def assertCounts(self, pending, viewed):
+        self.assertEqual(self.counts(counters.org_key(self.organisation.org_id)), {'pending': pending, 'viewed': viewed})
+
+    def test_every_write_path_keeps_counts(self):
+        logbook = Logbook.objects.create(
+            student_id=self.students[0], org_id=self.organisation, week_number=1, log_entry='Entry',
+        )
+        self.assertCounts(1, 0)
+        logbook = Logbook.objects.get(pk=logbook.pk)
+        logbook.status = 'viewed'
+        logbook.save()
+        self.assertCounts(0, 1)
+
+        results, _ = submit_logbooks([
+            {'student_id': student.student_id, 'org_id': self.organisation.org_id, 'week_number': 2, 'log_entry': 'x'}
+            for student in self.students
+        ])
+        self.assertCounts(2, 1)
+        mark_viewed([results[0]['logbook_id']])
+        self.assertCounts(1, 2)
+        self.assertEqual(self.counts(counters.student_key(self.students[0].pk)), {'pending': 0, 'viewed': 2})
+
+        self.students[1].delete()
+        self.assertCounts(0, 2)
+        self.assertFalse(LogbookCounter.objects.filter(key=counters.student_key(self.students[1].pk)).exists())
+
+        incremental = sorted(LogbookCounter.objects.values_list('key', 'pending', 'viewed'))
+        counters.rebuild()
+        self.assertEqual(sorted(LogbookCounter.objects.values_list('key', 'pending', 'viewed')), incremental)
+
+    def test_badge_endpoint_is_one_lookup(self):
+        Logbook.objects.create(student_id=self.students[0], org_id=self.organisation, week_number=1, log_entry='Entry')
+        url = reverse('organisation_logbook_counts', args=[self.organisation.org_id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, **bearer('organisation', self.organisation.org_id))
+        self.assertEqual(response.json(), {'pending': 1, 'viewed': 0})
+        response = self.client.get(
+            reverse('student_logbook_counts', args=[self.students[1].pk]), **bearer('student', self.students[0].pk),
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+
+    def subscribe(self, channels):
+        subscription = events.SyncSubscription(channels)
+        events.bus.subscribe(subscription)
+        self.addCleanup(events.bus.unsubscribe, subscription)
+        return subscription
+
+    def test_bus_routes_by_channel_and_replays_missed_events(self):
+        bus = events.EventBus(history=3)
+        org, other = events.SyncSubscription(['organisation:1']), events.SyncSubscription(['organisation:2'])
+        bus.subscribe(org)
+        bus.subscribe(other)
+        first = bus.publish('logbook.submitted', {'logbook_id': 'A'}, events.channels(1, '202000001'))
+        self.assertEqual(org.get(0).id, first.id)
+        self.assertIsNone(other.get(0))
+
+        later = [bus.publish('logbook.viewed', {'n': n}, events.channels(1)) for n in range(2)]
+        replayed = bus.subscribe(events.SyncSubscription(['organisation:1']), first.id)
+        self.assertEqual([event.id for event in replayed], [event.id for event in later])
+        for _ in range(2):
+            bus.publish('logbook.viewed', {}, events.channels(1))
+        # The event after ``first`` has left the history; so has a previous run.
+        self.assertIsNone(bus.subscribe(events.SyncSubscription(['admin']), first.id))
+        self.assertIsNone(bus.subscribe(events.SyncSubscription(['admin']), 'deadbeef:1'))
+
+    def test_writes_publish_once_committed(self):
+        organisation = self.subscribe([f'organisation:{self.organisation.org_id}'])
+        student = self.subscribe([f'student:{self.student.student_id}'])
+        with self.captureOnCommitCallbacks(execute=True):
+            logbook = Logbook.objects.create(
+                student_id=self.student, org_id=self.organisation, week_number=1, log_entry='Entry',
+            )
+            self.assertIsNone(organisation.get(0))
+        self.assertIn('event: logbook.submitted', organisation.get(0).message)
+        self.assertIn(f'"logbook_id":"{logbook.logbook_id}"', student.get(0).message)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_viewed([logbook.logbook_id])
+            mark_viewed([logbook.logbook_id])
+        self.assertEqual(organisation.get(0).kind, 'logbook.viewed')
+        self.assertIsNone(organisation.get(0))
+
+    def test_match_events_reach_the_matched_student(self):
+        # Preferences imported from the old system do not carry the student id.
+        preference = StudentPreference.objects.create(
+            student_pref_id='LEGACY-7', student=self.student, pref_location='Gaborone',
+            available_from=datetime.date.today(), available_to=datetime.date.today(),
+        )
+        student = self.subscribe([f'student:{self.student.student_id}'])
+        with self.captureOnCommitCallbacks(execute=True):
+            match = StudentMatch.objects.create(
+                student_preference=preference, student=self.student, organisation=self.organisation,
+            )
+        self.assertEqual(student.get(0).kind, 'match.saved')
+        with self.captureOnCommitCallbacks(execute=True):
+            match.delete()
+        self.assertIn(f'"student_id":"{self.student.student_id}"', student.get(0).message)
+
+    async def test_stream_over_asgi(self):
+        client = AsyncClient()
+        response = await client.get(reverse('event_stream'))
+        self.assertEqual(response.status_code, 401)
+
+        response = await client.get(
+            reverse('event_stream'), {'token': issue_token('organisation', self.organisation.org_id)['token']},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        events.bus.publish('match.saved', {'org_id': 99}, events.channels(99))
+        event = events.bus.publish('match.saved', {'org_id': self.organisation.org_id}, events.channels(self.organisation.org_id))
+        self.assertIn(f'id: {event.id}'.encode(), await anext(chunks))
+        await chunks.aclose()
+
+
+@override_settings(ENDPOINT_BUDGETS_STRICT=True, QUERY_METRICS_HEADERS=True)
+class AsyncViewTests(TestCase):
+    """The async twins answer like the synchronous endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        skill = Skill.objects.create(skill_id='PY', name='Python')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        today = datetime.date.today()
+        preference = OrganisationPreference.objects.create(
+            organisation=cls.organisation, pref_education_level=1, positions_available=2,
+            start_date=today, end_date=today + datetime.timedelta(days=60),
+        )
+        RequiredSkill.objects.create(preference=preference, skill=skill)
+        student_preference = StudentPreference.objects.create(
+            student=cls.student, pref_location='Gaborone',
+            available_from=today, available_to=today + datetime.timedelta(days=90),
+        )
+        DesiredSkill.objects.create(student_pref=student_preference, skill=skill)
+        Logbook.objects.create(student_id=cls.student, org_id=cls.organisation, week_number=1, log_entry='Entry')
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def get_async(self, url, token=('admin', 1), **headers):
+        if token:
+            headers['Authorization'] = bearer(*token)['HTTP_AUTHORIZATION']
+        return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+    def test_same_json_as_sync_views(self):
+        org_id, student_id = self.organisation.org_id, self.student.student_id
+        twins = [
+            ('student_preference_list', 'async_student_preference_list', []),
+            ('list_organisation_preferences', 'async_list_organisation_preferences', [org_id]),
+            ('org_logbooks', 'async_org_logbooks', [org_id]),
+            ('update_organisation_profile', 'async_organisation_profile', [org_id]),
+            ('update_student_profile', 'async_student_profile', [student_id]),
+            ('get_industries', 'async_get_industries', []),
+        ]
+        for name, async_name, args in twins:
+            with self.subTest(name):
+                expected = self.client.get(reverse(name, args=args), **bearer('admin', 1))
+                response = self.get_async(reverse(async_name, args=args))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+                # QueryMetricsMiddleware counts the queries of async views too.
+                self.assertLessEqual(int(response['X-Query-Count']), int(expected['X-Query-Count']))
+
+        response = self.get_async(reverse('async_get_skills'), token=None)
+        self.assertEqual(self.get_async(reverse('async_get_skills'), token=None, **{'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_tokens_and_ownership_are_checked(self):
+        url = reverse('async_org_logbooks', args=[self.organisation.org_id])
+        self.assertEqual(self.get_async(url, token=None).status_code, 401)
+        self.assertEqual(self.get_async(url, token=('organisation', self.organisation.org_id + 1)).status_code, 403)
+        self.assertEqual(self.get_async(url, token=('organisation', self.organisation.org_id)).status_code, 200)
+        response = self.get_async(reverse('async_student_preference_list'), token=('student', '202000002'))
+        self.assertEqual(response.json()['results'], [])
+
+
+class QueryPlanTests(TestCase):
+    """Every query of the read endpoints must be served from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        skill = Skill.objects.create(skill_id='PY', name='Python')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        today = datetime.date.today()
+        cls.preference = OrganisationPreference.objects.create(
+            organisation=cls.organisation, pref_education_level=1, positions_available=2,
+            start_date=today, end_date=today + datetime.timedelta(days=60),
+        )
+        RequiredSkill.objects.create(preference=cls.preference, skill=skill)
+        cls.student_preference = StudentPreference.objects.create(
+            student=cls.student, pref_location='Gaborone',
+            available_from=today, available_to=today + datetime.timedelta(days=90),
+        )
+        DesiredSkill.objects.create(student_pref=cls.student_preference, skill=skill)
+        Logbook.objects.create(student_id=cls.student, org_id=cls.organisation, week_number=1, log_entry='Entry')
+
+    def setUp(self):
+        # Cached profiles would not be read from the database at all.
+        caches['default'].clear()
+        self.client.defaults.update(bearer('admin', 1))
+
+    def urls(self):
+        org_id, student_id = self.organisation.org_id, self.student.student_id
+        return [
+            (reverse('list_all_students'), {}),
+            (reverse('list_all_students'), {'year_of_study': 3}),
+            (reverse('manage_student', args=[student_id]), {}),
+            (reverse('list_all_organisations'), {}),
+            (reverse('list_all_organisations'), {'town': 'Gaborone'}),
+            (reverse('manage_organisation', args=[org_id]), {}),
+            (reverse('get_org_id_by_name'), {'name': 'Acme'}),
+            (reverse('student_preference_list'), {}),
+            (reverse('student_preference_list'), {'student_id': student_id}),
+            (reverse('list_organisation_preferences', args=[org_id]), {}),
+            (reverse('logbook'), {}),
+            (reverse('logbook'), {'org_id': org_id}),
+            (reverse('logbook'), {'student_id': student_id}),
+            (reverse('org_logbooks', args=[org_id]), {}),
+            (reverse('async_org_logbooks', args=[org_id]), {}),
+            (reverse('organisation_logbook_counts', args=[org_id]), {}),
+            (reverse('update_student_profile', args=[student_id]), {}),
+            (reverse('update_organisation_profile', args=[org_id]), {}),
+            (reverse('student_recommendations', args=[self.student_preference.pk]), {}),
+            (reverse('organisation_candidates', args=[self.preference.pk]), {}),
+            (reverse('eligible_organisations', args=[self.student_preference.pk]), {}),
+            (reverse('eligible_students', args=[self.preference.pk]), {}),
+            (reverse('get_industries'), {}),
+            (reverse('get_skills'), {}),
+        ]
+
+    def test_read_endpoints_use_indexes(self):
+        for url, params in self.urls():
+            with self.subTest(url=url, params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                for query in queries:
+                    if query['sql'].startswith('SELECT'):
+                        self.assertEqual(plan_problems(connection, query['sql']), [], query['sql'])
+
+    def test_matching_reads_use_indexes(self):
+        from .eligibility import refresh_students
+        from .matching import organisation_capacity
+        for name, read in (
+            ('organisation_capacity', lambda: organisation_capacity(self.organisation.org_id)),
+            ('refresh_students', lambda: refresh_students([self.student_preference.pk])),
+        ):
+            with self.subTest(name):
+                with CaptureQueriesContext(connection) as queries:
+                    read()
+                for query in queries:
+                    if query['sql'].startswith('SELECT'):
+                        self.assertEqual(plan_problems(connection, query['sql']), [], query['sql'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Which alias the router picks; the replica alias need not exist."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = RequestFactory()
+
+    def serve(self, method='get', view=None, **headers):
+        def record(request):
+            return HttpResponse(router.db_for_read(Student))
+        middleware = ReplicaRoutingMiddleware(view or record)
+        response = middleware(getattr(self.factory, method)('/api/students/', **headers))
+        return response.content.decode() if not response.streaming else b''.join(response.streaming_content).decode()
+
+    def test_reads_of_read_only_requests_go_to_a_replica(self):
+        self.assertEqual(self.serve(), 'replica1')
+        self.assertEqual(self.serve('post'), 'default')
+
+    def test_reads_go_to_the_primary_outside_requests_and_in_transactions(self):
+        self.assertEqual(router.db_for_read(Student), 'default')
+
+        def in_transaction(request):
+            with transaction.atomic():
+                return HttpResponse(router.db_for_read(Student))
+        self.assertEqual(self.serve(view=in_transaction), 'default')
+
+    def test_a_write_pins_the_request_and_the_client_to_the_primary(self):
+        def write_then_read(request):
+            before = router.db_for_read(Student)
+            self.assertEqual(router.db_for_write(Student), 'default')
+            return HttpResponse(f'{before},{router.db_for_read(Student)}')
+
+        student = bearer('student', '202000001')
+        self.assertEqual(self.serve(view=write_then_read, **student), 'replica1,default')
+        self.assertEqual(self.serve(**student), 'default')
+        self.assertEqual(self.serve(**bearer('student', '202000002'), REMOTE_ADDR='10.0.0.2'), 'replica1')
+
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=0):
+            self.serve('post', view=write_then_read, **bearer('student', '202000003'))
+        self.assertEqual(self.serve(**bearer('student', '202000003'), REMOTE_ADDR='10.0.0.3'), 'replica1')
+
+    def test_a_sign_up_pins_the_client_ip(self):
+        def sign_up(request):
+            router.db_for_write(Student)
+            return HttpResponse()
+        self.serve('post', view=sign_up, REMOTE_ADDR='10.0.0.4')
+        self.assertEqual(self.serve(**bearer('student', '202000004'), REMOTE_ADDR='10.0.0.4'), 'default')
+
+    def test_streamed_bodies_are_read_from_the_replica(self):
+        def export(request):
+            return StreamingHttpResponse(router.db_for_read(Student) for _ in range(1))
+        self.assertEqual(self.serve(view=export), 'replica1')
+        self.assertIsNone(routers.current())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.serve(), 'default')
+
+
+class ReplicaTests(TransactionTestCase):
+    """Requests against the replica aliases configured by DB_REPLICA_HOSTS/DB_REPLICA_NAMES."""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        if not settings.DATABASE_REPLICAS:
+            raise SkipTest("no read replicas configured")
+        super().setUpClass()
+
+    def test_lists_are_read_from_a_replica(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with self.settings(DATABASE_REPLICAS=[replica.alias]), CaptureQueriesContext(replica) as reads:
+            response = self.client.get(reverse('list_all_students'), **bearer('admin', 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('users_student' in query['sql'] for query in reads))
+
+
+class FastListTests(TestCase):
+    """The .values() list serializers, the JSON encoder and response compression."""
+
+    @classmethod
+    def setUpTestData(cls):
+        it = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        finance = Industry.objects.create(industry_id='FIN', industry_name='Finance')
+        python, js = Skill.objects.create(skill_id='PY', name='Python'), Skill.objects.create(skill_id='JS', name='JavaScript')
+        today = datetime.date.today()
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=it, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        Organisation.objects.create(
+            org_name='Émigré Ltd', industry=finance, town='Maun', street='Side', plot_number='2',
+            contact_number='7100002', contact_email='emigre@example.com', password='x',
+        )
+        for end in (60, 90):
+            preference = OrganisationPreference.objects.create(
+                organisation=cls.organisation, pref_education_level=2, positions_available=1,
+                start_date=today, end_date=today + datetime.timedelta(days=end),
+            )
+            for skill in (python, js):
+                RequiredSkill.objects.create(preference=preference, skill=skill)
+            PreferredField.objects.create(preference=preference, field_name='Software')
+        for n in range(3):
+            student = Student.objects.create(
+                student_id=f'20200000{n}', first_name='Ann', last_name=f'Number{n}', year_of_study=3,
+                student_email=f'ann{n}@example.com', student_contact_number=f'720000{n}', password='x',
+            )
+            pref = StudentPreference.objects.create(
+                student=student, pref_location='Gaborone',
+                available_from=today, available_to=today + datetime.timedelta(days=90),
+            )
+            if n:
+                PreferredIndustry.objects.create(student=pref, industry=it)
+                PreferredIndustry.objects.create(student=pref, industry=finance)
+                DesiredSkill.objects.create(student_pref=pref, skill=python)
+                DesiredSkill.objects.create(student_pref=pref, skill=js)
+            Logbook.objects.create(student_id=student, org_id=cls.organisation, week_number=1, log_entry=f'Week {n}')
+
+    def test_rows_render_like_the_serializers(self):
+        for rows, serializer, queryset in (
+            (LogbookRows, LogbookSerializer, Logbook.objects.order_by('-submitted_at')),
+            (StudentPreferenceRows, StudentPreferenceSerializer, StudentPreference.objects.order_by('pk')),
+            (OrganisationRows, OrganisationWithPreferenceSerializer, Organisation.objects.order_by('pk')),
+        ):
+            with self.subTest(rows.__name__):
+                expected = JSONRenderer().render(serializer(serializer.setup_eager_loading(queryset), many=True).data)
+                self.assertEqual(dumps(rows(rows.project(queryset), many=True).data), expected)
+
+    def test_list_endpoints_read_rows(self):
+        admin = bearer('admin', 1)
+        for url, queries in (
+            (reverse('student_preference_list'), 3),
+            (reverse('list_all_organisations'), 4),
+            (reverse('logbook'), 1),
+            (reverse('org_logbooks', args=[self.organisation.org_id]), 1),
+        ):
+            with self.subTest(url), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url, **admin).status_code, 200)
+
+    def test_dumps_encodes_like_drf(self):
+        data = {
+            'aware': timezone.make_aware(datetime.datetime(2026, 3, 1, 8, 30, 0, 123456), datetime.timezone.utc),
+            'naive': datetime.datetime(2026, 3, 1, 8, 30),
+            'date': datetime.date(2026, 3, 1),
+            'decimal': Decimal('1.5'),
+            'lazy': gettext_lazy('Not found.'),
+            'text': 'Émigré – 日本',
+            'nested': [None, True, 2, 2.5, ('a', 'b')],
+        }
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+    def test_gzip_when_accepted(self):
+        url = reverse('student_preference_list')
+        plain = self.client.get(url, **bearer('admin', 1))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', **bearer('admin', 1))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_streamed_exports_are_compressed(self):
+        response = self.client.get(
+            reverse('export', args=['logbooks', 'csv']), HTTP_ACCEPT_ENCODING='gzip', **bearer('admin', 1),
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Week 2', gzip.decompress(b''.join(response.streaming_content)))
+
+    async def test_event_streams_are_not_compressed(self):
+        response = await AsyncClient().get(
+            reverse('event_stream'), {'token': issue_token('admin', 1)['token']}, headers={'Accept-Encoding': 'gzip, br'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        await chunks.aclose()
+
+    def test_brotli_negotiation(self):
+        def accepts(header):
+            return _accepts_brotli(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header))
+        self.assertTrue(accepts('gzip, deflate, br'))
+        self.assertTrue(accepts('br;q=0.5, gzip'))
+        self.assertFalse(accepts('br;q=0, gzip'))
+        self.assertFalse(accepts('gzip'))
+        if brotli is None:
+            raise SkipTest("brotli is not installed")
+        url = reverse('student_preference_list')
+        plain = self.client.get(url, **bearer('admin', 1))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br', **bearer('admin', 1))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= selections are pushed down into the queries; hashes are never returned."""
+
+    @classmethod
+    def setUpTestData(cls):
+        industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        skill = Skill.objects.create(skill_id='PY', name='Python')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password=make_password('secret'),
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password=make_password('secret'),
+        )
+        today = datetime.date.today()
+        preference = OrganisationPreference.objects.create(
+            organisation=cls.organisation, pref_education_level=1, positions_available=2,
+            start_date=today, end_date=today + datetime.timedelta(days=60),
+        )
+        RequiredSkill.objects.create(preference=preference, skill=skill)
+        student_preference = StudentPreference.objects.create(
+            student=cls.student, pref_location='Gaborone',
+            available_from=today, available_to=today + datetime.timedelta(days=90),
+        )
+        DesiredSkill.objects.create(student_pref=student_preference, skill=skill)
+        PreferredIndustry.objects.create(student=student_preference, industry=industry)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def get(self, name, args=(), **params):
+        return self.client.get(reverse(name, args=args), params, **bearer('admin', 1))
+
+    def test_lists_return_and_read_only_the_selected_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('student_preference_list', fields='student_pref_id,student_name')
+        self.assertEqual(response.json()['results'], [
+            {'student_pref_id': f'{self.student.student_id}_PREF001', 'student_name': 'Ann One'},
+        ])
+        # No industry or skill queries, and no unselected columns.
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('pref_location', queries[0]['sql'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('list_all_students', fields='first_name')
+        self.assertEqual(response.json()['results'], [{'first_name': 'Ann'}])
+        self.assertNotIn('student_email', queries[0]['sql'])
+
+    def test_detail_endpoints_honour_fields(self):
+        response = self.get('update_organisation_profile', [self.organisation.org_id], fields='org_name,industry_name')
+        self.assertEqual(response.json(), {'industry_name': 'Information Technology', 'org_name': 'Acme'})
+        response = self.get('manage_student', [self.student.student_id], fields='last_name')
+        self.assertEqual(response.json(), {'last_name': 'One'})
+
+    def test_unknown_fields_are_rejected(self):
+        for name, args in (
+            ('student_preference_list', []),
+            ('list_all_students', []),
+            ('manage_student', [self.student.student_id]),
+        ):
+            with self.subTest(name):
+                response = self.get(name, args, fields='password')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Unknown fields: password.'})
+
+    def test_password_hashes_are_not_returned(self):
+        org_id, student_id = self.organisation.org_id, self.student.student_id
+        for name, args in (
+            ('list_all_students', []),
+            ('list_all_organisations', []),
+            ('manage_student', [student_id]),
+            ('manage_organisation', [org_id]),
+            ('update_student_profile', [student_id]),
+            ('update_organisation_profile', [org_id]),
+        ):
+            with self.subTest(name):
+                response = self.get(name, args)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(b'password', response.content)
+                self.assertNotIn(b'pbkdf2', response.content)
+
+    def test_async_twins_honour_fields(self):
+        url = reverse('async_organisation_profile', args=[self.organisation.org_id])
+        response = async_to_sync(AsyncClient().get)(
+            url, {'fields': 'org_name'}, headers={'Authorization': bearer('admin', 1)['HTTP_AUTHORIZATION']},
+        )
+        self.assertEqual(response.json(), {'org_name': 'Acme'})
+
+
+class ObjectCacheTests(TestCase):
+    """Cached profiles and preferences, their invalidation and conditional GETs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.industry = Industry.objects.create(industry_id='IT', industry_name='Information Technology')
+        cls.skill = Skill.objects.create(skill_id='PY', name='Python')
+        cls.organisation = Organisation.objects.create(
+            org_name='Acme', industry=cls.industry, town='Gaborone', street='Main', plot_number='1',
+            contact_number='7100001', contact_email='acme@example.com', password='x',
+        )
+        cls.student = Student.objects.create(
+            student_id='202000001', first_name='Ann', last_name='One', year_of_study=3,
+            student_email='ann@example.com', student_contact_number='7200001', password='x',
+        )
+        today = datetime.date.today()
+        cls.preference = OrganisationPreference.objects.create(
+            organisation=cls.organisation, pref_education_level=1, positions_available=2,
+            start_date=today, end_date=today + datetime.timedelta(days=60),
+        )
+        RequiredSkill.objects.create(preference=cls.preference, skill=cls.skill)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client.defaults.update(bearer('admin', 1))
+        self.profile = reverse('update_organisation_profile', args=[self.organisation.org_id])
+        self.preferences = reverse('list_organisation_preferences', args=[self.organisation.org_id])
+
+    def test_reads_are_cached_and_revalidated(self):
+        first = self.client.get(self.profile)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.profile)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.json()['org_name'], 'Acme')
+        self.assertIn('private', second['Cache-Control'])
+        self.assertIn('no-cache', second['Cache-Control'])
+
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': first['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']},
+        ):
+            with self.subTest(headers):
+                response = self.client.get(self.profile, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+        # A ?fields= selection is cut from the cached entry and has its own ETag.
+        with self.assertNumQueries(0):
+            selected = self.client.get(self.profile, {'fields': 'org_name'})
+        self.assertEqual(selected.json(), {'org_name': 'Acme'})
+        self.assertNotEqual(selected['ETag'], first['ETag'])
+
+        async_response = async_to_sync(AsyncClient().get)(
+            reverse('async_organisation_profile', args=[self.organisation.org_id]),
+            headers={'Authorization': bearer('admin', 1)['HTTP_AUTHORIZATION'], 'If-None-Match': first['ETag']},
+        )
+        self.assertEqual(async_response.status_code, 304)
+
+    def test_writes_replace_the_cached_entry(self):
+        before = self.client.get(self.profile)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.profile, {'town': 'Maun'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        after = self.client.get(self.profile, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()['town'], 'Maun')
+        self.assertGreater(parse_http_date(after['Last-Modified']), parse_http_date(before['Last-Modified']))
+        response = self.client.get(self.profile, HTTP_IF_MODIFIED_SINCE=before['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+        student = reverse('manage_student', args=[self.student.student_id])
+        self.assertEqual(self.client.get(student).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertEqual(self.client.get(student).status_code, 404)
+
+    def test_related_rows_replace_the_cached_entries(self):
+        def preference():
+            return self.client.get(self.preferences).json()[0]
+
+        self.assertEqual(preference()['required_skills_names'], ['Python'])
+        with self.captureOnCommitCallbacks(execute=True):
+            RequiredSkill.objects.create(preference=self.preference, skill=Skill.objects.create(skill_id='JS', name='JavaScript'))
+        self.assertEqual(preference()['required_skills_names'], ['JavaScript', 'Python'])
+
+        self.skill.name = 'Python 3'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skill.save()
+        self.assertEqual(preference()['required_skills_names'], ['JavaScript', 'Python 3'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PreferredField.objects.create(preference=self.preference, field_name='Software')
+        self.assertEqual(preference()['preferred_fields_names'], ['Software'])
+
+        organisation = Organisation.objects.get(pk=self.organisation.pk)
+        organisation.org_name = 'Acme Ltd'
+        with self.captureOnCommitCallbacks(execute=True):
+            organisation.save()
+        self.assertEqual(preference()['organisation_name'], 'Acme Ltd')
+
+        self.assertEqual(self.client.get(self.profile).json()['industry_name'], 'Information Technology')
+        self.industry.industry_name = 'IT & Software'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.industry.save()
+        self.assertEqual(self.client.get(self.profile).json()['industry_name'], 'IT & Software')
+
+        etag = self.client.get(self.preferences)['ETag']
+        self.assertEqual(self.client.get(self.preferences, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preference.delete()
+        response = self.client.get(self.preferences, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_deploy_check_wants_shared_caches(self):
+        self.assertEqual([warning.id for warning in checks.shared_caches(None)], ['users.W001'])
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/0'}
+        with override_settings(CACHES={'default': redis, 'throttle': dict(redis, KEY_PREFIX='throttle')}):
+            self.assertEqual(checks.shared_caches(None), [])
+
+    def test_batched_changes_are_replaced_once(self):
+        url = reverse('manage_student', args=[self.student.student_id])
+        self.client.get(url)
+        with patch.object(object_cache, 'invalidate', wraps=object_cache.invalidate) as invalidate:
+            with self.captureOnCommitCallbacks(execute=True), signals.batched():
+                for name in ('Anne', 'Annie'):
+                    self.student.first_name = name
+                    self.student.save()
+        invalidate.assert_called_once_with('student', [self.student.student_id])
+        self.assertEqual(self.client.get(url).json()['first_name'], 'Annie')
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import ParseError
+from rest_framework.throttling import BaseThrottle
+
+# Token buckets in front of the views that check a password. Every caller
+# IP and every account identifier gets a bucket of ``capacity`` attempts
+# that refills at ``per_minute``; a request needs one token from each of
+# its buckets. The check runs in DRF's check_throttles(), before the view
+# body, so rejected attempts cost neither a query nor a password hash.
+#
+# Buckets live in the cache alias settings.THROTTLE_CACHE. The default is a
+# per-process LocMemCache; pointing the alias at a shared backend applies
+# the limits across workers without code changes.
+
+# Request fields and URL arguments naming the account being logged into.
+ACCOUNT_FIELDS = ('student_id', 'org_id', 'contact_email', 'email')
+
+
+class ThrottleCounters:
+    """Per-process allowed/rejected counts by bucket kind and URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, kind, name, allowed):
+        with self._lock:
+            counts = self._counts.setdefault(kind, {}).setdefault(name, {'allowed': 0, 'rejected': 0})
+            counts['allowed' if allowed else 'rejected'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: {name: dict(counts) for name, counts in sorted(names.items())}
+                    for kind, names in sorted(self._counts.items())}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+counters = ThrottleCounters()
+
+
+def take(key, capacity, per_minute, now=None):
+    """
+    Take one token from bucket ``key``. Return ``(allowed, wait)`` where
+    ``wait`` is the number of seconds until a token is available.
+
+    The bucket is stored as the time, in milliseconds, at which it will be
+    full again (GCRA's theoretical arrival time) and expires then. Taking a
+    token is one cache.add() or cache.incr(), so concurrent workers sharing
+    the cache cannot both spend the last token; an attempt that finds the
+    bucket empty hands its token back.
+    """
+    cache = caches[settings.THROTTLE_CACHE]
+    now = round((time.time() if now is None else now) * 1000)
+    interval = round(60000 / per_minute)
+    limit = now + capacity * interval
+    if cache.add(key, now + interval, timeout=_seconds(interval)):
+        return True, 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # Expired since the add(): the bucket is full.
+        full_at = None
+    if full_at is None or full_at <= now:
+        # Full since before now, or recreated by the incr without a timeout.
+        cache.set(key, now + interval, timeout=_seconds(interval))
+        return True, 0
+    if full_at > limit:
+        give_back(key, per_minute)
+        return False, (full_at - limit) / 1000
+    cache.touch(key, timeout=_seconds(full_at - now))
+    return True, 0
+
+
+def give_back(key, per_minute):
+    """Return the token take() took from bucket ``key``."""
+    try:
+        caches[settings.THROTTLE_CACHE].decr(key, round(60000 / per_minute))
+    except ValueError:
+        pass
+
+
+def _seconds(milliseconds):
+    return -(-milliseconds // 1000)
+
+
+def account_identifier(request, view):
+    for field in ACCOUNT_FIELDS:
+        if field in view.kwargs:
+            return field, str(view.kwargs[field])
+    try:
+        data = request.data
+    except ParseError:
+        return None
+    for field in ACCOUNT_FIELDS:
+        value = data.get(field) if hasattr(data, 'get') else None
+        if value not in (None, ''):
+            return field, str(value).strip().lower()
+    return None
+
+
+class CredentialThrottle(BaseThrottle):
+    """Limit password checks per client IP and per account (settings.CREDENTIAL_THROTTLE_RATES)."""
+
+    def allow_request(self, request, view):
+        rates = settings.CREDENTIAL_THROTTLE_RATES
+        match = request.resolver_match
+        name = match.url_name if match else view.__class__.__name__
+
+        buckets = [('ip', f'throttle:ip:{self.get_ident(request)}')]
+        account = account_identifier(request, view)
+        if account is not None:
+            # Hashed: the identifier is user input of any length.
+            field, value = account
+            buckets.append(('account', f'throttle:account:{field}:{hashlib.sha256(value.encode()).hexdigest()}'))
+
+        # A request rejected by one bucket leaves the others as they were.
+        self.wait_seconds = None
+        taken = []
+        for kind, key in buckets:
+            allowed, wait = take(key, **rates[kind])
+            counters.record(kind, name, allowed)
+            if not allowed:
+                for taken_kind, taken_key in taken:
+                    give_back(taken_key, rates[taken_kind]['per_minute'])
+                self.wait_seconds = wait
+                return False
+            taken.append((kind, key))
+        return True
+
+    def wait(self):
+        return self.wait_seconds
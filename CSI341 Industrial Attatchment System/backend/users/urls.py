@@ -21,6 +21,13 @@ from .views import (
     list_all_organisations,
     manage_organisation,
     manual_match,
+    auto_match,
+    assign_matches,
+    invalid_matches,
+    eligible_organisations,
+    eligible_students,
+    student_recommendations,
+    organisation_candidates,
     preference_list,
     update_student_preference,
     update_organisation_preference,
@@ -31,11 +38,22 @@ from .views import (
     get_logbook_detail,
     get_org_logbooks,
     mark_logbook_viewed,
+    request_metrics,
+    throttle_metrics,
+    search_logbooks,
+    organisation_logbook_counts,
+    student_logbook_counts,
+    export,
+    event_stream,
+    bulk_import,
+    bulk_mark_logbooks_viewed,
+    submit_logbook_batch,
    
     
     
 )
 from django.views.generic import TemplateView
+from . import async_views
 
 urlpatterns = [
     path('register/', register_user, name='register_user'),
@@ -47,6 +65,7 @@ urlpatterns = [
 
     # Organisation Routes
     path('register-organisation/', register_organisation, name='register_organisation'),
+    path('import/<str:kind>/', bulk_import, name='bulk_import'),
     path('login-organisation/', login_organisation, name='login_organisation'),
     path('organisation/<int:org_id>/preferences/', list_organisation_preferences, name='list_organisation_preferences'),
     path('organisation/<int:org_id>/preferences/create/', create_organisation_preference, name='create_organisation_preference'),
@@ -71,18 +90,43 @@ urlpatterns = [
     path('admin/organisations/', list_all_organisations, name='list_all_organisations'),
     path('admin/organisations/<int:org_id>/', manage_organisation, name='manage_organisation'),
     path('manual-match/', manual_match, name='manual_match'),
+    path('auto-match/', auto_match, name='auto_match'),
+    path('auto-match/assign/', assign_matches, name='assign_matches'),
+    path('auto-match/invalid/', invalid_matches, name='invalid_matches'),
     path('admin/student-preferences/', preference_list, name='student_preference_list'),
     path('student-preferences/', preference_list, name='student_preference_list'),
     path('student-preference/<str:student_pref_id>/', update_student_preference, name='update_student_preference'),
     path('organisation-preference/<int:pref_id>/', update_organisation_preference, name='update_organisation_preference'),
+    path('student-preference/<str:student_pref_id>/eligible-organisations/', eligible_organisations, name='eligible_organisations'),
+    path('organisation-preference/<int:pref_id>/eligible-students/', eligible_students, name='eligible_students'),
+    path('student-preference/<str:student_pref_id>/recommendations/', student_recommendations, name='student_recommendations'),
+    path('organisation-preference/<int:pref_id>/candidates/', organisation_candidates, name='organisation_candidates'),
     path('update_student_profile/<str:student_id>/',update_student_profile, name='update_student_profile'), 
     path('change-password/<str:student_id>/', change_password, name='change-password'),
     path('update_organisation_profile/<int:org_id>/', update_organisation_profile, name='update_organisation_profile'),
     path('change-password/<str:student_id>/', change_password, name='change_password'),
     path('change-organisation-password/<int:org_id>/', change_org_password, name='change_org_password'),
     path('organisation/<int:org_id>/logbooks/', get_org_logbooks, name='org_logbooks'),
+    path('organisation/<int:org_id>/logbooks/counts/', organisation_logbook_counts, name='organisation_logbook_counts'),
+    path('student/<str:student_id>/logbooks/counts/', student_logbook_counts, name='student_logbook_counts'),
+    path('logbooks/mark-viewed/', bulk_mark_logbooks_viewed, name='bulk_mark_logbooks_viewed'),
+    path('logbooks/batch/', submit_logbook_batch, name='submit_logbook_batch'),
+    path('logbooks/search/', search_logbooks, name='search_logbooks'),
     path('logbooks/<str:logbook_id>/', get_logbook_detail, name='logbook_detail'),
     path('logbooks/<str:logbook_id>/mark-viewed/', mark_logbook_viewed, name='mark_logbook_viewed'),
+    path('export/<str:name>.<str:fmt>', export, name='export'),
+    path('events/', event_stream, name='event_stream'),
+    path('metrics/', request_metrics, name='request_metrics'),
+    path('metrics/throttles/', throttle_metrics, name='throttle_metrics'),
+
+    # Async twins of the busiest reads, for ASGI servers (see async_views.py).
+    path('async/student-preferences/', async_views.preference_list, name='async_student_preference_list'),
+    path('async/organisation/<int:org_id>/preferences/', async_views.list_organisation_preferences, name='async_list_organisation_preferences'),
+    path('async/organisation/<int:org_id>/logbooks/', async_views.org_logbooks, name='async_org_logbooks'),
+    path('async/organisation/<int:org_id>/profile/', async_views.organisation_profile, name='async_organisation_profile'),
+    path('async/student/<str:student_id>/profile/', async_views.student_profile, name='async_student_profile'),
+    path('async/industries/', async_views.get_industries, name='async_get_industries'),
+    path('async/skills/', async_views.get_skills, name='async_get_skills'),
     
     
     
@@ -1,24 +1,64 @@
 from django.shortcuts import render
 
 # Create your views here.
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 import json
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.contrib.auth.hashers import check_password,make_password
 from .models import Student
 import traceback
 from django.utils import timezone
-from .serializers import StudentSerializer,IndustrySerializer,SkillSerializer,OrganisationSerializer,OrganisationPreferenceSerializer,RequiredSkillSerializer,PreferredFieldSerializer,LogbookSerializer,AdminSerializer,OrganisationWithPreferenceSerializer,StudentPreferenceSerializer
-from .models import Student, StudentPreference,Skill,DesiredSkill,PreferredIndustry,Industry,generate_preference_id,Organisation,Location,OrganisationPreference,Logbook,Admin,StudentMatch
+from .serializers import StudentSerializer,OrganisationSerializer,OrganisationPreferenceSerializer,RequiredSkillSerializer,PreferredFieldSerializer,LogbookSerializer,AdminSerializer,StudentPreferenceSerializer
+from .models import DUPLICATE_WEEK, Student, StudentPreference,Skill,DesiredSkill,PreferredIndustry,Industry,generate_preference_id,Organisation,Location,OrganisationPreference,Logbook,Admin,StudentMatch,EligiblePair
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from .serializers import UserSerializer
+from .matching import engine_session, organisation_capacity
+from .pagination import fields_param, paginated_response, int_param, date_param, FilterError
+from .rows import LogbookRows, OrganisationRows, StudentPreferenceRows
+from .middleware import metrics
+from .throttling import CredentialThrottle, counters as throttle_counters
+from . import catalogue, object_cache
+from .bulk_import import IMPORTERS, ImportFormatError, detect_format, read_rows
+from .logbooks import MAX_BATCH, mark_viewed, submit_logbooks
+from .exports import ENCODERS, EXPORTS, FORMATS
+from . import counters, events, search, signals
+from .authentication import (
+    ADMIN, ORGANISATION, STUDENT,
+    IsAdmin, IsOrganisation, IsOwner, IsStudent, IsStudentOrOrganisation, issue_token, token_user,
+)
+from rest_framework.exceptions import AuthenticationFailed
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
 import logging
 logger = logging.getLogger(__name__)
 
+def _forbidden():
+    return Response({"error": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+def _owns_student_preference(user, student_pref_id):
+    """False if the preference belongs to another student; unknown ids are left to the view."""
+    if user.is_admin:
+        return True
+    student_id = StudentPreference.objects.filter(student_pref_id=student_pref_id).values_list('student_id', flat=True).first()
+    return student_id is None or user.can_act_for_student(student_id)
+
+def _owns_organisation_preference(user, pref_id):
+    """False if the preference belongs to another organisation; unknown ids are left to the view."""
+    if user.is_admin:
+        return True
+    org_id = OrganisationPreference.objects.filter(pref_id=pref_id).values_list('organisation_id', flat=True).first()
+    return org_id is None or user.can_act_for_organisation(org_id)
+
 @api_view(['POST'])
 def register_user(request):
     try:
@@ -63,13 +103,14 @@ def register_student(request):
         return Response({"error": str(e)}, status=500)
     
 @api_view(['POST'])
+@throttle_classes([CredentialThrottle])
 def login_student(request):
     student_id = request.data.get("student_id")
     password = request.data.get("password")
     try:
         student = Student.objects.get(student_id=student_id)
         if check_password(password, student.password):
-            return Response({"message": "Student login successful"}, status=200)
+            return Response({"message": "Student login successful", **issue_token(STUDENT, student.student_id)}, status=200)
         else:
             return Response({"error": "Invalid credentials"}, status=400)
     except Student.DoesNotExist:
@@ -90,11 +131,16 @@ def preference_list(request):
     return JsonResponse(data, safe=False)
 
 @api_view(['POST'])
+@permission_classes([IsStudent])
 def create_student_preference(request):
+    if not request.user.can_act_for_student(request.data.get('student_id')):
+        return _forbidden()
     serializer = StudentPreferenceSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            serializer.save()
+            # One refresh for the preference and all its industries and skills.
+            with transaction.atomic(), signals.batched():
+                serializer.save()
             return Response({"message": "Preference created successfully."}, status=201)
         except ValidationError as e:
             return Response(e.message_dict, status=400)
@@ -103,15 +149,22 @@ def create_student_preference(request):
     else:
         print("Validation Error:", serializer.errors)  # ✅ log it to console
         return Response(serializer.errors, status=400)
+def _catalogue_response(name):
+    """Serve a cached catalogue; If-None-Match is answered by @condition."""
+    return HttpResponse(catalogue.get(name).payload, content_type='application/json')
+
+
+@cache_control(public=True, max_age=settings.CATALOGUE_MAX_AGE)
+@condition(etag_func=lambda request: catalogue.get('industries').etag)
+@require_GET
 def get_industries(request):
-    data = list(Industry.objects.values("industry_id", "industry_name"))
-    return JsonResponse(data, safe=False)
+    return _catalogue_response('industries')
 
-@api_view(['GET'])
+@cache_control(public=True, max_age=settings.CATALOGUE_MAX_AGE)
+@condition(etag_func=lambda request: catalogue.get('skills').etag)
+@require_GET
 def get_skills(request):
-    skills = Skill.objects.all()
-    serializer = SkillSerializer(skills, many=True)
-    return Response(serializer.data)
+    return _catalogue_response('skills')
 
 @api_view(['POST'])
 def register_organisation(request):
@@ -168,8 +221,51 @@ def register_organisation(request):
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def bulk_import(request, kind):
+    """
+    Register many students or organisations from one CSV or NDJSON upload.
+
+    Send the file as multipart field "file" (format taken from the file
+    name) or as the raw body with Content-Type text/csv or
+    application/x-ndjson. Columns match register_student /
+    register_organisation. Valid rows are created, invalid rows are listed
+    in "errors" by line number. Passwords are always hashed; only
+    `manage.py bulk_import --keep-hashes` keeps already hashed ones.
+    """
+    importer_class = IMPORTERS.get(kind)
+    if importer_class is None:
+        return Response({"error": "Can only import students or organisations"}, status=status.HTTP_404_NOT_FOUND)
+
+    # Only multipart bodies go through DRF's parsers; a raw body is read
+    # straight from the stream so it is never held in memory as a whole.
+    if request.content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        fmt = upload and detect_format(upload.name, upload.content_type)
+        stream = upload
+    else:
+        fmt, stream = detect_format(content_type=request.content_type), request.stream
+    if fmt is None or stream is None:
+        return Response(
+            {"error": "Upload a .csv or .ndjson file, or send text/csv or application/x-ndjson"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        report = importer_class().run(read_rows(stream, fmt))
+    except (ImportFormatError, UnicodeDecodeError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if report['created']:
+        return Response(report, status=status.HTTP_201_CREATED)
+    return Response(report, status=status.HTTP_400_BAD_REQUEST if report['errors'] else status.HTTP_200_OK)
+
 # Organisation Login
 @api_view(['POST'])
+@throttle_classes([CredentialThrottle])
 def login_organisation(request):
     contact_email = request.data.get("contact_email")
     password = request.data.get("password")
@@ -180,7 +276,8 @@ def login_organisation(request):
         if check_password(password, organisation.password):
             return Response({
                 "message": "Organisation login successful",
-                "organisation_id": organisation.org_id  # ✅ This line is needed!
+                "organisation_id": organisation.org_id,  # ✅ This line is needed!
+                **issue_token(ORGANISATION, organisation.org_id),
             }, status=status.HTTP_200_OK)
 
         return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
@@ -189,11 +286,16 @@ def login_organisation(request):
         return Response({"error": "Organisation not found"}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
+@permission_classes([IsOwner])
 def create_organisation_preference(request, org_id):
+    if not request.user.can_act_for_organisation(request.data.get('organisation', org_id)):
+        return _forbidden()
     serializer = OrganisationPreferenceSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            serializer.save()
+            # One refresh for the preference and all its industries and skills.
+            with transaction.atomic(), signals.batched():
+                serializer.save()
             return Response({"message": "Organisation preference created successfully."}, status=status.HTTP_201_CREATED)
         except ValidationError as e:
             return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
@@ -205,18 +307,30 @@ def create_organisation_preference(request, org_id):
 
 # List Preferences for Specific Organisation
 @api_view(['GET'])
+@permission_classes([IsOwner])
 def list_organisation_preferences(request, org_id):
     try:
-        preferences = OrganisationPreference.objects.filter(organisation_id=org_id)
-        serializer = OrganisationPreferenceSerializer(preferences, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return object_cache.respond_many(request, organisation_preference_entries(org_id))
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def organisation_preference_entries(org_id):
+    """The cached representations of an organisation's preferences, in creation order."""
+    pref_ids = list(
+        OrganisationPreference.objects.filter(organisation_id=org_id).order_by('pref_id').values_list('pref_id', flat=True)
+    )
+    entries = object_cache.get_many('organisation_preference', pref_ids)
+    # A preference deleted since the ids were read is left out.
+    return [entries[pk] for pk in pref_ids if pk in entries]
+
+
 # Add Preferred Field
 @api_view(['POST'])
+@permission_classes([IsOrganisation])
 def add_preferred_field(request):
+    if not _owns_organisation_preference(request.user, request.data.get('preference')):
+        return _forbidden()
     try:
         serializer = PreferredFieldSerializer(data=request.data)
         if serializer.is_valid():
@@ -228,7 +342,10 @@ def add_preferred_field(request):
 
 # Add Required Skill
 @api_view(['POST'])
+@permission_classes([IsOrganisation])
 def add_required_skill(request):
+    if not _owns_organisation_preference(request.user, request.data.get('preference')):
+        return _forbidden()
     try:
         serializer = RequiredSkillSerializer(data=request.data)
         if serializer.is_valid():
@@ -239,6 +356,7 @@ def add_required_skill(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET', 'POST'])
+@permission_classes([IsStudentOrOrganisation])
 def create_logbook_entry(request):
     if request.method == 'POST':
         try:
@@ -248,6 +366,9 @@ def create_logbook_entry(request):
                 if field not in data:
                     return Response({"error": f"{field} is a required field."}, status=status.HTTP_400_BAD_REQUEST)
 
+            if not request.user.can_act_for_student(data['student_id']):
+                return _forbidden()
+
             if not Student.objects.filter(student_id=data['student_id']).exists():
                 return Response({"error": "Student ID does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -261,15 +382,38 @@ def create_logbook_entry(request):
 
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        except ValidationError as e:
+            # Logbook.full_clean catching a week submitted since validation.
+            return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            return _week_submitted()
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     elif request.method == 'GET':
-        logs = Logbook.objects.all()
-        serializer = LogbookSerializer(logs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            logs = Logbook.objects.all()
+            week_number = int_param(request, 'week_number')
+            if week_number is not None:
+                logs = logs.filter(week_number=week_number)
+            if request.GET.get('status'):
+                logs = logs.filter(status=request.GET['status'])
+            if request.GET.get('student_id'):
+                logs = logs.filter(student_id=request.GET['student_id'])
+            org_id = int_param(request, 'org_id')
+            if org_id is not None:
+                logs = logs.filter(org_id=org_id)
+            # Students and organisations only see their own logbooks.
+            if request.user.role == STUDENT:
+                logs = logs.filter(student_id=request.user.id)
+            elif request.user.role == ORGANISATION:
+                logs = logs.filter(org_id=request.user.id)
+        except FilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return paginated_response(request, logs, LogbookRows, ordering='-submitted_at')
     
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
 def get_org_id_by_name(request):
     name = request.GET.get("name")
     try:
@@ -280,7 +424,10 @@ def get_org_id_by_name(request):
     
 
 @api_view(['POST'])
+@permission_classes([IsAdmin])
 def register_admin(request):
+    # Only admins add admins; the first one is created with
+    # `manage.py create_admin`.
     try:
         data = request.data
         required_fields = ['first_name', 'last_name', 'email', 'password']
@@ -301,6 +448,7 @@ def register_admin(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
+@throttle_classes([CredentialThrottle])
 def login_admin(request):
     email = request.data.get('email')
     password = request.data.get('password')
@@ -313,26 +461,39 @@ def login_admin(request):
             return Response({
                 "message": "Login successful",
                 "admin_id": admin.admin_id,
-                "email": admin.email
+                "email": admin.email,
+                **issue_token(ADMIN, admin.admin_id),
             }, status=status.HTTP_200_OK)
         return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
     except Admin.DoesNotExist:
         return Response({"error": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
     
     
+def cached_object_response(request, kind, pk, serializer_class, not_found):
+    """Serve an object_cache entry with the fields picked by ?fields=."""
+    try:
+        fields = fields_param(request, serializer_class)
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    entry = object_cache.get(kind, pk)
+    if entry is None:
+        return Response({"error": not_found}, status=status.HTTP_404_NOT_FOUND)
+    return object_cache.respond(request, *entry.select(fields), last_modified=entry.modified)
+
+
 # Add to views.py
 @api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAdmin])
 def manage_student(request, student_id):
+    if request.method == 'GET':
+        return cached_object_response(request, 'student', student_id, StudentSerializer, "Student not found")
+
     try:
         student = Student.objects.get(student_id=student_id)
     except Student.DoesNotExist:
         return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = StudentSerializer(student)
-        return Response(serializer.data)
-
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = StudentSerializer(student, data=request.data, partial=True)
         if serializer.is_valid():
             if 'password' in request.data:
@@ -346,25 +507,31 @@ def manage_student(request, student_id):
         return Response({"message": "Student deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 @api_view(['GET'])
+@permission_classes([IsAdmin])
 def list_all_students(request):
-    students = Student.objects.all()
-    serializer = StudentSerializer(students, many=True)
-    return Response(serializer.data)
+    try:
+        students = Student.objects.all()
+        year_of_study = int_param(request, 'year_of_study')
+        if year_of_study is not None:
+            students = students.filter(year_of_study=year_of_study)
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return paginated_response(request, students, StudentSerializer, ordering='student_id')
 
 
 # Add to views.py
 @api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAdmin])
 def manage_organisation(request, org_id):
+    if request.method == 'GET':
+        return cached_object_response(request, 'organisation', org_id, OrganisationSerializer, "Organization not found")
+
     try:
         org = Organisation.objects.get(org_id=org_id)
     except Organisation.DoesNotExist:
         return Response({"error": "Organization not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = OrganisationSerializer(org)
-        return Response(serializer.data)
-
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = OrganisationSerializer(org, data=request.data, partial=True)
         if serializer.is_valid():
             if 'password' in request.data:
@@ -378,12 +545,17 @@ def manage_organisation(request, org_id):
         return Response({"message": "Organization deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
     
 @api_view(['GET'])
+@permission_classes([IsAdmin])
 def list_all_organisations(request):
-    orgs = Organisation.objects.select_related('industry').all()
-    serializer = OrganisationWithPreferenceSerializer(orgs, many=True)
-    return Response(serializer.data)
+    orgs = Organisation.objects.all()
+    if request.GET.get('industry'):
+        orgs = orgs.filter(industry_id=request.GET['industry'])
+    if request.GET.get('town'):
+        orgs = orgs.filter(town=request.GET['town'])
+    return paginated_response(request, orgs, OrganisationRows, ordering='org_id')
 
 @api_view(['POST'])
+@permission_classes([IsAdmin])
 def manual_match(request):
     """
     Expected JSON payload:
@@ -405,12 +577,30 @@ def manual_match(request):
             )
         
         student_pref = StudentPreference.objects.get(student_pref_id=student_pref_id)
-        organisation = Organisation.objects.get(org_id=organisation_id)
-        
-        match, created = StudentMatch.objects.update_or_create(
-            student_preference=student_pref,
-            defaults={"organisation": organisation, "admin_note": admin_note}
-        )
+
+        with transaction.atomic():
+            # Lock the organisation row so concurrent matches cannot both
+            # take the last position.
+            organisation = Organisation.objects.select_for_update().get(org_id=organisation_id)
+            positions, matched = organisation_capacity(organisation.org_id)
+            # A student has one match: matching another of their
+            # preferences moves it.
+            already_here = StudentMatch.objects.filter(
+                student_id=student_pref.student_id, organisation=organisation
+            ).exists()
+            if not already_here and matched >= positions:
+                return Response(
+                    {"error": f"{organisation.org_name} has no positions available ({matched} of {positions} filled)."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            match, created = StudentMatch.objects.update_or_create(
+                student_id=student_pref.student_id,
+                defaults={
+                    "student_preference": student_pref, "organisation": organisation,
+                    "admin_note": admin_note, "score": None,
+                }
+            )
         msg = "Match created successfully." if created else "Match updated successfully."
         return Response({"message": msg, "match_id": match.pk}, status=status.HTTP_200_OK)
         
@@ -422,20 +612,244 @@ def manual_match(request):
         traceback.print_exc()
         return Response({"error": "Server error: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _week_submitted():
+    # A concurrent request submitted the same week after it was checked.
+    return Response({"error": DUPLICATE_WEEK}, status=status.HTTP_409_CONFLICT)
+
+def _matches_changed():
+    # Another request matched one of the students meanwhile; nothing was saved.
+    return Response(
+        {"error": "Matches changed while matching; run it again."}, status=status.HTTP_409_CONFLICT
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def auto_match(request):
+    """
+    Score every student preference against every organisation preference
+    and return the ranked candidates.
+
+    Expected JSON payload (all optional):
+    {
+      "k": 5,          # candidates returned per student preference
+      "commit": true   # match unmatched students to their best candidate
+    }
+    """
+    try:
+        k = int(request.data.get("k", 5))
+        if k < 1:
+            return Response({"error": "k must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError):
+        return Response({"error": "k must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with engine_session(reload=request.data.get("reload", False)) as engine:
+            candidates = engine.ranked_candidates(k=k)
+            created = []
+            if request.data.get("commit"):
+                created = engine.write_matches(candidates)
+        return Response({
+            "candidates": candidates,
+            "matches_created": len(created),
+        }, status=status.HTTP_200_OK)
+    except IntegrityError:
+        return _matches_changed()
+    except Exception as e:
+        traceback.print_exc()
+        return Response({"error": "Server error: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def assign_matches(request):
+    """
+    Allocate students to organisations without exceeding any preference's
+    positions_available.
+
+    Expected JSON payload (all optional):
+    {
+      "keep_existing": true,  # keep current matches and their positions
+      "dry_run": false        # return the allocation without saving it
+    }
+    """
+    keep_existing = request.data.get("keep_existing", True)
+    dry_run = request.data.get("dry_run", False)
+    try:
+        with engine_session(reload=request.data.get("reload", False)) as engine:
+            assignments = engine.assign(keep_existing=keep_existing)
+            if not dry_run:
+                engine.commit_assignment(assignments, keep_existing=keep_existing)
+            assigned = {a["student_pref_id"] for a in assignments} | engine.kept
+            student_ids = list(engine.student_ids)
+        return Response({
+            "assignments": assignments,
+            "assigned": len(assignments),
+            "kept": len(engine.kept),
+            "unassigned": [pref_id for pref_id in student_ids if pref_id not in assigned],
+            "committed": not dry_run,
+        }, status=status.HTTP_200_OK)
+    except IntegrityError:
+        return _matches_changed()
+    except Exception as e:
+        traceback.print_exc()
+        return Response({"error": "Server error: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def invalid_matches(request):
+    """List matches that no longer satisfy the organisation's preferences"""
+    try:
+        with engine_session() as engine:
+            invalid = engine.report_invalid_matches()
+        return Response(invalid, status=status.HTTP_200_OK)
+    except Exception as e:
+        traceback.print_exc()
+        return Response({"error": "Server error: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsStudent])
+def eligible_organisations(request, student_pref_id):
+    """Organisation preferences a student preference can be matched with"""
+    if not _owns_student_preference(request.user, student_pref_id):
+        return _forbidden()
+    if not StudentPreference.objects.filter(student_pref_id=student_pref_id).exists():
+        return Response({"error": "Student preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    prefs = OrganisationPreference.objects.filter(
+        eligible_pairs__student_preference_id=student_pref_id
+    ).values(
+        'pref_id', 'organisation_id', 'pref_education_level', 'positions_available', 'start_date', 'end_date',
+        organisation_name=F('organisation__org_name'),
+    # The pair's column equals pref_id; ordering by it reads the pairs'
+    # unique index in order instead of sorting the rows.
+    ).order_by('eligible_pairs__organisation_preference_id')
+    return Response(list(prefs), status=status.HTTP_200_OK)
+
 @api_view(['GET'])
+@permission_classes([IsOrganisation])
+def eligible_students(request, pref_id):
+    """Student preferences an organisation preference can be matched with"""
+    if not _owns_organisation_preference(request.user, pref_id):
+        return _forbidden()
+    if not OrganisationPreference.objects.filter(pref_id=pref_id).exists():
+        return Response({"error": "Organisation preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    prefs = StudentPreference.objects.filter(
+        eligible_pairs__organisation_preference_id=pref_id
+    ).values(
+        'student_pref_id', 'student_id', 'pref_location', 'available_from', 'available_to',
+        first_name=F('student__first_name'),
+        last_name=F('student__last_name'),
+        year_of_study=F('student__year_of_study'),
+    ).order_by('eligible_pairs__student_preference_id')
+    return Response(list(prefs), status=status.HTTP_200_OK)
+
+def _top_k(request, default=10, maximum=100):
+    try:
+        k = int(request.GET.get('k', default))
+    except ValueError:
+        return None
+    return k if 1 <= k <= maximum else None
+
+def _score_breakdown(pair):
+    return {
+        "industry": pair.pop('industry_score'),
+        "skills": pair.pop('skills_score'),
+        "dates": pair.pop('dates_score'),
+        "location": pair.pop('location_score'),
+    }
+
+@api_view(['GET'])
+@permission_classes([IsStudent])
+def student_recommendations(request, student_pref_id):
+    """Best-scoring organisation preferences for a student preference"""
+    if not _owns_student_preference(request.user, student_pref_id):
+        return _forbidden()
+    k = _top_k(request)
+    if k is None:
+        return Response({"error": "k must be an integer between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
+    pairs = list(EligiblePair.objects.filter(
+        student_preference_id=student_pref_id
+    ).order_by('-score').values(
+        'score', 'industry_score', 'skills_score', 'dates_score', 'location_score',
+        pref_id=F('organisation_preference_id'),
+        organisation_id=F('organisation_preference__organisation_id'),
+        organisation_name=F('organisation_preference__organisation__org_name'),
+        positions_available=F('organisation_preference__positions_available'),
+        start_date=F('organisation_preference__start_date'),
+        end_date=F('organisation_preference__end_date'),
+    )[:k])
+    if not pairs and not StudentPreference.objects.filter(student_pref_id=student_pref_id).exists():
+        return Response({"error": "Student preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    for pair in pairs:
+        pair['breakdown'] = _score_breakdown(pair)
+    return Response(pairs, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsOrganisation])
+def organisation_candidates(request, pref_id):
+    """Best-scoring student preferences for an organisation preference"""
+    if not _owns_organisation_preference(request.user, pref_id):
+        return _forbidden()
+    k = _top_k(request)
+    if k is None:
+        return Response({"error": "k must be an integer between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
+    pairs = list(EligiblePair.objects.filter(
+        organisation_preference_id=pref_id
+    ).order_by('-score').values(
+        'score', 'industry_score', 'skills_score', 'dates_score', 'location_score',
+        student_pref_id=F('student_preference_id'),
+        student_id=F('student_preference__student_id'),
+        first_name=F('student_preference__student__first_name'),
+        last_name=F('student_preference__student__last_name'),
+        year_of_study=F('student_preference__student__year_of_study'),
+        available_from=F('student_preference__available_from'),
+        available_to=F('student_preference__available_to'),
+    )[:k])
+    if not pairs and not OrganisationPreference.objects.filter(pref_id=pref_id).exists():
+        return Response({"error": "Organisation preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    for pair in pairs:
+        pair['breakdown'] = _score_breakdown(pair)
+    return Response(pairs, status=status.HTTP_200_OK)
+
+def preference_queryset(request):
+    """The student preferences matching the list filters; raises FilterError."""
+    prefs = StudentPreference.objects.all()
+    # Preferences whose availability overlaps the requested window.
+    available_from = date_param(request, 'available_from')
+    if available_from is not None:
+        prefs = prefs.filter(available_to__gte=available_from)
+    available_to = date_param(request, 'available_to')
+    if available_to is not None:
+        prefs = prefs.filter(available_from__lte=available_to)
+    year_of_study = int_param(request, 'year_of_study')
+    if year_of_study is not None:
+        prefs = prefs.filter(student__year_of_study=year_of_study)
+    if request.GET.get('student_id'):
+        prefs = prefs.filter(student_id=request.GET['student_id'])
+    if request.user.role == STUDENT:
+        prefs = prefs.filter(student_id=request.user.id)
+    if request.GET.get('industry'):
+        prefs = prefs.filter(preferredindustry__industry_id=request.GET['industry'])
+    if request.GET.get('location'):
+        prefs = prefs.filter(pref_location=request.GET['location'])
+    return prefs
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
 def preference_list(request):
-    prefs = StudentPreference.objects.select_related('student').prefetch_related(
-        'preferredindustry_set__industry',
-        'desiredskill_set__skill'
-    ).all()
-    serializer = StudentPreferenceSerializer(prefs, many=True)
-    return Response(serializer.data)
+    try:
+        prefs = preference_queryset(request)
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return paginated_response(request, prefs, StudentPreferenceRows, ordering='student_pref_id')
 @api_view(['PUT'])
+@permission_classes([IsStudent])
 def update_student_preference(request, student_pref_id):
     try:
         pref = StudentPreference.objects.get(student_pref_id=student_pref_id)
     except StudentPreference.DoesNotExist:
         return Response({"error": "Preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    if not request.user.can_act_for_student(pref.student_id):
+        return _forbidden()
 
     serializer = StudentPreferenceSerializer(pref, data=request.data, partial=True)
     if serializer.is_valid():
@@ -444,11 +858,14 @@ def update_student_preference(request, student_pref_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['PUT'])
+@permission_classes([IsOrganisation])
 def update_organisation_preference(request, pref_id):
     try:
         preference = OrganisationPreference.objects.get(pref_id=pref_id)
     except OrganisationPreference.DoesNotExist:
         return Response({"error": "Organisation preference not found."}, status=status.HTTP_404_NOT_FOUND)
+    if not request.user.can_act_for_organisation(preference.organisation_id):
+        return _forbidden()
 
     serializer = OrganisationPreferenceSerializer(preference, data=request.data, partial=True)
     if serializer.is_valid():
@@ -457,17 +874,17 @@ def update_organisation_preference(request, pref_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PUT'])
+@permission_classes([IsOwner])
 def update_student_profile(request, student_id):
+    if request.method == 'GET':
+        return cached_object_response(request, 'student', student_id, StudentSerializer, 'Student not found')
+
     try:
         student = Student.objects.get(student_id=student_id)
     except Student.DoesNotExist:
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = StudentSerializer(student)
-        return Response(serializer.data)
-
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = StudentSerializer(student, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -475,6 +892,8 @@ def update_student_profile(request, student_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@permission_classes([IsOwner])
+@throttle_classes([CredentialThrottle])
 def change_password(request, student_id):
     try:
         student = Student.objects.get(student_id=student_id)
@@ -487,27 +906,27 @@ def change_password(request, student_id):
     if not current_password or not new_password:
         return Response({'error': 'Current and new password must be provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not student.check_password(current_password):
+    if not check_password(current_password, student.password):
         return Response({'error': 'Current password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
 
-    student.set_password(new_password)
+    student.password = make_password(new_password)
     student.save()
 
     return Response({'message': 'Password updated successfully'}, status=status.HTTP_200_OK)
 
 @api_view(['GET', 'PUT'])
+@permission_classes([IsOwner])
 def update_organisation_profile(request, org_id):
     print("Received org_id:", org_id)
+    if request.method == 'GET':
+        return cached_object_response(request, 'organisation', org_id, OrganisationSerializer, 'Organisation not found')
+
     try:
         org = Organisation.objects.get(org_id=org_id)
     except Organisation.DoesNotExist:
         return Response({'error': 'Organisation not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = OrganisationSerializer(org)
-        return Response(serializer.data)
-
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = OrganisationSerializer(org, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -515,6 +934,8 @@ def update_organisation_profile(request, org_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@permission_classes([IsOwner])
+@throttle_classes([CredentialThrottle])
 def change_org_password(request, org_id):
     try:
         org = Organisation.objects.get(org_id=org_id)
@@ -536,20 +957,90 @@ def change_org_password(request, org_id):
     return Response({'message': 'Password updated successfully'}, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
+@permission_classes([IsOwner])
 def get_org_logbooks(request, org_id):
     """Get all logbooks for an organization"""
     try:
-        logbooks = Logbook.objects.filter(org_id=org_id).order_by('-submitted_at')
-        serializer = LogbookSerializer(logbooks, many=True)
-        return Response(serializer.data)
+        fields = fields_param(request, LogbookRows)
+        logbooks = LogbookRows.project(Logbook.objects.filter(org_id=org_id).order_by('-submitted_at'), fields)
+        return Response(LogbookRows(logbooks, many=True, fields=fields).data)
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@permission_classes([IsOwner])
+def organisation_logbook_counts(request, org_id):
+    """Pending and viewed logbook totals for the organisation dashboard badge."""
+    return Response(counters.counts(counters.org_key(org_id)))
+
+@api_view(['GET'])
+@permission_classes([IsOwner])
+def student_logbook_counts(request, student_id):
+    """Pending and viewed totals of a student's logbooks."""
+    return Response(counters.counts(counters.student_key(student_id)))
+
+@api_view(['GET'])
+@permission_classes([IsStudentOrOrganisation])
+def search_logbooks(request):
+    """
+    Logbooks containing the words of ?q=, best matches first: entries with
+    more of the words, then by TF-IDF score. Optional filters: org_id,
+    student_id, week_number; pages of ?page_size= (max 100) via ?page=.
+    """
+    query = request.GET.get('q', '')
+    if not search.terms(query):
+        return Response({"error": "Enter at least one word to search for."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page = int_param(request, 'page') or 1
+        page_size = min(int_param(request, 'page_size') or 20, 100)
+        filters = {}
+        for name in ('org_id', 'week_number'):
+            value = int_param(request, name)
+            if value is not None:
+                filters[name] = value
+        if request.GET.get('student_id'):
+            filters['student_id'] = request.GET['student_id']
+    except FilterError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if page < 1 or page_size < 1:
+        return Response({"error": "page and page_size must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+    # Students and organisations only search their own logbooks.
+    if request.user.role == STUDENT:
+        filters['student_id'] = request.user.id
+    elif request.user.role == ORGANISATION:
+        filters['org_id'] = request.user.id
+
+    # One extra hit tells whether there is a next page.
+    hits = search.search(query, filters, offset=(page - 1) * page_size, limit=page_size + 1)
+    logbooks = LogbookSerializer.setup_eager_loading(Logbook.objects.all()).in_bulk(
+        [logbook_id for logbook_id, _, _ in hits[:page_size]]
+    )
+    results = []
+    for logbook_id, score, matched in hits[:page_size]:
+        if logbook_id not in logbooks:  # deleted since the search
+            continue
+        results.append({**LogbookSerializer(logbooks[logbook_id]).data, "score": score, "matched_terms": matched})
+
+    url = request.build_absolute_uri()
+    return Response({
+        "next": replace_query_param(url, 'page', page + 1) if len(hits) > page_size else None,
+        "previous": (
+            None if page == 1 else
+            remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+        ),
+        "results": results,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsStudentOrOrganisation])
 def get_logbook_detail(request, logbook_id):
     """Get details of a specific logbook"""
     try:
-        logbook = Logbook.objects.get(logbook_id=logbook_id)
+        logbook = LogbookSerializer.setup_eager_loading(Logbook.objects.all()).get(logbook_id=logbook_id)
+        if not (request.user.can_act_for_student(logbook.student_id) or request.user.can_act_for_organisation(logbook.org_id)):
+            return _forbidden()
         serializer = LogbookSerializer(logbook)
         return Response(serializer.data)
     except Logbook.DoesNotExist:
@@ -558,23 +1049,172 @@ def get_logbook_detail(request, logbook_id):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['PUT'])
+@permission_classes([IsOrganisation])
 def mark_logbook_viewed(request, logbook_id):
     """Mark a logbook as viewed by the organization"""
     try:
-        logbook = Logbook.objects.get(logbook_id=logbook_id)
-        logbook.status = 'viewed'
-        logbook.viewed_at = timezone.now()
-        logbook.save()
+        # An organisation can only mark its own logbooks; others look missing.
+        org_id = None if request.user.is_admin else request.user.id
+        if mark_viewed([logbook_id], org_id=org_id)[0]["result"] == "not_found":
+            return Response({"error": "Logbook not found"}, status=status.HTTP_404_NOT_FOUND)
+        logbook = LogbookSerializer.setup_eager_loading(Logbook.objects.all()).get(logbook_id=logbook_id)
         serializer = LogbookSerializer(logbook)
         return Response(serializer.data)
-    except Logbook.DoesNotExist:
-        return Response({"error": "Logbook not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _batch(request, key):
+    """Return the list under ``key`` in the payload, or an error Response."""
+    items = request.data.get(key)
+    if not isinstance(items, list) or not items:
+        return Response({"error": f"{key} must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BATCH:
+        return Response({"error": f"At most {MAX_BATCH} {key} per request."}, status=status.HTTP_400_BAD_REQUEST)
+    return items
+
+
+@api_view(['POST'])
+@permission_classes([IsOrganisation])
+def bulk_mark_logbooks_viewed(request):
+    """
+    Mark many logbooks viewed at once.
+
+    Expected JSON payload:
+    {
+      "logbook_ids": ["AB12CD34", ...],
+      "org_id": 3          # optional: only touch this organisation's logbooks
+    }
+    """
+    logbook_ids = _batch(request, "logbook_ids")
+    if isinstance(logbook_ids, Response):
+        return logbook_ids
+    org_id = request.data.get("org_id")
+    if not request.user.is_admin:
+        if org_id is not None and not request.user.can_act_for_organisation(org_id):
+            return _forbidden()
+        org_id = request.user.id
+    try:
+        results = mark_viewed([str(logbook_id) for logbook_id in logbook_ids], org_id=org_id)
+        return Response({
+            "results": results,
+            "viewed": sum(result["result"] == "viewed" for result in results),
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsStudent])
+def submit_logbook_batch(request):
+    """
+    Submit several logbook entries in one request.
+
+    Expected JSON payload:
+    {
+      "entries": [
+        {"student_id": "202012345", "org_id": 3, "week_number": 1, "log_entry": "..."},
+        ...
+      ]
+    }
+    """
+    entries = _batch(request, "entries")
+    if isinstance(entries, Response):
+        return entries
+    if not all(isinstance(entry, dict) and request.user.can_act_for_student(entry.get("student_id")) for entry in entries):
+        return _forbidden()
+    try:
+        results, created = submit_logbooks(entries)
+        return Response(
+            {"results": results, "created": created},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+    except IntegrityError:
+        return _week_submitted()
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@permission_classes([IsOwner])
 def get_student_preferences(request, student_id):
-    preferences = StudentPreference.objects.filter(student__student_id=student_id)
+    preferences = StudentPreferenceSerializer.setup_eager_loading(
+        StudentPreference.objects.filter(student__student_id=student_id)
+    )
     serializer = StudentPreferenceSerializer(preferences, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export(request, name, fmt):
+    """
+    Stream logbooks, students, organisations or matches as CSV or NDJSON,
+    e.g. export/logbooks.csv?org_id=3. Students and organisations get their
+    own rows; students and organisations tables are for admins only.
+    """
+    spec = EXPORTS.get(name)
+    if spec is None or fmt not in ENCODERS:
+        return Response(
+            {"error": f"Export one of {', '.join(EXPORTS)} as {' or '.join(ENCODERS)}"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    try:
+        rows = spec.rows(request.user, request.GET)
+    except ValidationError as e:
+        return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+    if rows is None:
+        return _forbidden()
+    response = StreamingHttpResponse(ENCODERS[fmt](list(spec.columns), rows), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-sent events for the caller's dashboard: logbook.submitted,
+    logbook.viewed, match.saved and match.deleted (see events.py). Browsers'
+    EventSource cannot set headers, so the token may come as ?token=.
+    """
+    token = request.GET.get('token')
+    if not token:
+        _, _, token = request.headers.get('Authorization', '').partition(' ')
+    try:
+        user = token_user(token)
+    except AuthenticationFailed as e:
+        return JsonResponse({"error": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    channels = events.user_channels(user)
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if isinstance(request, ASGIRequest):
+        body = events.stream(channels, last_event_id)
+    else:
+        body = events.bounded_stream(channels, last_event_id)
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keeps nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+def _metrics_response(request, registry):
+    if not settings.DEBUG and request.META.get('REMOTE_ADDR') not in LOCAL_ADDRESSES:
+        return Response({"error": "Metrics are only available locally"}, status=status.HTTP_403_FORBIDDEN)
+    if request.method == 'DELETE':
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(registry.snapshot())
+
+
+@api_view(['GET', 'DELETE'])
+def request_metrics(request):
+    """Per-endpoint query/latency histograms collected by QueryMetricsMiddleware."""
+    return _metrics_response(request, metrics)
+
+
+@api_view(['GET', 'DELETE'])
+def throttle_metrics(request):
+    """Allowed and rejected password attempts by bucket kind (ip/account) and URL name."""
+    return _metrics_response(request, throttle_counters)
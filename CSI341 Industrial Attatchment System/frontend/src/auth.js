@@ -0,0 +1,31 @@
+import axios from 'axios';
+
+// The access token returned by the login endpoints. It is sent as
+// "Authorization: Bearer <token>" so the backend can identify the user
+// without the password being checked again.
+const TOKEN_KEY = 'access_token';
+
+export const saveToken = (token) => {
+  if (token) {
+    localStorage.setItem(TOKEN_KEY, token);
+  }
+};
+
+export const clearToken = () => localStorage.removeItem(TOKEN_KEY);
+
+export const getToken = () => localStorage.getItem(TOKEN_KEY);
+
+// Headers for requests made with fetch().
+export const authHeaders = () => {
+  const token = localStorage.getItem(TOKEN_KEY);
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// Every axios request carries the token.
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem(TOKEN_KEY);
+  if (token) {
+    config.headers = { ...config.headers, Authorization: `Bearer ${token}` };
+  }
+  return config;
+});
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { clearToken } from "../auth";
 
 const AdminDashboard = () => {
   const [admin, setAdmin] = useState(null);
@@ -28,6 +29,7 @@ const AdminDashboard = () => {
   const handleLogout = () => {
     localStorage.removeItem("admin_id");
     localStorage.removeItem("admin_email");
+    clearToken();
     navigate("/admin/login");
   };
 
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import axios from 'axios';
+import { saveToken } from '../auth';
 
 const AdminLogin = () => {
   const [formData, setFormData] = useState({
@@ -28,6 +29,7 @@ const AdminLogin = () => {
       setMessage(response.data.message);
       localStorage.setItem('admin_id', response.data.admin_id);
       localStorage.setItem('admin_email', response.data.email);
+      saveToken(response.data.token);
       navigate('/admin/dashboard');
     } catch (error) {
       setMessage(error.response?.data?.error || 'Login failed');
@@ -65,9 +67,6 @@ const AdminLogin = () => {
             <button type="submit" style={styles.button}>Login</button>
           </form>
           {message && <p style={styles.message}>{message}</p>}
-          <p style={styles.linkText}>
-            Don't have an account? <Link to="/admin/register" style={styles.link}>Register here</Link>
-          </p>
         </div>
       </div>
     </div>
@@ -144,15 +143,6 @@ const styles = {
     marginTop: "15px",
     color: "#f0f0f0",
   },
-  linkText: {
-    marginTop: "15px",
-    fontSize: "14px",
-    color: "#ccc",
-  },
-  link: {
-    color: "#00bfff",
-    textDecoration: "underline",
-  },
 };
 
 export default AdminLogin;
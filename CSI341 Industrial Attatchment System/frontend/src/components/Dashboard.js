@@ -23,15 +23,9 @@ const Dashboard = () => {
     setStudentName(`${firstName || ''} ${lastName || ''}`.trim());
 
     // Check if student has submitted preferences
-    axios.get("http://localhost:8000/api/admin/student-preferences/")
+    axios.get("http://localhost:8000/api/admin/student-preferences/", { params: { student_id: studentId } })
       .then(response => {
-        const preferenceExists = response.data.some(
-          (pref) =>
-            pref.student === studentId ||
-            pref.student_id === studentId ||
-            (pref.student?.student_id === studentId)
-        );
-        setHasPreference(preferenceExists);
+        setHasPreference(response.data.results.length > 0);
       });
   }, [studentId, navigate]);
 
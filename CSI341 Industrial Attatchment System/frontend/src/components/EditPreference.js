@@ -33,19 +33,11 @@ const EditPreference = () => {
   // Fetch the current student's preference if it exists.
   useEffect(() => {
     if (!studentId) return;
-    axios.get("http://localhost:8000/api/student-preferences/")
+    axios.get("http://localhost:8000/api/student-preferences/", { params: { student_id: studentId } })
       .then((response) => {
-        let prefs = response.data;
-        if (!Array.isArray(prefs)) {
-          prefs = [prefs];
-        }
+        const prefs = response.data.results;
         console.log("Fetched student preferences:", prefs);
-        const existingPref = prefs.find(
-            (pref) =>
-              pref.student === studentId ||
-              pref.student_id === studentId ||
-              (pref.student?.student_id === studentId)
-          );
+        const existingPref = prefs[0];
         if (existingPref) {
           setPreferenceId(existingPref.student_pref_id || existingPref.id);
           setFormData({
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { authHeaders } from '../auth';
 
 const LogbookForm = () => {
   // Get student id from localStorage
@@ -41,7 +42,8 @@ const LogbookForm = () => {
     try {
       // First, fetch the org_id using org_name.
       const orgRes = await fetch(
-        `http://127.0.0.1:8000/api/get-org-id-by-name/?name=${formData.org_name}`
+        `http://127.0.0.1:8000/api/get-org-id-by-name/?name=${formData.org_name}`,
+        { headers: authHeaders() }
       );
       const orgData = await orgRes.json();
 
@@ -63,7 +65,7 @@ const LogbookForm = () => {
 
       const response = await fetch("http://127.0.0.1:8000/api/logbook/", {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...authHeaders() },
         body: JSON.stringify(payload),
       });
 
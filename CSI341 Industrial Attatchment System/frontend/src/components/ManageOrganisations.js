@@ -28,7 +28,7 @@ const ManageOrganisations = () => {
   const fetchOrganisations = async () => {
     try {
       const response = await axios.get('http://localhost:8000/api/admin/organisations/');
-      setOrganisations(response.data);
+      setOrganisations(response.data.results);
     } catch (error) {
       setMessage(error.response?.data?.error || 'Failed to fetch organizations');
     }
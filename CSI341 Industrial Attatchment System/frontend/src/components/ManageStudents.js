@@ -24,7 +24,7 @@ const ManageStudents = () => {
   const fetchStudents = async () => {
     try {
       const response = await axios.get('http://localhost:8000/api/admin/students/');
-      setStudents(response.data);
+      setStudents(response.data.results);
     } catch (error) {
       setMessage(error.response?.data?.error || 'Failed to fetch students');
     }
@@ -157,7 +157,7 @@ const ManualMatchPage = () => {
     axios.get('http://localhost:8000/api/student-preferences/')
       .then((response) => {
         console.log("Student Preferences Response:", response.data);
-        setStudentPrefs(response.data);
+        setStudentPrefs(response.data.results);
       })
       .catch((error) => {
         console.error('Error fetching student preferences', error);
@@ -166,7 +166,7 @@ const ManualMatchPage = () => {
     axios.get('http://localhost:8000/api/admin/organisations/')
       .then((response) => {
         console.log("Organisations Response:", response.data);
-        setOrganisations(response.data);
+        setOrganisations(response.data.results);
       })
       .catch((error) => {
         console.error('Error fetching organisations', error);
@@ -1,12 +1,15 @@
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
+import { clearToken } from "../auth";
+import { subscribeEvents } from "../events";
 
 const OrganisationDashboard = () => {
   const [organization, setOrganization] = useState(null);
   const [hasPreference, setHasPreference] = useState(false);
   const [activeTab, setActiveTab] = useState("dashboard");
   const [hovered, setHovered] = useState(null);
+  const [pendingLogbooks, setPendingLogbooks] = useState(0);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -31,6 +34,19 @@ const OrganisationDashboard = () => {
           console.error("Error fetching org preferences:", err);
           setHasPreference(false);
         });
+
+      const fetchCounts = () =>
+        axios
+          .get(`http://localhost:8000/api/organisation/${orgId}/logbooks/counts/`)
+          .then((res) => setPendingLogbooks(res.data.pending))
+          .catch((err) => console.error("Error fetching logbook counts:", err));
+      fetchCounts();
+
+      return subscribeEvents({
+        "logbook.submitted": () => setPendingLogbooks((n) => n + 1),
+        "logbook.viewed": () => setPendingLogbooks((n) => Math.max(n - 1, 0)),
+        reset: fetchCounts,
+      });
     }
   }, [navigate]);
 
@@ -38,6 +54,7 @@ const OrganisationDashboard = () => {
     localStorage.removeItem("contact_email");
     localStorage.removeItem("organisation_id");
     localStorage.removeItem("org_name");
+    clearToken();
     navigate("/login-organisation");
   };
 
@@ -118,7 +135,7 @@ const OrganisationDashboard = () => {
               onMouseEnter={() => setHovered("logbooks")}
               onMouseLeave={() => setHovered(null)}
             >
-              View Logbooks
+              View Logbooks{pendingLogbooks > 0 ? ` (${pendingLogbooks} new)` : ""}
             </button>
           </div>
         );
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
+import { saveToken } from '../auth';
 
 const OrganisationLogin = () => {
   const [formData, setFormData] = useState({
@@ -26,6 +27,7 @@ const OrganisationLogin = () => {
         setMessage('Login successful!');
         localStorage.setItem("organisation_id", data.organisation_id);
         localStorage.setItem("contact_email", formData.contact_email);
+        saveToken(data.token);
         navigate("/organisation-dashboard");
       } else {
         setMessage(data.error || 'Login failed');
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { subscribeEvents } from '../events';
 
 const OrganizationLogbooks = () => {
   const { orgId } = useParams();
@@ -23,6 +24,17 @@ const OrganizationLogbooks = () => {
     };
 
     fetchLogbooks();
+
+    // New submissions need the student's name, so reload the list for them;
+    // a status change is applied in place.
+    return subscribeEvents({
+      'logbook.submitted': fetchLogbooks,
+      'logbook.viewed': ({ logbook_id, viewed_at }) =>
+        setLogbooks((current) => current.map(logbook =>
+          logbook.logbook_id === logbook_id ? { ...logbook, status: 'viewed', viewed_at } : logbook
+        )),
+      reset: fetchLogbooks,
+    });
   }, [orgId]);
 
   const handleMarkViewed = async (logbookId) => {
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import axios from "axios";
 import { useNavigate, Link } from "react-router-dom";
+import { saveToken } from "../auth";
 
 const StudentLogin = () => {
   const [formData, setFormData] = useState({
@@ -26,6 +27,7 @@ const StudentLogin = () => {
 
       if (response.status === 200) {
         localStorage.setItem("student_id", formData.student_id);
+        saveToken(response.data.token);
         navigate("/dashboard");
       }
     } catch (error) {
@@ -0,0 +1,21 @@
+import { getToken } from './auth';
+
+// Live updates from the backend's /api/events/ stream, so screens update
+// when logbooks are submitted or viewed and matches change instead of
+// reloading their lists. `handlers` maps event names (e.g.
+// "logbook.submitted") to callbacks taking the event's data; "reset" means
+// events were missed and the screen should reload. EventSource reconnects
+// by itself. Returns a function that closes the stream.
+export const subscribeEvents = (handlers) => {
+  const token = getToken();
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(
+    `http://localhost:8000/api/events/?token=${encodeURIComponent(token)}`
+  );
+  Object.entries(handlers).forEach(([name, handler]) => {
+    source.addEventListener(name, (event) => handler(JSON.parse(event.data)));
+  });
+  return () => source.close();
+};